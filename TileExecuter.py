@@ -1,70 +1,289 @@
 import logging
 import json
-from typing import Any, Dict, Optional
-from tiles_new import UserInteractionTile , LogicBuilderTile,FlowJumpTile,APICallTile 
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from circuit_breaker import EscalationError, UpstreamGuard
+from http_pool import HTTPSessionPool
+from input_channels import ConsoleChannel, InputChannel
+from instrumentation import Tracer, get_tracer
+from session_data import SessionData
+from tiles_new import UserInteractionTile , LogicBuilderTile,FlowJumpTile,APICallTile,ParallelTile,JoinTile,WaitTile,TileRuntime
 
 class TileExecutor:
-    def __init__(self):
+    def __init__(self, max_cached_definitions: int = 128, http_pool: Optional[HTTPSessionPool] = None, tracer: Optional[Tracer] = None,
+                 channel: Optional[InputChannel] = None, upstream_guard: Optional[UpstreamGuard] = None):
         """
         Initialize TileExecutor to execute tile logic.
+
+        Parameters:
+        - max_cached_definitions: How many workflow definitions keep their configured tile
+          instances cached; the least recently used definition is evicted beyond that.
+        - http_pool: Connection pool for the APICallTiles it builds; None uses the process-wide pool.
+        - tracer: Where tile spans and latency metrics go; None uses the process-wide tracer.
+        - channel: Input channel UserInteractionTiles prompt and read answers through; the terminal by default.
+        - upstream_guard: Per-host circuit breakers and bulkheads for APICallTiles; None uses the process-wide guard.
         """
         #self.supported_tiles = ["UserInteraction", "LogicBuilder", "FlowJump", "APICall"]
         self.supported_tiles = {
             "UserInteractionTile": UserInteractionTile,
             "LogicBuilderTile": LogicBuilderTile,
             "FlowJumpTile": FlowJumpTile,
-            "APICallTile": APICallTile
+            "APICallTile": APICallTile,
+            "ParallelTile": ParallelTile,
+            "JoinTile": JoinTile,
+            "WaitTile": WaitTile
         }
         self.logger = logging.getLogger("TileExecutor")
+        self.max_cached_definitions = max_cached_definitions
+        self.http_pool = http_pool
+        self.tracer = tracer or get_tracer()
+        self.channel = channel or ConsoleChannel()
+        self.upstream_guard = upstream_guard
+        # Called with a tile event after every tile execution (see add_listener).
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # definition key -> {tile id -> configured tile instance}, in LRU order
+        self._instance_cache: "OrderedDict[Hashable, Dict[Any, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-    def execute_tile(self, tile: Dict[str, Any], workflow_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def execute_tile(self, tile: Dict[str, Any], workflow_data: Dict[str, Any], definition_key: Optional[Hashable] = None, workflow_id: Optional[str] = None,
+                     channel: Optional[InputChannel] = None, idempotency_key: Optional[str] = None,
+                     effects: Optional[Any] = None) -> Optional[Dict[str, Any]]:
         """
         Executes the logic of the provided tile and returns updated data.
         
         Parameters:
         - tile: The tile configuration containing the type and necessary parameters.
         - workflow_data: The current workflow data available for the tile execution.
+        - definition_key: Key of the workflow definition the tile belongs to (CompiledWorkflow.key).
+          When given, the configured tile instance is cached and reused across steps and runs.
+        - workflow_id: The session the tile runs for, recorded on its trace span.
+        - channel: Input channel for this call, overriding the executor's.
+        - idempotency_key: Key of this step's side effects; APICallTiles send it with POSTs.
+        - effects: ExecutionJournal where committed side effects are looked up and recorded.
+
+        Returns:
+        - Updated workflow data after tile execution.
+        """
+        tile_instance = self.get_tile_instance(tile, definition_key)
+        self.logger.debug("Executing tile: %s of type: %s", tile_instance.name, tile.get("type"))
+
+        args = (workflow_data,)
+        if isinstance(tile_instance, UserInteractionTile):
+            args = (workflow_data, TileRuntime(session_id=workflow_id, channel=channel or self.channel))
+        elif idempotency_key is not None and isinstance(tile_instance, APICallTile):
+            args = (workflow_data, TileRuntime(session_id=workflow_id, idempotency_key=idempotency_key, effects=effects))
+        # Execute the tile and update workflow data
+        try:
+            if self.tracer.enabled or self._listeners:
+                updated_data = self._traced(workflow_id, tile, tile_instance.execute, *args)
+            else:
+                updated_data = tile_instance.execute(*args)
+        except EscalationError as e:
+            self._escalated(tile, workflow_data, e)
+            raise
+        self._record(tile, workflow_data, updated_data)
+        return workflow_data
+
+    def _escalated(self, tile: Dict[str, Any], workflow_data: Dict[str, Any], error: EscalationError) -> None:
+        # The failure stays in the session data, where a person picking the session up can see it.
+        error.tile_id = tile.get("id")
+        self._record(tile, workflow_data, error.output)
+
+    @staticmethod
+    def _record(tile: Dict[str, Any], workflow_data: Dict[str, Any], updated_data: Optional[Dict[str, Any]]) -> None:
+        # SessionData keeps the output in the tile's namespace, projected to the tile's "retain" paths.
+        if isinstance(workflow_data, SessionData):
+            workflow_data.record(tile.get("id"), updated_data, tile.get("retain"))
+        else:
+            workflow_data.update(updated_data or {})
+
+    def _traced(self, workflow_id: Optional[str], tile: Dict[str, Any], call, *args):
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            result = call(*args)
+        except Exception as e:
+            self._finished(workflow_id, tile, started, time.perf_counter() - start, "error", str(e))
+            raise
+        self._finished(workflow_id, tile, started, time.perf_counter() - start, "ok")
+        return result
+
+    def _finished(self, workflow_id: Optional[str], tile: Dict[str, Any], started: float, duration: float, outcome: str,
+                  error: Optional[str] = None) -> None:
+        if self.tracer.enabled:
+            self.tracer.record(workflow_id, tile.get("id"), tile.get("type"), started, duration, outcome, error)
+        if self._listeners:
+            event = {"event": "tile", "session_id": workflow_id, "tile_id": tile.get("id"), "tile_type": tile.get("type"),
+                     "outcome": outcome, "duration": duration, "error": error}
+            for listener in list(self._listeners):
+                try:
+                    listener(event)
+                except Exception as e:
+                    self.logger.error(f"Tile event listener failed: {e}")
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Subscribe to tile events: listener(event) is called, on the thread that ran the tile, after
+        every tile execution with {"event": "tile", "session_id", "tile_id", "tile_type", "outcome",
+        "duration", "error"}. Keep it quick; it runs inside the session's step.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def apply_user_response(self, tile: Dict[str, Any], workflow_data: Dict[str, Any], user_input: Any, definition_key: Optional[Hashable] = None, workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Complete a UserInteractionTile with a reply that arrived after the session was suspended.
+
+        Parameters:
+        - tile: The UserInteractionTile definition the session is waiting on.
+        - workflow_data: The session's workflow data.
+        - user_input: The user's reply.
+        - definition_key: Key of the workflow definition the tile belongs to.
+        - workflow_id: The session the reply belongs to, recorded on its trace span.
+
+        Returns:
+        - Updated workflow data.
+        """
+        tile_instance = self.get_tile_instance(tile, definition_key)
+        self.logger.debug("Applying reply to tile: %s", tile_instance.name)
+        if self.tracer.enabled or self._listeners:
+            updated_data = self._traced(workflow_id, tile, tile_instance.respond, user_input, workflow_data)
+        else:
+            updated_data = tile_instance.respond(user_input, workflow_data)
+        self._record(tile, workflow_data, updated_data)
+        return workflow_data
+
+    async def execute_tile_async(self, tile: Dict[str, Any], workflow_data: Dict[str, Any], definition_key: Optional[Hashable] = None, runtime=None) -> Optional[Dict[str, Any]]:
+        """
+        Async counterpart of execute_tile for the AsyncWorkflowEngine.
+
+        Parameters:
+        - tile: The tile configuration containing the type and necessary parameters.
+        - workflow_data: The current workflow data available for the tile execution.
+        - definition_key: Key of the workflow definition the tile belongs to (CompiledWorkflow.key).
+        - runtime: TileRuntime with the session's HTTP client and input queue.
 
         Returns:
         - Updated workflow data after tile execution.
         """
+        tile_instance = self.get_tile_instance(tile, definition_key)
+        self.logger.debug("Executing tile: %s of type: %s", tile_instance.name, tile.get("type"))
+
+        try:
+            if not self.tracer.enabled and not self._listeners:
+                updated_data = await tile_instance.execute_async(workflow_data, runtime)
+            else:
+                workflow_id = runtime.session_id if runtime is not None else None
+                started = time.time()
+                start = time.perf_counter()
+                try:
+                    updated_data = await tile_instance.execute_async(workflow_data, runtime)
+                except Exception as e:
+                    self._finished(workflow_id, tile, started, time.perf_counter() - start, "error", str(e))
+                    raise
+                self._finished(workflow_id, tile, started, time.perf_counter() - start, "ok")
+        except EscalationError as e:
+            self._escalated(tile, workflow_data, e)
+            raise
+        self._record(tile, workflow_data, updated_data)
+        return workflow_data
+
+    def get_tile_instance(self, tile: Dict[str, Any], definition_key: Optional[Hashable] = None):
+        """
+        Return a configured tile instance, from the per-definition cache when possible.
+
+        Tile instances only hold their configuration; everything a run produces goes into
+        the run's workflow_data, so one instance can serve any number of sessions.
+
+        Parameters:
+        - tile: The tile configuration containing the type and necessary parameters.
+        - definition_key: Key of the owning workflow definition, or None to bypass the cache.
+
+        Returns:
+        - The configured tile instance.
+        """
+        if definition_key is None:
+            return self.build_tile(tile)
+
+        with self._cache_lock:
+            return self._cached_tile_instance(tile, definition_key)
+
+    def _cached_tile_instance(self, tile: Dict[str, Any], definition_key: Hashable):
+        # Caller holds self._cache_lock, so concurrent sessions never build the same tile twice.
+        instances = self._instance_cache.get(definition_key)
+        if instances is None:
+            instances = {}
+            self._instance_cache[definition_key] = instances
+            while len(self._instance_cache) > self.max_cached_definitions:
+                evicted_key, _ = self._instance_cache.popitem(last=False)
+                self.logger.info(f"Evicted cached tiles of workflow definition {evicted_key}")
+        else:
+            self._instance_cache.move_to_end(definition_key)
+
+        tile_id = tile.get("id")
+        tile_instance = instances.get(tile_id)
+        if tile_instance is None:
+            tile_instance = self.build_tile(tile)
+            instances[tile_id] = tile_instance
+        return tile_instance
+
+    def clear_cache(self, definition_key: Optional[Hashable] = None) -> None:
+        """
+        Drop cached tile instances for one workflow definition, or for all of them.
+        """
+        with self._cache_lock:
+            if definition_key is None:
+                self._instance_cache.clear()
+            else:
+                self._instance_cache.pop(definition_key, None)
+
+    def build_tile(self, tile: Dict[str, Any]):
+        """
+        Create and configure a tile instance from its definition.
+
+        Parameters:
+        - tile: The tile configuration containing the type and necessary parameters.
+
+        Returns:
+        - The configured tile instance.
+        """
         tile_type = tile.get("type")
         tile_name = tile.get("name", "UnnamedTile")
         tile_config = tile.get("configuration", {})
-        print(tile_type)
 
         if tile_type not in self.supported_tiles:
             self.logger.error(f"Unsupported tile type: {tile_type}")
             raise ValueError(f"Unsupported tile type: {tile_type}")
 
         #self.logger.info(f"Executing tile: {tile_type}")
-        self.logger.info(f"Executing tile: {tile_name} of type: {tile_type}")
+        self.logger.info(f"Building tile: {tile_name} of type: {tile_type}")
         # Dynamically create the tile instance based on tile type
         tile_instance = self.supported_tiles[tile_type](tile_name)
         if tile_type == "UserInteractionTile" :
             #return self._execute_user_interaction_tile(tile, workflow_data)
-            print("exucting user interaction config")
             self._configure_user_interaction_tile(tile_instance, tile_config)
         elif tile_type == "LogicBuilderTile":
             #return self._execute_logic_builder_tile(tile, workflow_data)
-            print("exucting logic builer config")
             self._configure_logic_builder_tile(tile_instance, tile_config)
         elif tile_type == "FlowJumpTile" :
             #return self._execute_flow_jump_tile(tile, workflow_data)
-            print("exucting FlowJumpTile config")
             self._configure_flow_jump_tile(tile_instance, tile_config)
         elif tile_type == "APICallTile" :
             #return self._execute_api_call_tile(tile, workflow_data)
-            print("exucting APICallTile config")
             self._configure_api_call_tile(tile_instance, tile_config)
-        
-
-        # Execute the tile and update workflow data
-        updated_data = tile_instance.execute()
-        workflow_data.update(updated_data or {})
-        return workflow_data
+        elif tile_type == "ParallelTile":
+            self._configure_parallel_tile(tile_instance, tile_config)
+        elif tile_type == "JoinTile":
+            self._configure_join_tile(tile_instance, tile_config)
+        elif tile_type == "WaitTile":
+            self._configure_wait_tile(tile_instance, tile_config)
+        return tile_instance
 
-        #return workflow_data
     def _configure_user_interaction_tile(self, tile_instance, config: Dict[str, Any]):
         prompt = config.get("prompt", "Enter your choice:")
         options = config.get("options", ["Yes", "No"])
@@ -82,13 +301,42 @@ class TileExecutor:
         #jump_target = Tile(jump_target_name) if jump_target_name else None
         tile_instance.configure(jump_target_name)
 
+    def _configure_parallel_tile(self, tile_instance, config: Dict[str, Any]):
+        branches = config.get("branches", [])
+        join_tile = config.get("join_tile")
+        tile_instance.configure(branches, join_tile)
+
+    def _configure_join_tile(self, tile_instance, config: Dict[str, Any]):
+        policy = config.get("policy", "all")
+        quorum = config.get("quorum")
+        next_tile = config.get("next_tile")
+        failure_tile = config.get("failure_tile")
+        tile_instance.configure(policy, quorum, next_tile, failure_tile)
+
+    def _configure_wait_tile(self, tile_instance, config: Dict[str, Any]):
+        seconds = config.get("seconds")
+        until = config.get("until")
+        next_tile = config.get("next_tile")
+        tile_instance.configure(seconds, until, next_tile)
+
     def _configure_api_call_tile(self, tile_instance, config: Dict[str, Any]):
         api_url = config.get("api_url", "https://example.com")
-        http_method = config.get("http_method", "GET")
+        http_method = config.get("http_method", config.get("method", "GET")).upper()
         params=config.get("params",{})
         payload = config.get("payload", {})
         next_tile=config.get("next_tile")
-        tile_instance.configure(api_url=api_url, http_method=http_method, params=params,payload=payload,next_tile=next_tile)
+        timeout = config.get("timeout")
+        if isinstance(timeout, list):
+            timeout = tuple(timeout)  # [connect, read]
+        cache = config.get("cache")
+        fallback_tile = config.get("fallback_tile")
+        fallback_action = config.get("fallback_action")
+        batch = config.get("batch")
+        extract = config.get("extract")
+        max_response_bytes = config.get("max_response_bytes")
+        tile_instance.configure(api_url=api_url, http_method=http_method, params=params,payload=payload,next_tile=next_tile,timeout=timeout,http_pool=self.http_pool,cache=cache,
+                                upstream_guard=self.upstream_guard,fallback_tile=fallback_tile,fallback_action=fallback_action,
+                                batch=batch,extract=extract,max_response_bytes=max_response_bytes)
     
     '''def _execute_user_interaction_tile(self, tile: Dict[str, Any], workflow_data: Dict[str, Any]) -> Dict[str, Any]:
         # Handle user interaction, capture data or process input
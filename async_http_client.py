@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+import aiohttp
+
+# Methods safe to send twice; like urllib3's Retry, only these are retried once the request may have gone out.
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"))
+
+
+class AsyncHTTPResponse:
+    def __init__(self, status_code: int, content: bytes):
+        """
+        Fully read HTTP response, shaped like requests.Response so tiles can share handling code.
+        """
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class AsyncHTTPClient:
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 keepalive_timeout: float = 15.0, max_retries: int = 2, backoff_factor: float = 0.3,
+                 retry_statuses: Tuple[int, ...] = (502, 503, 504)):
+        """
+        One aiohttp session shared by every APICallTile running on the event loop.
+
+        Timeouts and retries follow http_pool.HTTPSessionPool, so a tile behaves the same under
+        either engine.
+
+        Parameters:
+        - limit: Maximum number of open connections in total.
+        - limit_per_host: Maximum number of open connections per host (0 means no limit).
+        - connect_timeout: Seconds to wait for a TCP/TLS connection.
+        - read_timeout: Seconds to wait between bytes of the response.
+        - keepalive_timeout: Seconds an idle keep-alive connection is kept for reuse.
+        - max_retries: Retries for connection errors, and for read errors and retry_statuses on
+          idempotent methods.
+        - backoff_factor: Retry n waits backoff_factor * 2 ** (n - 1) seconds first.
+        - retry_statuses: Response codes that are retried.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self.retries = 0
+        self.logger = logging.getLogger("AsyncHTTPClient")
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the loop that actually runs the workflows.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None, json: Any = None,
+                      timeout: Optional[Union[float, Tuple[float, float]]] = None,
+                      max_bytes: Optional[int] = None) -> AsyncHTTPResponse:
+        """
+        Send a request and read the whole body, or at most max_bytes + 1 bytes of it, retrying
+        failures as configured. Once retries run out, the last response is returned (or the last
+        error raised).
+
+        Parameters:
+        - method: HTTP method, e.g. "GET" or "POST".
+        - url: The request URL.
+        - params: Optional query string parameters.
+        - json: Optional JSON body.
+        - timeout: Optional override of the client's timeouts, as for requests: seconds for both,
+          or (connect, read).
+        - max_bytes: Stop reading a longer body one byte past max_bytes, so the caller can tell
+          it was too long without holding it; None reads it all.
+
+        Returns:
+        - The AsyncHTTPResponse.
+        """
+        session = self._get_session()
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        client_timeout = self._timeout(timeout)
+        retry = 0
+        while True:
+            try:
+                response = await self._send(session, method, url, params, json, client_timeout, max_bytes)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # A connection that never opened sent nothing, so any method may try again.
+                not_sent = isinstance(e, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError))
+                if retry >= self.max_retries or not (idempotent or not_sent):
+                    raise
+                self.logger.debug("Retrying %s %s after %r", method, url, e)
+            else:
+                if retry >= self.max_retries or not idempotent or response.status_code not in self.retry_statuses:
+                    return response
+                self.logger.debug("Retrying %s %s after status %d", method, url, response.status_code)
+            retry += 1
+            self.retries += 1
+            await asyncio.sleep(self.backoff_factor * (2 ** (retry - 1)))
+
+    def _timeout(self, timeout: Optional[Union[float, Tuple[float, float]]]) -> Optional[aiohttp.ClientTimeout]:
+        if timeout is None:
+            return None
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+    @staticmethod
+    async def _send(session: aiohttp.ClientSession, method: str, url: str, params: Optional[Dict[str, Any]], json: Any,
+                    timeout: Optional[aiohttp.ClientTimeout], max_bytes: Optional[int]) -> AsyncHTTPResponse:
+        options = {"timeout": timeout} if timeout is not None else {}
+        async with session.request(method, url, params=params, json=json, **options) as response:
+            if max_bytes is None:
+                content = await response.read()
+            else:
+                content = await response.content.read(max_bytes + 1)
+                while len(content) <= max_bytes and not response.content.at_eof():
+                    more = await response.content.read(max_bytes + 1 - len(content))
+                    if not more:
+                        break
+                    content += more
+            return AsyncHTTPResponse(response.status, content)
+
+    async def close(self) -> None:
+        """
+        Close the underlying session and its connections.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from TileExecuter import TileExecutor
+from async_http_client import AsyncHTTPClient
+from circuit_breaker import EscalationError
+from compiled_workflow import CompiledWorkflow
+from input_channels import InputChannel
+from run_budget import BudgetExceededError, RunBudget
+from session_data import RetentionPolicy, SessionData
+from tiles_new import ParallelTile, TileRuntime
+from timer_scheduler import SYSTEM_CLOCK, SystemClock
+from workflowengine_new import WorkflowEngine, WorkflowManager, WorkflowStatus
+
+
+class AsyncWorkflowEngine:
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None, tile_executor: Optional[TileExecutor] = None,
+                 max_steps: Optional[int] = 100000, deadline_seconds: Optional[float] = None, tile_time_limit: Optional[float] = None,
+                 retention: Optional[RetentionPolicy] = None, clock: Optional[SystemClock] = None):
+        """
+        Initialize the AsyncWorkflowEngine, which runs many workflow sessions on one event loop.
+
+        Parameters:
+        - http_client: Shared async HTTP client for APICallTiles; one is created if omitted.
+        - tile_executor: TileExecutor whose tile instance cache is shared by all sessions.
+        - max_steps: Tiles one run may execute; None for no limit.
+        - deadline_seconds: Wall-clock seconds one run may take, waits for user input included.
+        - tile_time_limit: Seconds one non-interactive tile may take before it is cancelled.
+        - retention: How much of the tiles' outputs sessions keep (see session_data.RetentionPolicy).
+        - clock: The time WaitTiles wait against; the system clock by default. A waiting session
+          only holds its task, not a thread.
+
+        As in WorkflowEngine, a definition's own "limits" apply too and the smaller limit wins, and
+        how each run ended is recorded in workflow_manager.
+        """
+        self.logger = logging.getLogger("AsyncWorkflowEngine")
+        self.workflow_manager = WorkflowManager()
+        self.http_client = http_client or AsyncHTTPClient()
+        self.tile_executor = tile_executor or TileExecutor()
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.tile_time_limit = tile_time_limit
+        self.retention = retention
+        self.clock = clock or SYSTEM_CLOCK
+
+    async def run_workflow(self, workflow_id: str, workflow_definition: Union[CompiledWorkflow, Dict[str, Any]],
+                           input_queue: Optional[asyncio.Queue] = None,
+                           workflow_data: Optional[Dict[str, Any]] = None,
+                           channel: Optional[InputChannel] = None) -> Dict[str, Any]:
+        """
+        Run one workflow session to completion without blocking the event loop.
+
+        Parameters:
+        - workflow_id: The unique ID of the workflow session.
+        - workflow_definition: The compiled workflow, or the raw definition (compiled on the fly).
+        - input_queue: Queue the session's user replies are put on; UserInteractionTiles await it.
+        - workflow_data: Optional initial data for the session.
+        - channel: Input channel UserInteractionTiles ask on when there is no input_queue;
+          defaults to the executor's.
+
+        Returns:
+        - The SessionData at the end of the run; workflow_manager.get_workflow_status(workflow_id)
+          tells whether it is COMPLETED, FAILED, ESCALATED or BUDGET_EXCEEDED.
+        """
+        compiled = WorkflowEngine.compile_workflow(workflow_definition)
+        self.workflow_manager.start_workflow(workflow_id)
+        runtime = TileRuntime(session_id=workflow_id, http_client=self.http_client, input_queue=input_queue,
+                              channel=channel or self.tile_executor.channel)
+        workflow_data = SessionData.wrap(workflow_data, self.retention)
+        budget = RunBudget.combine(compiled.limits, self.max_steps, self.deadline_seconds, self.tile_time_limit)
+        self.logger.info(f"Starting workflow execution: {workflow_id}")
+
+        status = WorkflowStatus.COMPLETED
+        try:
+            current_tile_id = compiled.start_tile
+            while current_tile_id:
+                tile = compiled.get_tile(current_tile_id)
+                if tile is None:
+                    raise ValueError(f"Tile with ID {current_tile_id} not found.")
+                workflow_data = await self._execute_step(compiled, tile, workflow_data, runtime, budget)
+                current_tile_id = workflow_data.get("next_tile")
+            self.logger.info(f"Workflow {workflow_id} completed.")
+        except asyncio.CancelledError:
+            self.logger.info(f"Workflow {workflow_id} cancelled.")
+            raise
+        except BudgetExceededError as e:
+            self.logger.warning(f"Workflow {workflow_id} stopped: {e}")
+            status = WorkflowStatus.BUDGET_EXCEEDED
+        except EscalationError as e:
+            self.logger.warning(f"Workflow {workflow_id} escalated at tile {e.tile_id}: {e.action}")
+            status = WorkflowStatus.ESCALATED
+        except Exception as e:
+            self.logger.error(f"Error during workflow {workflow_id} execution: {str(e)}")
+            status = WorkflowStatus.FAILED
+        self.workflow_manager.set_status(workflow_id, status)
+        return workflow_data
+
+    async def _execute_step(self, compiled: CompiledWorkflow, tile: Dict[str, Any], workflow_data: Dict[str, Any], runtime: TileRuntime,
+                            budget: RunBudget) -> Dict[str, Any]:
+        # Unlike the threaded engine, a tile over its time limit is cancelled, not just reported.
+        # A WaitTile's sleep is not part of its time limit.
+        if tile.get("type") == "WaitTile":
+            instance = self.tile_executor.get_tile_instance(tile, compiled.key)
+            now = self.clock.time()
+            await self.clock.sleep_async(instance.wake_time(workflow_data, now) - now)
+        budget.charge(tile.get("id"))
+        if tile.get("type") == "ParallelTile":
+            step = self._run_parallel(compiled, tile, workflow_data, runtime, budget)
+        else:
+            step = self.tile_executor.execute_tile_async(tile, workflow_data, compiled.key, runtime)
+        timeout = budget.time_limit_for(tile)
+        if timeout is None:
+            return await step
+        try:
+            return await asyncio.wait_for(step, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise budget.timed_out(tile) from None
+
+    async def _run_parallel(self, compiled: CompiledWorkflow, tile: Dict[str, Any], workflow_data: Dict[str, Any], runtime: TileRuntime,
+                            budget: RunBudget) -> Dict[str, Any]:
+        """
+        Run the branches of a ParallelTile as concurrent tasks and merge their results;
+        branches still running once the join policy is decided are cancelled.
+        """
+        parallel = self.tile_executor.get_tile_instance(tile, compiled.key)
+        join = self.tile_executor.get_tile_instance(compiled.get_tile(parallel.join_tile), compiled.key)
+        required = join.required_count(len(parallel.branches))
+        results = {name: ("cancelled", None) for name, _ in parallel.branches}
+
+        tasks = {
+            asyncio.ensure_future(self._run_branch(compiled, start_tile, parallel.join_tile, workflow_data, runtime, budget)): name
+            for name, start_tile in parallel.branches
+        }
+        pending = set(tasks)
+        completed = failed = 0
+        try:
+            while pending and completed < required and failed <= len(tasks) - required:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    if task.exception() is None:
+                        results[name] = ("completed", task.result())
+                        completed += 1
+                    elif isinstance(task.exception(), BudgetExceededError):
+                        raise task.exception()
+                    else:
+                        self.logger.error(f"Branch {name} of tile {tile.get('id')} failed: {task.exception()}")
+                        results[name] = ("failed", None)
+                        failed += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        parallel.merge_results(workflow_data, results, join)
+        workflow_data.update(parallel.execute(workflow_data))
+        return workflow_data
+
+    async def _run_branch(self, compiled: CompiledWorkflow, start_tile_id: Any, join_tile_id: Any,
+                          workflow_data: Dict[str, Any], runtime: TileRuntime, budget: RunBudget) -> Dict[str, Any]:
+        branch_data = workflow_data.snapshot()
+        current_tile_id = start_tile_id
+        while current_tile_id is not None and current_tile_id != join_tile_id:
+            tile = compiled.get_tile(current_tile_id)
+            if tile is None:
+                raise ValueError(f"Tile with ID {current_tile_id} not found.")
+            branch_data = await self._execute_step(compiled, tile, branch_data, runtime, budget)
+            current_tile_id = branch_data.get("next_tile")
+        if current_tile_id != join_tile_id:
+            raise RuntimeError(f"Branch starting at tile {start_tile_id} ended before reaching join tile {join_tile_id}.")
+        return ParallelTile.branch_output(workflow_data, branch_data)
+
+    async def run_many(self, workflow_definition: Union[CompiledWorkflow, Dict[str, Any]], workflow_ids: Iterable[str],
+                       input_queues: Optional[Dict[str, asyncio.Queue]] = None,
+                       channel: Optional[InputChannel] = None) -> List[Dict[str, Any]]:
+        """
+        Run several sessions of the same workflow concurrently.
+
+        Parameters:
+        - workflow_definition: The compiled workflow, or the raw definition.
+        - workflow_ids: IDs of the sessions to start.
+        - input_queues: Optional input queue per session ID.
+        - channel: Input channel shared by the sessions without an input queue.
+
+        Returns:
+        - The final workflow data of every session, in the order of workflow_ids (their statuses
+          are in workflow_manager).
+        """
+        compiled = WorkflowEngine.compile_workflow(workflow_definition)
+        input_queues = input_queues or {}
+        return await asyncio.gather(*(
+            self.run_workflow(workflow_id, compiled, input_queues.get(workflow_id), channel=channel)
+            for workflow_id in workflow_ids
+        ))
+
+    async def close(self) -> None:
+        """
+        Release the shared HTTP client.
+        """
+        await self.http_client.close()
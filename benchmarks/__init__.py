@@ -0,0 +1,14 @@
+"""
+Benchmarks and load generation for the workflow engine.
+
+    python -m benchmarks.run_benchmarks --shape linear --tiles 200 --sessions 200
+    python -m benchmarks.run_benchmarks --all --save-baseline
+    python -m benchmarks.run_benchmarks --all --compare
+    python -m benchmarks.batching --engine sync --sessions 500
+    python -m benchmarks.service_load --sessions 2000 --think-time 0.5
+    python -m benchmarks.recovery --sessions 100000
+    python -m benchmarks.timers --timers 1000000
+    python -m benchmarks.extraction --items 4000
+
+Run from the repository root.
+"""
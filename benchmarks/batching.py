@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from TileExecuter import TileExecutor
+from async_workflow_engine import AsyncWorkflowEngine
+from circuit_breaker import UpstreamGuard
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer, bulk_route
+from workflowengine_new import WorkflowEngine
+
+
+def order_status(params: Dict[str, Any], body: Any):
+    return 200, {"order_id": params.get("order_id"), "order_status": "On Time"}
+
+
+def order_status_workflow(api_url: str, batch: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The order-status check of workflow1.json: one lookup per session, keyed by its order_id.
+    """
+    api_config = {"api_url": api_url, "params": {"order_id": "{{order_id}}"}, "next_tile": 2}
+    if batch:
+        api_config["batch"] = batch
+    return {
+        "workflow_name": "Order Status Check" + (" (batched)" if batch else ""),
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "name": "status", "type": "APICallTile", "configuration": api_config},
+            {"id": 2, "name": "on_time", "type": "LogicBuilderTile",
+             "configuration": {"condition": 'response.order_status == "On Time"'}},
+        ],
+    }
+
+
+def _check(results: List[Any]) -> int:
+    return sum(1 for data in results if (data.get("response") or {}).get("order_status") == "On Time")
+
+
+def run_threads(definition: Dict[str, Any], sessions: int, threads: int) -> List[Any]:
+    engine = WorkflowEngine()
+    engine.tile_executor = TileExecutor(tracer=Tracer(sample_rate=0.0), upstream_guard=UpstreamGuard())
+    compiled = engine.compile_workflow(definition)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda index: engine.run_workflow(f"s{index}", compiled, {"order_id": index}), range(sessions)))
+
+
+def run_async(definition: Dict[str, Any], sessions: int) -> List[Any]:
+    async def main():
+        engine = AsyncWorkflowEngine(tile_executor=TileExecutor(tracer=Tracer(sample_rate=0.0), upstream_guard=UpstreamGuard()))
+        compiled = WorkflowEngine.compile_workflow(definition)
+        try:
+            return await asyncio.gather(*(
+                engine.run_workflow(f"s{index}", compiled, workflow_data={"order_id": index}) for index in range(sessions)
+            ))
+        finally:
+            await engine.close()
+
+    return asyncio.run(main())
+
+
+def compare_batching(sessions: int = 500, threads: int = 50, api_latency: float = 0.005, window_ms: float = 5.0,
+                     max_batch_size: int = 50, engine: str = "async") -> List[Dict[str, Any]]:
+    """
+    Run the same concurrent sessions with and without micro-batching and count upstream requests.
+
+    Parameters:
+    - sessions: Sessions to run, each looking up its own order_id.
+    - threads: Worker threads for the sync engine.
+    - api_latency: Seconds the stub upstream sleeps per request.
+    - window_ms, max_batch_size: The APICallTile's batch settings.
+    - engine: "async" (AsyncWorkflowEngine on one loop) or "sync" (WorkflowEngine on a thread pool).
+
+    Returns:
+    - Per mode: upstream requests, seconds, sessions/s and sessions that got their result.
+    """
+    results = []
+    for batched in (False, True):
+        routes = {("GET", "/orders/status"): order_status, ("POST", "/orders/status/bulk"): bulk_route(order_status)}
+        with StubHTTPServer(routes, latency=api_latency) as server:
+            batch = {"bulk_url": server.url("/orders/status/bulk"), "window_ms": window_ms,
+                     "max_batch_size": max_batch_size} if batched else None
+            definition = order_status_workflow(server.url("/orders/status"), batch)
+            started = time.perf_counter()
+            if engine == "async":
+                finished = run_async(definition, sessions)
+            else:
+                finished = run_threads(definition, sessions, threads)
+            elapsed = time.perf_counter() - started
+            results.append({
+                "mode": "batched" if batched else "unbatched",
+                "upstream_requests": server.request_count,
+                "seconds": elapsed,
+                "sessions_per_sec": sessions / elapsed if elapsed else 0.0,
+                "ok": _check(finished),
+            })
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare upstream load with and without APICallTile micro-batching.")
+    parser.add_argument("--engine", choices=("async", "sync"), default="async")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=50, help="worker threads for --engine sync")
+    parser.add_argument("--api-latency", type=float, default=0.005, help="stub upstream latency in seconds")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = compare_batching(args.sessions, args.threads, args.api_latency, args.window_ms, args.max_batch_size, args.engine)
+    print(f"{'mode':<12}{'requests':>10}{'seconds':>10}{'sessions/s':>12}{'ok':>8}")
+    for result in results:
+        print(f"{result['mode']:<12}{result['upstream_requests']:>10,}{result['seconds']:>10.2f}"
+              f"{result['sessions_per_sec']:>12,.1f}{result['ok']:>8,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
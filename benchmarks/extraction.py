@@ -0,0 +1,79 @@
+import argparse
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+import json_extract
+from json_extract import CHUNK_SIZE, CompiledExtract
+
+
+def make_body(items: int) -> bytes:
+    """
+    An order lookup response with `items` line items of ~250 bytes each.
+    """
+    return json.dumps({
+        "order": {"id": 7, "status": "late", "eta": "2024-05-01T10:00:00Z"},
+        "items": [{"sku": f"sku-{index}", "description": "x" * 200, "quantity": index % 7, "price": 9.99} for index in range(items)],
+        "customer": {"tier": "gold", "history": list(range(items))},
+    }).encode("utf-8")
+
+
+def _measure(mode: str, parse, body: bytes, repeat: int) -> Dict[str, Any]:
+    chunks = [body[index:index + CHUNK_SIZE] for index in range(0, len(body), CHUNK_SIZE)]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        kept = parse(chunks)
+    seconds = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    parse(chunks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"mode": mode, "body_bytes": len(body), "ms": seconds * 1000, "peak_bytes": peak,
+            "kept_bytes": len(pickle.dumps(kept))}
+
+
+def measure_extraction(items: int = 4000, repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    Compare keeping a whole parsed response with keeping an extract of it.
+
+    Streaming stops reading once every path is found, so the extract is timed twice: fields at
+    the front of the body only, and one field from its very end.
+
+    Returns:
+    - One row per mode: parse time, peak allocation while parsing, and the pickled size of
+      what the session keeps.
+    """
+    body = make_body(items)
+    front = CompiledExtract({"status": "order.status", "eta": "order.eta"})
+    end = CompiledExtract({"status": "order.status", "tier": "customer.tier"})
+    rows = [_measure("json.loads, keep all", lambda chunks: json.loads(b"".join(chunks)), body, repeat)]
+    streaming, json_extract.ijson = json_extract.ijson, None
+    try:
+        rows.append(_measure("extract, json fallback", end.from_chunks, body, repeat))
+    finally:
+        json_extract.ijson = streaming
+    if streaming is not None:
+        rows.append(_measure("extract, ijson, front", front.from_chunks, body, repeat))
+        rows.append(_measure("extract, ijson, end", end.from_chunks, body, repeat))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time APICallTile response extraction against full parsing.")
+    parser.add_argument("--items", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = measure_extraction(args.items, args.repeat)
+    print(f"body: {rows[0]['body_bytes'] / 1e6:.1f} MB" + ("" if json_extract.ijson else " (ijson not installed)"))
+    print(f"{'mode':<26}{'ms':>10}{'peak MB':>10}{'kept bytes':>12}")
+    for row in rows:
+        print(f"{row['mode']:<26}{row['ms']:>10.1f}{row['peak_bytes'] / 1e6:>10.1f}{row['kept_bytes']:>12,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from TileExecuter import TileExecutor
+from benchmarks.workflow_generator import generate_workflow
+from execution_journal import ExecutionJournal
+from instrumentation import Tracer
+from workflow_manager import WorkflowManager
+from workflow_registry import WorkflowRegistry
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+
+
+def _engine(journal: Optional[ExecutionJournal]) -> WorkflowEngine:
+    engine = WorkflowEngine(journal=journal)
+    engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False))
+    return engine
+
+
+def _drive(engine: WorkflowEngine, compiled, sessions: int) -> float:
+    # Every session starts and waits at its first question; two in three answer it and wait at
+    # the next one, and one in ten answers that too and completes.
+    started = time.perf_counter()
+    for index in range(sessions):
+        session_id = f"s{index}"
+        result = engine.advance(compiled, compiled.start_tile, {"session": session_id}, workflow_id=session_id)
+        replies = 2 if index % 10 == 0 else 1 if index % 3 else 0
+        for _ in range(replies):
+            if result["status"] != WorkflowStatus.WAITING:
+                break
+            result = engine.advance(compiled, result["current_tile_id"], result["workflow_data"], result["prompt"]["options"][0],
+                                    workflow_id=session_id)
+    return time.perf_counter() - started
+
+
+def _size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def measure_recovery(sessions: int = 100000, tiles: int = 40, fsync: bool = True) -> List[Dict[str, Any]]:
+    """
+    Journal `sessions` sessions, drop the journal as a crash would, and time bringing them back.
+
+    The sessions run a generated branching workflow to their first or second question (a tenth
+    complete). Recovery is timed three ways: folding the raw journal segments, folding the
+    snapshot compaction leaves, and WorkflowManager.recover() on top of the snapshot, which also
+    re-renders each session's prompt and checkpoints it into a fresh session store.
+
+    Returns:
+    - One row per measurement: seconds, sessions/s, sessions recovered, journal records and bytes.
+    """
+    definition = generate_workflow("branching", tiles)
+    directory = tempfile.mkdtemp(prefix="journal-bench-")
+    rows = []
+    try:
+        plain = _engine(None)
+        compiled = plain.compile_workflow(definition)
+        baseline = _drive(plain, compiled, sessions)
+        rows.append({"mode": "run without journal", "seconds": baseline, "sessions": sessions})
+
+        # Waiting for durability per call would serialise this single-threaded driver on fsyncs;
+        # commit once at the end instead, as a crash right after it would leave things.
+        journal = ExecutionJournal(directory, fsync=fsync, commit_on_suspend=False, segment_bytes=1 << 40)
+        journaled = _engine(journal)
+        elapsed = _drive(journaled, compiled, sessions)
+        journal.commit()
+        stats = journal.stats()
+        rows.append({"mode": "run with journal", "seconds": elapsed, "sessions": sessions, "records": stats["records"],
+                     "bytes": _size(directory), "syncs": stats["syncs"]})
+        live = stats["live_sessions"]
+        journal.close()
+
+        recovering = ExecutionJournal(directory, fsync=fsync)
+        started = time.perf_counter()
+        recovered = recovering.recover()
+        rows.append({"mode": "recover from segments", "seconds": time.perf_counter() - started, "sessions": len(recovered),
+                     "records": stats["records"], "bytes": _size(directory)})
+        if len(recovered) != live:
+            raise RuntimeError(f"Recovered {len(recovered)} sessions, expected {live}.")
+        started = time.perf_counter()
+        recovering.compact()
+        rows.append({"mode": "compact", "seconds": time.perf_counter() - started, "sessions": len(recovered),
+                     "bytes": _size(directory)})
+        recovering.close()
+
+        started = time.perf_counter()
+        recovered = ExecutionJournal(directory, fsync=fsync).recover()
+        rows.append({"mode": "recover from snapshot", "seconds": time.perf_counter() - started, "sessions": len(recovered),
+                     "bytes": _size(directory)})
+
+        registry = WorkflowRegistry()
+        registry.register(compiled)
+        manager = WorkflowManager(workflow_engine=_engine(ExecutionJournal(directory, fsync=fsync, commit_on_suspend=False)),
+                                  registry=registry)
+        started = time.perf_counter()
+        resumed = manager.recover()
+        rows.append({"mode": "manager.recover", "seconds": time.perf_counter() - started, "sessions": len(resumed)})
+        manager.workflow_engine.journal.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    for row in rows:
+        row["sessions_per_sec"] = row["sessions"] / row["seconds"] if row["seconds"] else 0.0
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time crash recovery from the execution journal.")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--tiles", type=int, default=40)
+    parser.add_argument("--no-fsync", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = measure_recovery(args.sessions, args.tiles, not args.no_fsync)
+    print(f"{'mode':<24}{'seconds':>10}{'sessions':>10}{'sessions/s':>12}{'records':>10}{'MB':>8}")
+    for row in rows:
+        records = f"{row['records']:>10,}" if "records" in row else f"{'':>10}"
+        size = f"{row['bytes'] / 1e6:>8.1f}" if "bytes" in row else f"{'':>8}"
+        print(f"{row['mode']:<24}{row['seconds']:>10.2f}{row['sessions']:>10,}{row['sessions_per_sec']:>12,.0f}{records}{size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from TileExecuter import TileExecutor
+from benchmarks.workflow_generator import SHAPES, generate_workflow, scripted_answers
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowEngine
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+class _SampleTracer(Tracer):
+    # Keeps every step's duration: the histograms' buckets double in width, too coarse to gate p99 on.
+    def __init__(self):
+        super().__init__(sample_rate=0.0)
+        self.samples: List[float] = []
+
+    def record(self, workflow_id, tile_id, tile_type, started, duration, outcome, error=None) -> None:
+        super().record(workflow_id, tile_id, tile_type, started, duration, outcome, error)
+        self.samples.append(duration)
+
+    def reset(self) -> None:
+        super().reset()
+        self.samples = []
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples; 0.0 when there are none.
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))]
+
+
+def _make_engine() -> WorkflowEngine:
+    engine = WorkflowEngine()
+    # A private tracer: spans off (sample_rate=0), every step duration kept for exact percentiles.
+    engine.tile_executor = TileExecutor(tracer=_SampleTracer())
+    return engine
+
+
+def run_scenario(shape: str, num_tiles: int, sessions: int, api_latency: float = 0.0, api_every: int = 10,
+                 loop_iterations: int = 5, memory_sessions: int = 20) -> Dict[str, Any]:
+    """
+    Run `sessions` scripted sessions of a generated workflow through WorkflowEngine.run_workflow.
+
+    Parameters:
+    - shape: Workflow shape, see workflow_generator.SHAPES.
+    - num_tiles: Size of the generated workflow.
+    - sessions: Number of sessions to run back to back.
+    - api_latency: Seconds the stub upstream sleeps per request.
+    - api_every: Every api_every-th body tile is an APICallTile (0 for none).
+    - loop_iterations: Times a loop workflow goes round before answering "stop".
+    - memory_sessions: Sessions kept alive while measuring retained memory per session.
+
+    Returns:
+    - Steps/s, sessions/s, p50/p99 step latency and retained bytes per session.
+    """
+    with StubHTTPServer({("GET", "/status"): {"status": "ok", "eta_minutes": 12}}, latency=api_latency) as server:
+        definition = generate_workflow(shape, num_tiles, server.url("/status") if api_every else None, api_every)
+        engine = _make_engine()
+        compiled = engine.compile_workflow(definition)
+
+        # Warm-up: builds the cached tile instances and opens pooled connections.
+        engine.run_workflow("warmup", compiled, {"session": "warmup"}, scripted_answers(shape, 0, loop_iterations))
+        engine.tile_executor.tracer.reset()
+
+        started = time.perf_counter()
+        for index in range(sessions):
+            session_id = f"s{index}"
+            engine.run_workflow(session_id, compiled, {"session": session_id}, scripted_answers(shape, index, loop_iterations))
+        elapsed = time.perf_counter() - started
+
+        samples = sorted(engine.tile_executor.tracer.samples)
+
+        # Retained memory: keep the final data of memory_sessions sessions alive and measure.
+        gc.collect()
+        tracemalloc.start()
+        baseline_bytes = tracemalloc.get_traced_memory()[0]
+        kept: List[Dict[str, Any]] = []
+        for index in range(memory_sessions):
+            session_id = f"m{index}"
+            kept.append(engine.run_workflow(session_id, compiled, {"session": session_id}, scripted_answers(shape, index, loop_iterations)))
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline_bytes
+        tracemalloc.stop()
+
+    steps = len(samples)
+    return {
+        "shape": shape,
+        "tiles": num_tiles,
+        "sessions": sessions,
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_sec": steps / elapsed if elapsed else 0.0,
+        "sessions_per_sec": sessions / elapsed if elapsed else 0.0,
+        "p50_step_ms": percentile(samples, 0.50) * 1000,
+        "p99_step_ms": percentile(samples, 0.99) * 1000,
+        "bytes_per_session": retained / memory_sessions if memory_sessions else 0.0,
+    }
+
+
+def scenario_key(result: Dict[str, Any]) -> str:
+    return f"{result['shape']}-{result['tiles']}"
+
+
+def load_baselines(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def save_baselines(path: str, results: List[Dict[str, Any]]) -> None:
+    baselines = load_baselines(path)
+    for result in results:
+        baselines[scenario_key(result)] = dict(result, recorded_at=time.time(), python=platform.python_version())
+    with open(path, "w") as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+
+
+def compare(results: List[Dict[str, Any]], baselines: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions beyond tolerance (a fraction) in throughput, p99 latency or memory.
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(scenario_key(result))
+        if baseline is None:
+            continue
+        key = scenario_key(result)
+        if result["steps_per_sec"] < baseline["steps_per_sec"] * (1 - tolerance):
+            regressions.append(f"{key}: steps/s {result['steps_per_sec']:.0f} vs baseline {baseline['steps_per_sec']:.0f}")
+        if result["p99_step_ms"] > baseline["p99_step_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p99 {result['p99_step_ms']:.3f}ms vs baseline {baseline['p99_step_ms']:.3f}ms")
+        if result["bytes_per_session"] > baseline["bytes_per_session"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['bytes_per_session']:.0f} B/session vs baseline {baseline['bytes_per_session']:.0f}")
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<22}{'steps/s':>12}{'sessions/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'B/session':>12}")
+    for result in results:
+        print(f"{scenario_key(result):<22}{result['steps_per_sec']:>12,.0f}{result['sessions_per_sec']:>12,.1f}"
+              f"{result['p50_step_ms']:>10.3f}{result['p99_step_ms']:>10.3f}{result['bytes_per_session']:>12,.0f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark WorkflowEngine.run_workflow on synthetic workflows.")
+    parser.add_argument("--shape", choices=SHAPES, default="linear")
+    parser.add_argument("--all", action="store_true", help="run every shape")
+    parser.add_argument("--tiles", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="stub upstream latency in seconds")
+    parser.add_argument("--api-every", type=int, default=10, help="every Nth tile is an APICallTile (0 for none)")
+    parser.add_argument("--loop-iterations", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="exit non-zero on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    shapes = SHAPES if args.all else (args.shape,)
+    results = [
+        run_scenario(shape, args.tiles, args.sessions, args.api_latency, args.api_every, args.loop_iterations)
+        for shape in shapes
+    ]
+    print_results(results)
+
+    if args.compare:
+        regressions = compare(results, load_baselines(args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        save_baselines(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
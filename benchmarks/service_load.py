@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from TileExecuter import TileExecutor
+from benchmarks.workflow_generator import generate_workflow
+from instrumentation import LatencyHistogram, Tracer
+from workflow_manager import WorkflowManager
+from workflow_service import TERMINAL_STATUSES, WorkflowService
+from workflowengine_new import WorkflowEngine
+
+
+async def _request(client: aiohttp.ClientSession, method: str, url: str, stats: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    # Retries refused (503) requests after the advertised delay, jittered so refused clients do
+    # not come back in lockstep, like a well-behaved frontend.
+    while True:
+        start = time.perf_counter()
+        async with client.request(method, url, **kwargs) as response:
+            body = await response.json()
+            stats["latency"].record(time.perf_counter() - start)
+            if response.status != 503:
+                if response.status >= 400:
+                    raise RuntimeError(f"{method} {url} -> {response.status}: {body}")
+                return body
+            stats["refused"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")) * random.uniform(0.5, 1.5))
+
+
+async def _watch(client: aiohttp.ClientSession, url: str, stats: Dict[str, Any]) -> None:
+    async with client.get(url) as response:
+        async for line in response.content:
+            if line.startswith(b"event:"):
+                stats["events"] += 1
+
+
+async def _session(client: aiohttp.ClientSession, base_url: str, index: int, stream: bool, think_time: float,
+                   stats: Dict[str, Any]) -> None:
+    state = await _request(client, "POST", f"{base_url}/sessions", stats,
+                           json={"workflow": "load", "session_id": f"s{index}", "data": {"session": f"s{index}"}})
+    watcher = asyncio.create_task(_watch(client, f"{base_url}/sessions/s{index}/events", stats)) if stream else None
+    stats["open"] += 1
+    stats["peak_open"] = max(stats["peak_open"], stats["open"])
+    try:
+        while state["status"] not in TERMINAL_STATUSES:
+            if think_time:
+                await asyncio.sleep(think_time)
+            state = await _request(client, "POST", f"{base_url}/sessions/s{index}/reply", stats,
+                                   json={"reply": state["prompt"]["options"][0]})
+    finally:
+        stats["open"] -= 1
+    stats["statuses"][state["status"]] = stats["statuses"].get(state["status"], 0) + 1
+    if watcher is not None:
+        await asyncio.wait_for(watcher, 10)
+
+
+async def run_load(sessions: int = 2000, tiles: int = 40, think_time: float = 0.5, stream_every: int = 10,
+                   workers: int = 16, max_pending: int = 500) -> Dict[str, Any]:
+    """
+    Drive `sessions` concurrent conversations through a WorkflowService over real HTTP.
+
+    Every session starts, then answers each prompt after think_time seconds (so thousands of
+    sessions are open at once, waiting on their users) until it completes; every stream_every-th
+    session also follows its event stream.
+
+    Returns:
+    - Sessions/s, request latency percentiles, refused (503) requests, peak open sessions and
+      events received.
+    """
+    engine = WorkflowEngine()
+    engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False))
+    manager = WorkflowManager(workflow_engine=engine)
+    definition = generate_workflow("branching", tiles)
+    definition["workflow_name"] = "load"
+    manager.register_workflow(definition)
+    service = WorkflowService(manager, max_pending=max_pending, workers=workers)
+
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = "http://%s:%d" % runner.addresses[0][:2]
+
+    stats: Dict[str, Any] = {"latency": LatencyHistogram(), "refused": 0, "open": 0, "peak_open": 0, "events": 0, "statuses": {}}
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                _session(client, base_url, index, bool(stream_every) and index % stream_every == 0, think_time, stats)
+                for index in range(sessions)
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        await runner.cleanup()
+
+    latency = stats["latency"].summary()
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "sessions_per_sec": sessions / elapsed if elapsed else 0.0,
+        "requests": latency["count"],
+        "p50_ms": latency["p50"] * 1000,
+        "p99_ms": latency["p99"] * 1000,
+        "refused": stats["refused"],
+        "peak_open_sessions": stats["peak_open"],
+        "events": stats["events"],
+        "statuses": stats["statuses"],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the HTTP workflow service.")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--tiles", type=int, default=40)
+    parser.add_argument("--think-time", type=float, default=0.5, help="seconds a simulated user takes per answer")
+    parser.add_argument("--stream-every", type=int, default=10, help="every Nth session follows its event stream (0: none)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    result = asyncio.run(run_load(args.sessions, args.tiles, args.think_time, args.stream_every, args.workers, args.max_pending))
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import argparse
+import gc
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from timer_scheduler import FakeClock, TimerScheduler
+from workflow_manager import WorkflowManager
+from workflowengine_new import WorkflowEngine
+
+
+def _timed(rows: List[Dict[str, Any]], mode: str, count: int, started: float) -> None:
+    seconds = time.perf_counter() - started
+    rows.append({"mode": mode, "seconds": seconds, "count": count, "per_sec": count / seconds if seconds else 0.0})
+
+
+def measure_scheduler(timers: int = 1000000, horizon: float = 86400.0, batch: int = 1000, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Schedule `timers` timers spread over `horizon` seconds, reschedule and cancel a tenth of them,
+    then fire them all in batches of `batch` while a fake clock sweeps the horizon.
+
+    Returns:
+    - One row per phase: seconds, count and count/s; the schedule row also carries the bytes
+      the pending timers take.
+    """
+    rng = random.Random(seed)
+    dues = [rng.uniform(0, horizon) for _ in range(timers)]
+    keys = [f"session-{index}" for index in range(timers)]
+    scheduler = TimerScheduler(FakeClock(0))
+    rows = []
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for key, due in zip(keys, dues):
+        scheduler.schedule(key, due)
+    _timed(rows, "schedule", timers, started)
+    rows[-1]["bytes"] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    churn = keys[::10]
+    started = time.perf_counter()
+    for index, key in enumerate(churn):
+        if index % 2:
+            scheduler.cancel(key)
+        else:
+            scheduler.schedule(key, rng.uniform(0, horizon))
+    _timed(rows, "reschedule/cancel", len(churn), started)
+
+    pending = len(scheduler)
+    fired = 0
+    started = time.perf_counter()
+    now = 0.0
+    while len(scheduler):
+        now += horizon / 1000
+        while True:
+            due = scheduler.pop_due(now, batch)
+            fired += len(due)
+            if len(due) < batch:
+                break
+    _timed(rows, f"fire in batches of {batch}", fired, started)
+    if fired != pending:
+        raise RuntimeError(f"Fired {fired} timers, expected {pending}.")
+    return rows
+
+
+def measure_sessions(sessions: int = 20000, batch: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Park `sessions` WorkflowManager sessions on a WaitTile and wake them all through run_due_timers.
+    """
+    clock = FakeClock(0)
+    manager = WorkflowManager(workflow_engine=WorkflowEngine(clock=clock))
+    manager.register_workflow({"workflow_name": "wait", "start_tile": "wait", "tiles": [
+        {"id": "wait", "type": "WaitTile", "name": "wait", "configuration": {"seconds": "{{delay}}", "next_tile": "done"}},
+        {"id": "done", "type": "FlowJumpTile", "name": "done", "configuration": {}},
+    ]})
+    rows = []
+    started = time.perf_counter()
+    for index in range(sessions):
+        manager.start_workflow(f"s{index}", "wait", {"delay": 1 + index % 600})
+    _timed(rows, "park sessions", sessions, started)
+
+    clock.advance(601)
+    woken = 0
+    started = time.perf_counter()
+    while True:
+        resumed = manager.run_due_timers(batch)
+        woken += len(resumed)
+        if len(resumed) < batch:
+            break
+    _timed(rows, "wake sessions", woken, started)
+    if woken != sessions:
+        raise RuntimeError(f"Woke {woken} sessions, expected {sessions}.")
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time the timer scheduler behind WaitTile.")
+    parser.add_argument("--timers", type=int, default=1000000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = measure_scheduler(args.timers, batch=args.batch) + measure_sessions(args.sessions, args.batch)
+    print(f"{'mode':<26}{'seconds':>10}{'count':>12}{'per second':>14}{'MB':>8}")
+    for row in rows:
+        size = f"{row['bytes'] / 1e6:>8.1f}" if "bytes" in row else f"{'':>8}"
+        print(f"{row['mode']:<26}{row['seconds']:>10.2f}{row['count']:>12,}{row['per_sec']:>14,.0f}{size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
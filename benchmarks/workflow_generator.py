@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional
+
+from input_channels import CallbackChannel
+
+SHAPES = ("linear", "branching", "loop")
+
+
+def _tile(tile_id: int, tile_type: str, configuration: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": tile_id, "name": f"{tile_type}-{tile_id}", "type": tile_type, "configuration": configuration}
+
+
+def generate_workflow(shape: str = "linear", num_tiles: int = 100, api_url: Optional[str] = None,
+                      api_every: int = 10, question_every: int = 0) -> Dict[str, Any]:
+    """
+    Build a synthetic workflow definition in the workflow1.json format.
+
+    Parameters:
+    - shape: "linear" (a chain), "branching" (each question splits into two paths that merge
+      again) or "loop" (a FlowJumpTile sends control back to a question until the answer is "stop").
+    - num_tiles: Approximate number of tiles in the body of the workflow.
+    - api_url: URL for APICallTiles (e.g. a StubHTTPServer route); no API tiles when None.
+    - api_every: Every api_every-th body tile is an APICallTile (when api_url is set).
+    - question_every: Every question_every-th body tile is a UserInteractionTile (0 for none
+      in linear flows; branching and loop flows always ask at their decision points).
+
+    Returns:
+    - The workflow definition dictionary.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unsupported workflow shape: {shape}")
+    tiles: List[Dict[str, Any]] = []
+    next_id = [1]
+
+    def new_id() -> int:
+        tile_id = next_id[0]
+        next_id[0] += 1
+        return tile_id
+
+    def body_tile(tile_id: int, position: int, next_tile: Optional[int]) -> Dict[str, Any]:
+        if api_url and api_every and position % api_every == api_every - 1:
+            return _tile(tile_id, "APICallTile", {"api_url": api_url, "params": {"step": str(position), "session": "{{session}}"},
+                                                  "next_tile": next_tile})
+        if question_every and position % question_every == question_every - 1:
+            return _tile(tile_id, "UserInteractionTile", {"prompt": f"Question {position} for {{{{session}}}}?",
+                                                          "options": ["left", "right"], "next_tile": next_tile})
+        if position % 2:
+            return _tile(tile_id, "FlowJumpTile", {"jump_target": next_tile})
+        return _tile(tile_id, "LogicBuilderTile", {"condition": "session != null", "true_tile": next_tile, "false_tile": next_tile})
+
+    def chain(length: int, end: Optional[int], offset: int = 0) -> Optional[int]:
+        # Build a chain of `length` body tiles ending in `end`; returns the first tile id.
+        ids = [new_id() for _ in range(length)]
+        for position, tile_id in enumerate(ids):
+            following = ids[position + 1] if position + 1 < len(ids) else end
+            tiles.append(body_tile(tile_id, offset + position, following))
+        return ids[0] if ids else end
+
+    if shape == "linear":
+        start = chain(num_tiles, None)
+    elif shape == "branching":
+        segment = 8
+        start = None
+        merge_to: Optional[int] = None
+        # Build back to front: question -> decision -> (left | right) -> next question.
+        for block in range(max(1, num_tiles // (2 * segment + 2))):
+            question_id, decision_id = new_id(), new_id()
+            left = chain(segment, merge_to, block * segment)
+            right = chain(segment, merge_to, block * segment + 1)
+            tiles.append(_tile(question_id, "UserInteractionTile", {"prompt": f"Branch {block}?", "options": ["left", "right"],
+                                                                    "next_tile": decision_id}))
+            tiles.append(_tile(decision_id, "LogicBuilderTile", {"condition": 'selected_option == "left"',
+                                                                 "true_tile": left, "false_tile": right}))
+            merge_to = question_id
+        start = merge_to
+    else:
+        question_id, decision_id, jump_id = new_id(), new_id(), new_id()
+        body = chain(max(1, num_tiles - 3), jump_id)
+        tiles.append(_tile(question_id, "UserInteractionTile", {"prompt": "Again?", "options": ["again", "stop"],
+                                                                "next_tile": decision_id}))
+        tiles.append(_tile(decision_id, "LogicBuilderTile", {"condition": 'selected_option == "again"',
+                                                             "true_tile": body, "false_tile": None}))
+        tiles.append(_tile(jump_id, "FlowJumpTile", {"jump_target": question_id}))
+        start = question_id
+
+    tiles.sort(key=lambda tile: tile["id"])
+    return {
+        "workflow_name": f"bench-{shape}-{num_tiles}",
+        "start_tile": start,
+        "tiles": tiles,
+        "connections": [],
+    }
+
+
+def scripted_answers(shape: str, session_index: int, loop_iterations: int = 5) -> CallbackChannel:
+    """
+    Deterministic answers for a generated workflow: alternating branch choices, or
+    loop_iterations times "again" followed by "stop".
+
+    Returns:
+    - An input channel for one session, for WorkflowEngine.run_workflow.
+    """
+    counter = [0]
+
+    def answer(session_id: Optional[str], prompt: Dict[str, Any]) -> str:
+        counter[0] += 1
+        if shape == "loop":
+            return "again" if counter[0] <= loop_iterations else "stop"
+        return "left" if (counter[0] + session_index) % 2 else "right"
+    return CallbackChannel(answer)
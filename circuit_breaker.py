@@ -0,0 +1,457 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("CircuitBreaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Response codes that count against an upstream's health; other statuses are the caller's problem.
+FAILURE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class UpstreamError(RuntimeError):
+    def __init__(self, host: str, reason: str, message: str):
+        """
+        An APICallTile's upstream did not give a usable response.
+
+        Parameters:
+        - host: The upstream host (netloc).
+        - reason: "circuit_open", "bulkhead_full", "status", "too_large" or "error".
+        - message: Human readable description.
+        """
+        super().__init__(message)
+        self.host = host
+        self.reason = reason
+
+
+class EscalationError(UpstreamError):
+    def __init__(self, error: UpstreamError, action: str, output: Dict[str, Any]):
+        """
+        An upstream call failed and its tile has no fallback_tile, only a fallback_action for a
+        person to take: the run ends ESCALATED instead of carrying on as if the call had worked.
+
+        Parameters:
+        - error: The failure.
+        - action: The tile's fallback_action, e.g. "Escalate to Support Agent".
+        - output: The tile output describing the failure; it is kept in the session data.
+        """
+        super().__init__(error.host, error.reason, str(error))
+        self.action = action
+        self.output = output
+        self.tile_id: Any = None  # set by the TileExecutor
+
+    def report(self) -> Dict[str, Any]:
+        return {"reason": self.reason, "host": self.host, "message": str(self), "fallback_action": self.action}
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(host, "circuit_open", f"Circuit for {host} is open; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class BulkheadFullError(UpstreamError):
+    def __init__(self, host: str, limit: int):
+        super().__init__(host, "bulkhead_full", f"{limit} calls to {host} are already in flight")
+        self.limit = limit
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, min_calls: int = 20, window_seconds: float = 30.0,
+                 open_seconds: float = 10.0, half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Failure-rate circuit breaker for one upstream.
+
+        Closed: calls go through and their outcomes are kept for window_seconds. Once at least
+        min_calls are in the window and failure_rate_threshold of them failed, it opens.
+        Open: calls are rejected for open_seconds. Half-open: up to half_open_max_calls trial
+        calls go through; a success closes the circuit again, a failure reopens it.
+
+        Every state change starts a new generation. before_call returns the generation the call
+        was admitted in, and record / cancel ignore calls from an earlier one: a slow call admitted
+        while closed must not close (or reopen) the circuit, or free a trial slot, after it changed.
+
+        Parameters:
+        - name: Used in errors and logs, normally the host.
+        - failure_rate_threshold: Fraction of failed calls (0-1) that opens the circuit.
+        - min_calls: Calls the window must hold before the rate is trusted.
+        - window_seconds: How long call outcomes count.
+        - open_seconds: How long the circuit stays open before trial calls.
+        - half_open_max_calls: Concurrent trial calls allowed while half-open.
+        - clock: Monotonic time source.
+        """
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be in (0, 1]")
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (time, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def before_call(self) -> int:
+        """
+        Admit a call, or reject it while the circuit is open.
+
+        Returns:
+        - The admission, to hand to record or cancel when the call is over.
+
+        Raises:
+        - CircuitOpenError: When the call must not go to the upstream.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                retry_after = self._opened_at + self.open_seconds - self.clock()
+                if retry_after > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_after)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._trial_calls += 1
+            return self._generation
+
+    def record(self, admission: int, failed: bool) -> None:
+        """
+        Account for the outcome of an admitted call.
+
+        Parameters:
+        - admission: What before_call returned for the call.
+        - failed: Whether the call counts as a failure.
+        """
+        with self._lock:
+            if admission != self._generation:
+                # Admitted under an earlier state; its outcome no longer counts.
+                return
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._trial_calls -= 1
+                if failed:
+                    self._open(now)
+                else:
+                    self._transition(CLOSED)
+                return
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._expire(now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate_threshold:
+                self._open(now)
+
+    def cancel(self, admission: int) -> None:
+        """
+        Give back an admitted call that never reached the upstream (or was abandoned).
+        """
+        with self._lock:
+            if admission == self._generation and self.state == HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def _expire(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._failures -= self._outcomes.popleft()[1]
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        # Caller holds self._lock.
+        if state != HALF_OPEN:
+            self._outcomes.clear()
+            self._failures = 0
+            self._trial_calls = 0
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit for %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(self.clock())
+            return {"state": self.state, "calls": len(self._outcomes), "failures": self._failures, "rejected": self.rejected}
+
+
+class _Waiter:
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, event: Optional[threading.Event] = None, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.event = event
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.0):
+        """
+        Caps the calls in flight to one upstream, so a slow one cannot tie up every worker.
+
+        Calls that have to wait for a slot get one in the order they arrived, whether they wait
+        on a thread (acquire) or on an event loop (acquire_async); a freed slot is handed straight
+        to the first waiter.
+
+        Parameters:
+        - name: Used in errors, normally the host.
+        - max_concurrent: Calls allowed in flight at once.
+        - max_wait: Seconds a call may wait for a free slot before it is rejected; 0 fails fast.
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _try_acquire(self) -> bool:
+        # Caller holds self._lock. Nobody may overtake calls already waiting.
+        if self._in_flight < self.max_concurrent and not self._waiters:
+            self._in_flight += 1
+            return True
+        if self.max_wait <= 0:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, self.max_concurrent)
+        return False
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """
+        Stop waiting; returns whether the slot had been handed over in the meantime.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self) -> None:
+        """
+        Raises:
+        - BulkheadFullError: When no slot frees up within max_wait.
+        """
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        waiter.event.wait(self.max_wait)
+        if not self._withdraw(waiter):
+            self.rejected += 1
+            raise BulkheadFullError(self.name, self.max_concurrent)
+
+    async def acquire_async(self) -> None:
+        """
+        Async counterpart of acquire; waits without blocking the event loop.
+        """
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _Waiter(loop=asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter.future,), timeout=self.max_wait)
+        except asyncio.CancelledError:
+            if self._withdraw(waiter):
+                self.release()
+            raise
+        if not self._withdraw(waiter):
+            self.rejected += 1
+            raise BulkheadFullError(self.name, self.max_concurrent)
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.loop is not None and waiter.loop.is_closed():
+                    continue
+                # The slot passes to the waiter: calls in flight stay the same.
+                waiter.granted = True
+                waiter.wake()
+                return
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+
+class UpstreamGuard:
+    def __init__(self, failure_rate_threshold: float = 0.5, min_calls: int = 20, window_seconds: float = 30.0,
+                 open_seconds: float = 10.0, half_open_max_calls: int = 1, max_concurrent_per_host: Optional[int] = None,
+                 max_wait: float = 0.0, clock: Callable[[], float] = time.monotonic):
+        """
+        A circuit breaker and a bulkhead per upstream host, shared by every APICallTile.
+
+        Parameters:
+        - failure_rate_threshold, min_calls, window_seconds, open_seconds, half_open_max_calls:
+          CircuitBreaker settings, applied to each host.
+        - max_concurrent_per_host: Bulkhead size per host; None for no bulkhead.
+        - max_wait: Seconds a call may wait for a bulkhead slot.
+        - clock: Monotonic time source.
+        """
+        self.breaker_settings = dict(failure_rate_threshold=failure_rate_threshold, min_calls=min_calls,
+                                     window_seconds=window_seconds, open_seconds=open_seconds,
+                                     half_open_max_calls=half_open_max_calls, clock=clock)
+        self.max_concurrent_per_host = max_concurrent_per_host
+        self.max_wait = max_wait
+        self._hosts: Dict[str, Tuple[CircuitBreaker, Optional[Bulkhead]]] = {}
+        self._lock = threading.Lock()
+
+    def _for_host(self, host: str) -> Tuple[CircuitBreaker, Optional[Bulkhead]]:
+        guards = self._hosts.get(host)
+        if guards is None:
+            with self._lock:
+                guards = self._hosts.get(host)
+                if guards is None:
+                    bulkhead = None
+                    if self.max_concurrent_per_host:
+                        bulkhead = Bulkhead(host, self.max_concurrent_per_host, self.max_wait)
+                    guards = (CircuitBreaker(host, **self.breaker_settings), bulkhead)
+                    self._hosts[host] = guards
+        return guards
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlsplit(url).netloc
+
+    @staticmethod
+    def _failed(response: Any) -> bool:
+        return getattr(response, "status_code", None) in FAILURE_STATUSES
+
+    def call(self, url: str, send: Callable[[], Any]) -> Any:
+        """
+        Send a request to url's host through its breaker and bulkhead.
+
+        Parameters:
+        - url: The request URL; its host selects the breaker.
+        - send: Performs the request and returns the response.
+
+        Returns:
+        - The response; 429 and 5xx responses are returned too, but count as failures.
+
+        Raises:
+        - CircuitOpenError, BulkheadFullError: When the request was not sent.
+        """
+        breaker, bulkhead = self._for_host(self.host_of(url))
+        admission = breaker.before_call()
+        try:
+            if bulkhead is not None:
+                bulkhead.acquire()
+        except BulkheadFullError:
+            breaker.cancel(admission)
+            raise
+        try:
+            response = send()
+        except Exception:
+            breaker.record(admission, True)
+            raise
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+        breaker.record(admission, self._failed(response))
+        return response
+
+    async def call_async(self, url: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of call; send returns an awaitable.
+        """
+        breaker, bulkhead = self._for_host(self.host_of(url))
+        admission = breaker.before_call()
+        try:
+            if bulkhead is not None:
+                await bulkhead.acquire_async()
+        except (BulkheadFullError, asyncio.CancelledError):
+            breaker.cancel(admission)
+            raise
+        try:
+            response = await send()
+        except asyncio.CancelledError:
+            # Cancelled by a time limit or the caller: says nothing about the upstream.
+            breaker.cancel(admission)
+            raise
+        except Exception:
+            breaker.record(admission, True)
+            raise
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+        breaker.record(admission, self._failed(response))
+        return response
+
+    def state(self, host: str) -> str:
+        return self._for_host(host)[0].state
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per host: circuit state, calls and failures in the window, rejected calls and calls in flight.
+        """
+        with self._lock:
+            hosts = dict(self._hosts)
+        stats = {}
+        for host, (breaker, bulkhead) in hosts.items():
+            entry = breaker.stats()
+            if bulkhead is not None:
+                entry["in_flight"] = bulkhead.in_flight
+                entry["bulkhead_rejected"] = bulkhead.rejected
+            stats[host] = entry
+        return stats
+
+
+_default_guard: Optional[UpstreamGuard] = None
+_default_guard_lock = threading.Lock()
+
+
+def get_default_guard() -> UpstreamGuard:
+    """
+    The process-wide guard used by APICallTiles that were not given one explicitly.
+    """
+    global _default_guard
+    if _default_guard is None:
+        with _default_guard_lock:
+            if _default_guard is None:
+                _default_guard = UpstreamGuard()
+    return _default_guard
+
+
+def configure_default_guard(**kwargs) -> UpstreamGuard:
+    """
+    Replace the process-wide guard.
+
+    Parameters:
+    - kwargs: UpstreamGuard constructor arguments.
+
+    Returns:
+    - The new default guard.
+    """
+    global _default_guard
+    with _default_guard_lock:
+        _default_guard = UpstreamGuard(**kwargs)
+    return _default_guard
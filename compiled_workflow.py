@@ -0,0 +1,289 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from condition_expression import ConditionSyntaxError, compile_condition
+from template_renderer import TemplateSyntaxError, compile_template
+
+logger = logging.getLogger("CompiledWorkflow")
+
+# Configuration keys that name another tile as the control-flow target.
+EDGE_KEYS = ("next_tile", "true_tile", "false_tile", "jump_target", "join_tile", "failure_tile", "fallback_tile")
+
+# Configuration keys that may hold {{placeholder}} templates.
+TEMPLATE_KEYS = ("api_url", "params", "payload", "prompt", "seconds", "until")
+
+# Run budgets a definition may set under "limits" (see run_budget.RunBudget).
+LIMIT_KEYS = ("max_steps", "deadline_seconds", "tile_time_limit")
+
+# Per tile type, the edge keys whose absence ends the run when taken.
+_ENDING_KEYS = {
+    "LogicBuilderTile": ("true_tile", "false_tile"),
+    "FlowJumpTile": ("jump_target",),
+    "ParallelTile": (),
+    "JoinTile": ("next_tile",),
+}
+
+
+class CompiledWorkflow:
+    def __init__(self, workflow_definition: Dict[str, Any]):
+        """
+        Compile a workflow definition (as loaded by WorkflowEngine.load_workflow_from_file)
+        into an id -> tile index with resolved edges, so the engine never scans the tile list.
+
+        Parameters:
+        - workflow_definition: The structured workflow containing all tiles and configuration.
+
+        Raises:
+        - ValueError: If the definition has duplicate tile ids, an unknown start tile,
+          an edge / connection that points to a tile that does not exist, invalid limits,
+          or a loop that no path can leave and no user input can break.
+        """
+        self.definition = workflow_definition
+        self.workflow_name = workflow_definition.get("workflow_name")
+        self.start_tile = workflow_definition.get("start_tile")
+        self.tiles: Dict[Any, Dict[str, Any]] = {}
+        self.edges: Dict[Any, Dict[str, Any]] = {}
+        self.adjacency: Dict[Any, List[Any]] = {}
+        self.limits: Dict[str, float] = {}
+        # Every control-flow cycle: {"tiles": [...], "has_exit": bool, "interactive": bool, "waits": bool}.
+        self.cycles: List[Dict[str, Any]] = []
+        # Content fingerprint: identical definitions share cached tile instances.
+        self.key = (self.workflow_name, self._fingerprint(workflow_definition))
+
+        self._index_tiles(workflow_definition.get("tiles", []))
+        self._check_tile_ids(workflow_definition.get("tileids"))
+        self._resolve_edges()
+        self._resolve_connections(workflow_definition.get("connections", []))
+        self._check_conditions()
+        self._check_templates()
+        self._read_limits(workflow_definition.get("limits") or {})
+        self._check_retention()
+
+        if self.start_tile not in self.tiles:
+            raise ValueError(f"Start tile {self.start_tile!r} not found in workflow {self.workflow_name!r}.")
+        self._analyze_cycles()
+
+    @staticmethod
+    def _fingerprint(workflow_definition: Dict[str, Any]) -> str:
+        canonical = json.dumps(workflow_definition, sort_keys=True, default=str)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def _index_tiles(self, tiles: List[Dict[str, Any]]) -> None:
+        for tile in tiles:
+            tile_id = tile.get("id")
+            if tile_id is None:
+                raise ValueError(f"Tile without an id in workflow {self.workflow_name!r}: {tile}")
+            if tile_id in self.tiles:
+                raise ValueError(f"Duplicate tile id {tile_id!r} in workflow {self.workflow_name!r}.")
+            self.tiles[tile_id] = tile
+            self.adjacency[tile_id] = []
+
+    def _check_tile_ids(self, tile_ids: Optional[List[Any]]) -> None:
+        # "tileids" is a legacy lookup list; the index is now built from the tiles themselves.
+        if tile_ids is None:
+            return
+        missing = [tile_id for tile_id in tile_ids if tile_id not in self.tiles]
+        if missing:
+            raise ValueError(f"tileids {missing} have no matching tile in workflow {self.workflow_name!r}.")
+        if len(tile_ids) != len(self.tiles):
+            logger.warning(f"tileids of workflow {self.workflow_name!r} does not list every tile; it is ignored.")
+
+    def _resolve_edges(self) -> None:
+        for tile_id, tile in self.tiles.items():
+            config = tile.get("configuration", {})
+            edges = {}
+            for key in EDGE_KEYS:
+                target = config.get(key)
+                if target is None:
+                    continue
+                if target not in self.tiles:
+                    raise ValueError(
+                        f"Tile {tile_id!r} in workflow {self.workflow_name!r} has {key} -> {target!r}, "
+                        f"which is not a tile in this workflow."
+                    )
+                edges[key] = target
+            if tile.get("type") == "ParallelTile":
+                edges.update(self._resolve_branches(tile_id, config))
+            self.edges[tile_id] = edges
+
+    def _resolve_branches(self, tile_id: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+        join_tile = self.tiles.get(config.get("join_tile"))
+        if join_tile is None or join_tile.get("type") != "JoinTile":
+            raise ValueError(f"ParallelTile {tile_id!r} in workflow {self.workflow_name!r} needs a join_tile that is a JoinTile.")
+        branches = config.get("branches") or []
+        if not branches:
+            raise ValueError(f"ParallelTile {tile_id!r} in workflow {self.workflow_name!r} has no branches.")
+        join_config = join_tile.get("configuration", {})
+        if join_config.get("policy") == "quorum" and not 0 < (join_config.get("quorum") or 0) <= len(branches):
+            raise ValueError(f"JoinTile {join_tile.get('id')!r} quorum must be between 1 and {len(branches)}.")
+
+        edges = {}
+        for branch in branches:
+            start_tile = branch.get("start_tile") if isinstance(branch, dict) else branch
+            if start_tile not in self.tiles:
+                raise ValueError(f"ParallelTile {tile_id!r} in workflow {self.workflow_name!r} has branch -> {start_tile!r}, "
+                                 f"which is not a tile in this workflow.")
+            name = str(branch.get("name", start_tile)) if isinstance(branch, dict) else str(branch)
+            edges[f"branch:{name}"] = start_tile
+        return edges
+
+    def _resolve_connections(self, connections: List[Dict[str, Any]]) -> None:
+        for connection in connections:
+            source = connection.get("source_tile_id")
+            target = connection.get("target_tile_id")
+            for end in (source, target):
+                if end not in self.tiles:
+                    raise ValueError(
+                        f"Connection {source!r} -> {target!r} in workflow {self.workflow_name!r} "
+                        f"references unknown tile {end!r}."
+                    )
+            self.adjacency[source].append(target)
+
+    def _check_conditions(self) -> None:
+        # Syntax errors surface at load time; the tiles compile the same source again when they
+        # are configured, which the condition cache turns into a lookup.
+        for tile_id, tile in self.tiles.items():
+            if tile.get("type") != "LogicBuilderTile":
+                continue
+            condition = tile.get("configuration", {}).get("condition", True)
+            try:
+                compile_condition(condition)
+            except ConditionSyntaxError as e:
+                raise ValueError(f"Invalid condition on tile {tile_id!r} in workflow {self.workflow_name!r}: {e}") from e
+
+    def _check_templates(self) -> None:
+        for tile_id, tile in self.tiles.items():
+            config = tile.get("configuration", {})
+            for key in TEMPLATE_KEYS:
+                if key not in config:
+                    continue
+                try:
+                    compile_template(config[key])
+                except TemplateSyntaxError as e:
+                    raise ValueError(f"Invalid template in {key} of tile {tile_id!r} in workflow {self.workflow_name!r}: {e}") from e
+
+    def _read_limits(self, limits: Dict[str, Any]) -> None:
+        for key, value in limits.items():
+            if key not in LIMIT_KEYS:
+                raise ValueError(f"Unknown limit {key!r} in workflow {self.workflow_name!r}; expected one of {LIMIT_KEYS}.")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"Limit {key} of workflow {self.workflow_name!r} must be a positive number, got {value!r}.")
+            self.limits[key] = value
+        for tile_id, tile in self.tiles.items():
+            time_limit = tile.get("time_limit")
+            if time_limit is not None and (isinstance(time_limit, bool) or not isinstance(time_limit, (int, float)) or time_limit <= 0):
+                raise ValueError(f"time_limit of tile {tile_id!r} in workflow {self.workflow_name!r} must be a positive number.")
+
+    def _check_retention(self) -> None:
+        # "retain" lists the dotted paths of a tile's output its session keeps (see SessionData.record).
+        for tile_id, tile in self.tiles.items():
+            retain = tile.get("retain")
+            if retain is None:
+                continue
+            if not isinstance(retain, list) or not all(isinstance(path, str) and path for path in retain):
+                raise ValueError(f"retain of tile {tile_id!r} in workflow {self.workflow_name!r} must be a list of paths.")
+            for path in retain:
+                if "" in path.split("."):
+                    raise ValueError(f"Invalid retain path {path!r} on tile {tile_id!r} in workflow {self.workflow_name!r}.")
+
+    def _strongly_connected_components(self) -> List[List[Any]]:
+        # Iterative Tarjan over the configured edges (connections do not steer execution).
+        index_of: Dict[Any, int] = {}
+        lowlink: Dict[Any, int] = {}
+        on_stack = set()
+        stack: List[Any] = []
+        components: List[List[Any]] = []
+        counter = 0
+        for root in self.tiles:
+            if root in index_of:
+                continue
+            work = [(root, iter(self.edges[root].values()))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                advanced = False
+                for target in targets:
+                    if target not in index_of:
+                        index_of[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges[target].values())))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        return components
+
+    def _may_end_run(self, tile_id: Any) -> bool:
+        tile = self.tiles[tile_id]
+        ending_keys = _ENDING_KEYS.get(tile.get("type"), ("next_tile",))
+        return any(key not in self.edges[tile_id] for key in ending_keys)
+
+    def _analyze_cycles(self) -> None:
+        """
+        Find every loop in the control-flow graph and whether anything can leave it.
+
+        A loop with no way out, no UserInteractionTile and no WaitTile would spin until a budget
+        stops it, so it is rejected; one that only a person or a timer keeps going is reported.
+        """
+        for component in self._strongly_connected_components():
+            members = set(component)
+            if len(component) == 1 and component[0] not in self.edges[component[0]].values():
+                continue
+            has_exit = any(
+                self._may_end_run(tile_id) or any(target not in members for target in self.edges[tile_id].values())
+                for tile_id in component
+            )
+            interactive = any(self.tiles[tile_id].get("type") == "UserInteractionTile" for tile_id in component)
+            waits = any(self.tiles[tile_id].get("type") == "WaitTile" for tile_id in component)
+            self.cycles.append({"tiles": sorted(component, key=str), "has_exit": has_exit, "interactive": interactive,
+                                "waits": waits})
+            if not has_exit and not interactive and not waits:
+                raise ValueError(f"Tiles {sorted(component, key=str)} in workflow {self.workflow_name!r} form a loop with no exit.")
+            if not has_exit:
+                logger.warning(f"Tiles {sorted(component, key=str)} in workflow {self.workflow_name!r} loop with no exit; "
+                               f"sessions entering it only end when stopped.")
+
+    def get_tile(self, tile_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve the definition of a tile in O(1).
+
+        Parameters:
+        - tile_id: The ID of the tile to retrieve.
+
+        Returns:
+        - The tile definition dictionary or None if not found.
+        """
+        return self.tiles.get(tile_id)
+
+    def successors(self, tile_id: Any) -> List[Any]:
+        """
+        All tiles reachable in one step from tile_id, through either its configured
+        edges or the declared connections.
+        """
+        targets = list(self.edges.get(tile_id, {}).values())
+        for target in self.adjacency.get(tile_id, []):
+            if target not in targets:
+                targets.append(target)
+        return targets
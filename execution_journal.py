@@ -0,0 +1,413 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from session_data import SessionData
+
+logger = logging.getLogger("ExecutionJournal")
+
+_SEGMENT = re.compile(r"^segment-(\d+)\.log$")
+_SNAPSHOT = re.compile(r"^snapshot-(\d+)\.jsonl$")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return (_encoder.encode(record) + "\n").encode("utf-8")
+
+
+class JournalWriteError(OSError):
+    """The journal could not write its records; nothing appended since the last commit is durable."""
+
+
+class ExecutionJournal:
+    def __init__(self, directory: str, flush_interval: float = 0.005, segment_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = True, commit_on_suspend: bool = True):
+        """
+        Append-only write-ahead journal of session execution, for resuming sessions after a crash.
+
+        Per session it records the start (workflow version, start tile, initial data), every
+        completed tile (the next tile and the session data changes it made, see
+        SessionData.track_changes), committed API side effects by idempotency key, and the end.
+        Records are written by a background thread that gathers everything appended within
+        flush_interval into one write and one fsync (group commit). Full segments are folded
+        into a snapshot of the sessions still running, in the background, so recovery reads one
+        snapshot plus the segments written since.
+
+        Parameters:
+        - directory: Where segments and snapshots live; created if missing. One journal per directory.
+        - flush_interval: Seconds appended records may wait for company before they are written.
+        - segment_bytes: Size at which the journal moves to a new segment and compacts the old ones.
+        - fsync: fsync each write; without it a process crash loses nothing but an OS crash may.
+        - commit_on_suspend: Engines wait for commit() before a run returns waiting or finished,
+          so whatever the caller saw is durable.
+
+        A write that fails puts the journal in a failed state: the records it held are never
+        acknowledged, commit() raises JournalWriteError from then on, and the process has to be
+        restarted to recover from what did reach the disk.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.commit_on_suspend = commit_on_suspend
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._buffer: List[bytes] = []
+        self._appended = 0
+        self._durable = 0
+        # session id -> [run token, steps journaled]; sessions started and not yet ended
+        self._live: Dict[str, List[Any]] = {}
+        # session id -> {idempotency key -> output}: API calls committed before the last crash (see recover)
+        self._effects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._closed = False
+        self._error: Optional[OSError] = None
+        self._compacting: Optional[threading.Thread] = None
+        self._compact_lock = threading.Lock()
+        self.records = 0
+        self.syncs = 0
+        self.write_errors = 0
+
+        self._segment_id = max((segment_id for segment_id, _ in self._segments() + self._snapshots()), default=0) + 1
+        # A new process never appends to a segment a crash may have cut short.
+        self._file = open(self._segment_path(self._segment_id), "ab")
+        self._writer = threading.Thread(target=self._write_loop, name="execution-journal", daemon=True)
+        self._writer.start()
+
+    # -- paths --------------------------------------------------------------------------------
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment_id:08d}.log")
+
+    def _snapshot_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{segment_id:08d}.jsonl")
+
+    def _list(self, pattern) -> List[Tuple[int, str]]:
+        found = []
+        for file_name in os.listdir(self.directory):
+            match = pattern.match(file_name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, file_name)))
+        return sorted(found)
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return self._list(_SEGMENT)
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        return self._list(_SNAPSHOT)
+
+    # -- appending ----------------------------------------------------------------------------
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        encoded = _encode(record)
+        with self._lock:
+            self._push(encoded)
+
+    def _push(self, encoded: bytes) -> None:
+        # Caller holds self._lock.
+        if self._closed:
+            raise ValueError("The execution journal is closed.")
+        self._buffer.append(encoded)
+        self._appended += 1
+        self.records += 1
+        if len(self._buffer) == 1:
+            self._flushed.notify_all()
+
+    def is_live(self, session_id: str) -> bool:
+        """
+        Whether session_id was started in this journal and has not ended.
+        """
+        with self._lock:
+            return session_id in self._live
+
+    def begin(self, session_id: str, definition_key: Tuple[str, str], current_tile_id: Any, checkpoint: Dict[str, Any]) -> None:
+        """
+        Record a session starting (or first seen by this journal) at current_tile_id.
+
+        Parameters:
+        - session_id: The session.
+        - definition_key: CompiledWorkflow.key of the version it runs: (workflow_name, fingerprint).
+        - current_tile_id: The tile it continues from.
+        - checkpoint: Its session data, as SessionData.checkpoint().
+        """
+        run = uuid.uuid4().hex[:12]
+        encoded = _encode({"t": "begin", "s": session_id, "run": run, "w": definition_key[0], "k": definition_key[1],
+                           "tile": current_tile_id, "data": checkpoint})
+        with self._lock:
+            self._live[session_id] = [run, 0]
+            self._push(encoded)
+
+    def step(self, session_id: str, tile_id: Any, next_tile: Any, changes: List[List[Any]]) -> None:
+        """
+        Record a completed tile: the tile the session moves to and the data changes it made.
+
+        Tiles that changed nothing (jumps, conditions) are not recorded: after a crash the session
+        resumes at the last tile that did and re-runs them, which takes the same route.
+        """
+        with self._lock:
+            live = self._live.get(session_id)
+            if live is None:
+                raise ValueError(f"Session {session_id} was not begun in this journal.")
+            if not changes:
+                return
+            live[1] += 1
+            number = live[1]
+        # Steps of one session come from one thread at a time, so encoding outside the lock keeps their order.
+        self._append({"t": "step", "s": session_id, "n": number, "tile": tile_id, "next": next_tile, "ops": changes})
+
+    def end(self, session_id: str, status: str) -> None:
+        """
+        Record a session ending (completed, failed, stopped, ...); recovery no longer resumes it.
+        """
+        encoded = _encode({"t": "end", "s": session_id, "status": status})
+        with self._lock:
+            if self._live.pop(session_id, None) is None:
+                return
+            self._effects.pop(session_id, None)
+            self._push(encoded)
+
+    def idempotency_key(self, session_id: str, tile_id: Any) -> Optional[str]:
+        """
+        Key for the side effects of the tile session_id is about to run as its next step.
+
+        The same step gets the same key when it is re-run after a crash, and a different one in
+        any other run or step (the run token changes with every begin). None for sessions not
+        begun in this journal.
+        """
+        with self._lock:
+            live = self._live.get(session_id)
+            if live is None:
+                return None
+            return f"{session_id}:{live[0]}:{live[1] + 1}:{tile_id}"
+
+    def record_effect(self, session_id: str, key: str, output: Dict[str, Any]) -> None:
+        """
+        Record that the side effect keyed key was committed upstream, with the tile output it produced.
+        """
+        self._append({"t": "effect", "s": session_id, "key": key, "out": output})
+
+    def committed_effect(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        The output recorded for session_id's side effect key before the last crash, or None if
+        it was not committed.
+        """
+        with self._lock:
+            return self._effects.get(session_id, {}).get(key)
+
+    def commit(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything appended so far is written (and fsynced).
+
+        Returns:
+        - False if it did not get there within timeout.
+
+        Raises:
+        - JournalWriteError: If a write failed, so some of it never will be.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            target = self._appended
+            while self._durable < target:
+                if self._error is not None:
+                    raise JournalWriteError(f"The execution journal in {self.directory} failed: {self._error}") from self._error
+                if self._closed and not self._buffer:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+            return self._durable >= target
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._flushed.wait()
+                if not self._buffer and self._closed:
+                    return
+            # Let records appended by other sessions in the meantime share this write and fsync.
+            if self.flush_interval:
+                time.sleep(self.flush_interval)
+            self._write()
+
+    def _write(self) -> None:
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            target = self._appended
+            failed = self._error is not None
+        if records and not failed:
+            try:
+                self._file.write(b"".join(records))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self.syncs += 1
+            except OSError as e:
+                # Part of the write may be on disk; appending more after it could not be trusted either.
+                self.write_errors += 1
+                logger.error(f"Could not write the execution journal in {self.directory}: {e}")
+                with self._lock:
+                    self._error = e
+                    self._flushed.notify_all()
+                return
+        with self._lock:
+            if not failed:
+                self._durable = target
+            self._flushed.notify_all()
+        if self._file.tell() >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        # Only the writer thread touches the file, so the swap needs no lock.
+        self._file.close()
+        self._segment_id += 1
+        self._file = open(self._segment_path(self._segment_id), "ab")
+        if self._compacting is None or not self._compacting.is_alive():
+            self._compacting = threading.Thread(target=self.compact, args=(self._segment_id,),
+                                                name="execution-journal-compaction", daemon=True)
+            self._compacting.start()
+
+    def close(self) -> None:
+        """
+        Write what is buffered and stop; live sessions stay in the journal for the next process.
+        """
+        with self._lock:
+            self._closed = True
+            self._flushed.notify_all()
+        self._writer.join()
+        if self._compacting is not None:
+            self._compacting.join()
+        self._file.close()
+
+    # -- reading ------------------------------------------------------------------------------
+
+    def _fold(self, upto_segment: Optional[int] = None) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
+        # Latest snapshot plus the segments after it (below upto_segment): session id -> state.
+        snapshots = self._snapshots()
+        sessions: Dict[str, Dict[str, Any]] = {}
+        start = 0
+        if snapshots:
+            start, path = snapshots[-1]
+            with open(path, "rb") as file:
+                for line in file:
+                    state = json.loads(line)
+                    state["data"] = SessionData.restore(state["data"])
+                    sessions[state["s"]] = state
+        records = 0
+        for segment_id, path in self._segments():
+            if segment_id < start or (upto_segment is not None and segment_id >= upto_segment):
+                continue
+            records += self._replay(path, sessions)
+        return sessions, start, records
+
+    @staticmethod
+    def _replay(path: str, sessions: Dict[str, Dict[str, Any]]) -> int:
+        records = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The tail of the last write before a crash; nothing after it was acknowledged.
+                    logger.warning(f"Ignoring a torn record at the end of {path}")
+                    break
+                records += 1
+                kind, session_id = record["t"], record["s"]
+                if kind == "begin":
+                    sessions[session_id] = {"s": session_id, "run": record["run"], "w": record["w"], "k": record["k"],
+                                            "tile": record["tile"], "n": 0, "data": SessionData.restore(record["data"]),
+                                            "effects": {}}
+                    continue
+                state = sessions.get(session_id)
+                if state is None:
+                    continue
+                if kind == "step":
+                    state["data"].apply_changes(record["ops"])
+                    state["tile"] = record["next"]
+                    state["n"] = record["n"]
+                elif kind == "effect":
+                    state["effects"][record["key"]] = record["out"]
+                elif kind == "end":
+                    del sessions[session_id]
+        return records
+
+    def compact(self, upto_segment: Optional[int] = None) -> Optional[str]:
+        """
+        Fold the latest snapshot and the segments before upto_segment (default: all but the one
+        being written) into a new snapshot of the sessions still live, then delete what it replaces.
+
+        Returns:
+        - The snapshot path, or None if there was nothing to compact.
+        """
+        with self._compact_lock:
+            return self._compact(self._segment_id if upto_segment is None else upto_segment)
+
+    def _compact(self, upto_segment: int) -> Optional[str]:
+        if not any(segment_id < upto_segment for segment_id, _ in self._segments()):
+            return None
+        started = time.perf_counter()
+        sessions, _, records = self._fold(upto_segment)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            for state in sessions.values():
+                file.write(_encode(dict(state, data=state["data"].checkpoint())))
+            file.flush()
+            os.fsync(file.fileno())
+        path = self._snapshot_path(upto_segment)
+        os.replace(temp_path, path)
+        for segment_id, old in self._snapshots() + self._segments():
+            if segment_id < upto_segment:
+                os.remove(old)
+        logger.info(f"Compacted {records} journal records into a snapshot of {len(sessions)} sessions "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return path
+
+    def recover(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Rebuild every session that was running when the previous process stopped.
+
+        Call once at startup, before anything is appended. Recovered sessions continue under
+        their old run token, so a step re-run after the crash gets the idempotency key it had,
+        and API calls whose effect was recorded are not made again (see committed_effect).
+
+        Returns:
+        - session id -> {"session_id", "workflow_name", "definition_key" (fingerprint),
+          "current_tile_id" (the tile after the last one that changed data; None if the run had finished),
+          "workflow_data" (SessionData), "steps"}.
+        """
+        started = time.perf_counter()
+        sessions, _, records = self._fold(self._segment_id)
+        recovered = {}
+        for session_id, state in sessions.items():
+            with self._lock:
+                self._live[session_id] = [state["run"], state["n"]]
+                if state["effects"]:
+                    self._effects[session_id] = state["effects"]
+            recovered[session_id] = {
+                "session_id": session_id,
+                "workflow_name": state["w"],
+                "definition_key": state["k"],
+                "current_tile_id": state["tile"],
+                "workflow_data": state["data"],
+                "steps": state["n"],
+            }
+        logger.info(f"Recovered {len(recovered)} sessions from {records} journal records "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return recovered
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Records appended, writes (fsyncs) made and failed, whether the journal has failed, live
+        sessions and the segment being written.
+        """
+        with self._lock:
+            return {"records": self.records, "syncs": self.syncs, "write_errors": self.write_errors,
+                    "failed": self._error is not None, "live_sessions": len(self._live), "segment": self._segment_id}
@@ -0,0 +1,185 @@
+import argparse
+import copy
+import json
+import logging
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from compiled_workflow import EDGE_KEYS, CompiledWorkflow
+from condition_expression import compile_condition
+
+logger = logging.getLogger("FlowOptimizer")
+
+
+def _pure_jumps(tiles: Dict[Any, Dict[str, Any]], report: Dict[str, Any]) -> Dict[Any, Any]:
+    """
+    Tiles whose only effect is choosing the next tile, mapped to that tile: FlowJumpTiles and
+    LogicBuilderTiles whose condition is a constant (folded here and listed in the report).
+    """
+    jumps = {}
+    for tile_id, tile in tiles.items():
+        config = tile.get("configuration", {})
+        if tile.get("type") == "FlowJumpTile":
+            jumps[tile_id] = config.get("jump_target")
+        elif tile.get("type") == "LogicBuilderTile":
+            condition = compile_condition(config.get("condition", True))
+            if condition.is_constant:
+                jumps[tile_id] = config.get("true_tile") if condition.constant_value else config.get("false_tile")
+                report["folded_conditions"][tile_id] = condition.constant_value
+    return jumps
+
+
+def _resolver(jumps: Dict[Any, Any]):
+    def resolve(target: Any) -> Any:
+        # Follow a chain of pure jumps to the first tile that does something (or None, the end).
+        seen = []
+        while target in jumps:
+            if target in seen:
+                # A loop of pure jumps never ends; leave it exactly as written.
+                return seen[0]
+            seen.append(target)
+            target = jumps[target]
+        return target
+
+    return resolve
+
+
+def optimize_workflow(workflow_definition: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Ahead-of-time pass over a workflow definition that removes tiles which only route.
+
+    - Every reference (edges, ParallelTile branches, the start tile, connections) to a FlowJumpTile,
+      or to a LogicBuilderTile with a constant condition, is pointed at the tile the chain of such
+      tiles ends up at, so a run no longer spends a step on each of them.
+    - Tiles no longer reachable from the start tile, through edges or declared connections, are dropped.
+
+    Routing tiles record nothing in the session data, so every run produces the same prompts,
+    API calls and workflow data as before; it just takes fewer steps (and fewer of max_steps).
+    A reference whose chain ends the run is kept where dropping it would change behaviour:
+    the start tile and ParallelTile branch starts.
+
+    Parameters:
+    - workflow_definition: The definition, as loaded by WorkflowEngine.load_workflow_from_file;
+      it is not modified.
+
+    Returns:
+    - (optimized definition, report): the report lists the collapsed jump tiles, folded conditions
+      (tile id -> the constant value), other unreachable tiles removed and rewritten references.
+
+    Raises:
+    - ValueError: If the definition does not compile.
+    """
+    CompiledWorkflow(workflow_definition)  # validate before rewriting anything
+    optimized = copy.deepcopy(workflow_definition)
+    tiles = {tile.get("id"): tile for tile in optimized.get("tiles", [])}
+    report: Dict[str, Any] = {
+        "workflow_name": optimized.get("workflow_name"),
+        "tiles_before": len(tiles),
+        "tiles_after": len(tiles),
+        "collapsed_jumps": [],
+        "folded_conditions": {},
+        "removed_unreachable": [],
+        "rewritten_references": 0,
+    }
+    jumps = _pure_jumps(tiles, report)
+    resolve = _resolver(jumps)
+
+    def rewrite(target: Any, keep_ending: bool = False) -> Any:
+        resolved = resolve(target)
+        if resolved is None and keep_ending:
+            return target
+        if resolved != target:
+            report["rewritten_references"] += 1
+        return resolved
+
+    optimized["start_tile"] = rewrite(optimized.get("start_tile"), keep_ending=True)
+    for tile in tiles.values():
+        config = tile.get("configuration", {})
+        for key in EDGE_KEYS:
+            # join_tile must name the JoinTile itself (branches run until they reach it).
+            if config.get(key) is not None and key != "join_tile":
+                config[key] = rewrite(config[key])
+        if tile.get("type") == "ParallelTile":
+            branches = config.get("branches") or []
+            for index, branch in enumerate(branches):
+                if isinstance(branch, dict):
+                    branch["start_tile"] = rewrite(branch.get("start_tile"), keep_ending=True)
+                else:
+                    branches[index] = rewrite(branch, keep_ending=True)
+
+    connections = []
+    for connection in optimized.get("connections", []):
+        target = rewrite(connection.get("target_tile_id"))
+        if target is not None:
+            connections.append(dict(connection, target_tile_id=target))
+
+    reachable = _reachable(optimized["start_tile"], tiles, connections)
+    for tile_id in tiles:
+        if tile_id not in reachable:
+            report["collapsed_jumps" if tile_id in jumps else "removed_unreachable"].append(tile_id)
+    optimized["tiles"] = [tile for tile in optimized.get("tiles", []) if tile.get("id") in reachable]
+    if "connections" in optimized:
+        seen = set()
+        optimized["connections"] = []
+        for connection in connections:
+            ends = (connection["source_tile_id"], connection["target_tile_id"])
+            if connection["source_tile_id"] in reachable and ends not in seen:
+                seen.add(ends)
+                optimized["connections"].append(connection)
+    if "tileids" in optimized:
+        optimized["tileids"] = [tile_id for tile_id in optimized["tileids"] if tile_id in reachable]
+    report["tiles_after"] = len(optimized["tiles"])
+
+    CompiledWorkflow(optimized)
+    return optimized, report
+
+
+def _reachable(start_tile: Any, tiles: Dict[Any, Dict[str, Any]], connections: List[Dict[str, Any]]) -> set:
+    connected: Dict[Any, List[Any]] = {}
+    for connection in connections:
+        connected.setdefault(connection.get("source_tile_id"), []).append(connection.get("target_tile_id"))
+    reachable = set()
+    pending = [start_tile]
+    while pending:
+        tile_id = pending.pop()
+        if tile_id in reachable or tile_id not in tiles:
+            continue
+        reachable.add(tile_id)
+        config = tiles[tile_id].get("configuration", {})
+        pending.extend(config.get(key) for key in EDGE_KEYS if config.get(key) is not None)
+        for branch in config.get("branches") or [] if tiles[tile_id].get("type") == "ParallelTile" else []:
+            pending.append(branch.get("start_tile") if isinstance(branch, dict) else branch)
+        pending.extend(connected.get(tile_id, []))
+    return reachable
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{report['workflow_name']}: {report['tiles_before']} -> {report['tiles_after']} tiles, "
+             f"{report['rewritten_references']} references rewritten"]
+    if report["collapsed_jumps"]:
+        lines.append(f"  collapsed jump tiles: {report['collapsed_jumps']}")
+    for tile_id, value in report["folded_conditions"].items():
+        lines.append(f"  folded constant condition of tile {tile_id!r} to {value}")
+    if report["removed_unreachable"]:
+        lines.append(f"  removed unreachable tiles: {report['removed_unreachable']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Collapse static jumps and constant branches of a workflow definition.")
+    parser.add_argument("definition", help="workflow definition JSON file")
+    parser.add_argument("-o", "--output", help="write the optimized definition here")
+    args = parser.parse_args(argv)
+
+    with open(args.definition, "r") as file:
+        definition = json.load(file)
+    optimized, report = optimize_workflow(definition)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(optimized, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
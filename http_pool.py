@@ -0,0 +1,154 @@
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HTTPSessionPool:
+    def __init__(self, max_connections_per_host: int = 10, max_hosts: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 max_retries: int = 2, backoff_factor: float = 0.3,
+                 retry_statuses: Tuple[int, ...] = (502, 503, 504), block: bool = True):
+        """
+        Keep-alive connection pool shared by every APICallTile.
+
+        Parameters:
+        - max_connections_per_host: Connections kept open (and, with block=True, allowed) per host.
+        - max_hosts: Number of per-host pools kept before the least recently used one is dropped.
+        - connect_timeout: Seconds to wait for a TCP/TLS connection.
+        - read_timeout: Seconds to wait between bytes of the response.
+        - max_retries: Retries for connection errors and retry_statuses on idempotent methods.
+        - backoff_factor: Exponential backoff factor between retries (urllib3 semantics).
+        - retry_statuses: Response codes that are retried.
+        - block: Wait for a free connection instead of opening more than max_connections_per_host.
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = (connect_timeout, read_timeout)
+        self.logger = logging.getLogger("HTTPSessionPool")
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=max_connections_per_host,
+                                    max_retries=retry, pool_block=block)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._retries = 0
+        self._in_flight = 0
+        self._per_host: Dict[str, int] = {}
+
+    def request(self, method: str, url: str, timeout: Optional[Any] = None, **kwargs) -> requests.Response:
+        """
+        Send a request over a pooled keep-alive connection.
+
+        Parameters:
+        - method: HTTP method, e.g. "GET" or "POST".
+        - url: The request URL.
+        - timeout: Optional override of the pool's (connect, read) timeout.
+        - kwargs: Passed through to requests.Session.request (params, json, ...).
+
+        Returns:
+        - The requests.Response.
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._per_host[host] = self._per_host.get(host, 0) + 1
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            with self._lock:
+                self._retries += len(retries.history)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of request counters and per-host connection pool usage.
+
+        Returns:
+        - A dictionary with totals and, per host, request count and idle/open connections.
+        """
+        with self._lock:
+            stats = {
+                "requests": self._requests,
+                "errors": self._errors,
+                "retries": self._retries,
+                "in_flight": self._in_flight,
+                "hosts": {host: {"requests": count} for host, count in self._per_host.items()},
+            }
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            entry = stats["hosts"].setdefault(host, {"requests": 0})
+            entry["connections_opened"] = pool.num_connections
+            # The pool queue is pre-filled with None placeholders; only real connections count.
+            entry["idle_connections"] = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+        return stats
+
+    def close(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        self.session.close()
+
+
+_default_pool: Optional[HTTPSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> HTTPSessionPool:
+    """
+    The process-wide pool used by APICallTiles that were not given one explicitly.
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HTTPSessionPool()
+    return _default_pool
+
+
+def configure_default_pool(**kwargs) -> HTTPSessionPool:
+    """
+    Replace the process-wide pool, closing the previous one.
+
+    Parameters:
+    - kwargs: HTTPSessionPool constructor arguments.
+
+    Returns:
+    - The new default pool.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        previous = _default_pool
+        _default_pool = HTTPSessionPool(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _default_pool
@@ -0,0 +1,245 @@
+import asyncio
+import inspect
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+logger = logging.getLogger("InputChannel")
+
+
+class InvalidChoiceError(ValueError):
+    """An answer that matches none of a UserInteractionTile's options."""
+
+
+class ChannelExhaustedError(LookupError):
+    """A scripted channel has no answer left for a session."""
+
+
+def resolve_choice(options: List[Any], answer: Any) -> Any:
+    """
+    Map an answer onto one of the prompt's options.
+
+    Accepted: the option itself, the option ignoring case and surrounding whitespace, or its
+    1-based number as shown on the terminal. With no options any answer is free text.
+
+    Parameters:
+    - options: The tile's options.
+    - answer: The raw answer.
+
+    Returns:
+    - The matching option.
+    """
+    if not options:
+        return answer
+    if answer in options:
+        return answer
+    if isinstance(answer, str):
+        text = answer.strip()
+        folded = text.casefold()
+        for option in options:
+            if isinstance(option, str) and option.casefold() == folded:
+                return option
+        if text.isdigit():
+            answer = int(text)
+    if isinstance(answer, int) and not isinstance(answer, bool) and 1 <= answer <= len(options):
+        return options[answer - 1]
+    raise InvalidChoiceError(f"{answer!r} is not one of {options}")
+
+
+class InputChannel:
+    """
+    Where UserInteractionTiles send their prompts and get their answers from.
+
+    A channel serves every session of an executor; session_id tells them apart. Subclasses
+    implement receive (and receive_async when they can wait without a thread); send_prompt
+    defaults to doing nothing, for channels whose prompts are delivered some other way.
+    """
+
+    # Answers that fail validation are re-asked this many times in total.
+    max_attempts = 3
+
+    def send_prompt(self, session_id: Optional[str], prompt: Dict[str, Any]) -> None:
+        pass
+
+    def receive(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    async def receive_async(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        return await asyncio.to_thread(self.receive, session_id, prompt)
+
+    def ask(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        """
+        Send the prompt and wait for a valid answer.
+
+        Parameters:
+        - session_id: The session asking.
+        - prompt: {"text", "options"}; "error" is added when an answer is re-asked.
+
+        Returns:
+        - The chosen option (or the free-text answer when there are no options).
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.send_prompt(session_id, prompt)
+            try:
+                return resolve_choice(prompt["options"], self.receive(session_id, prompt))
+            except InvalidChoiceError as e:
+                logger.debug("Session %s gave an invalid answer (attempt %d): %s", session_id, attempt, e)
+                if attempt == self.max_attempts:
+                    raise
+                prompt = dict(prompt, error=str(e))
+
+    async def ask_async(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        """
+        Async counterpart of ask.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.send_prompt(session_id, prompt)
+            try:
+                return resolve_choice(prompt["options"], await self.receive_async(session_id, prompt))
+            except InvalidChoiceError as e:
+                logger.debug("Session %s gave an invalid answer (attempt %d): %s", session_id, attempt, e)
+                if attempt == self.max_attempts:
+                    raise
+                prompt = dict(prompt, error=str(e))
+
+    def close(self) -> None:
+        pass
+
+
+class ConsoleChannel(InputChannel):
+    """
+    The terminal: prints the prompt and its numbered options and reads the answer with input().
+    """
+
+    def send_prompt(self, session_id: Optional[str], prompt: Dict[str, Any]) -> None:
+        if prompt.get("error"):
+            print(f"Invalid choice: {prompt['error']}")
+        print(f"Prompt: {prompt['text']}")
+        for idx, option in enumerate(prompt["options"], 1):
+            print(f"{idx}. {option}")
+
+    def receive(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        return input("Please enter your choice: ")
+
+
+class QueueChannel(InputChannel):
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        In-memory channel: answers are put on a per-session queue by another thread (a chat
+        frontend, a load generator), and prompts are collected per session for it to pick up.
+
+        Parameters:
+        - timeout: Seconds receive waits for an answer before raising queue.Empty; None waits forever.
+        """
+        self.timeout = timeout
+        self._answers: Dict[Optional[str], "queue.Queue[Any]"] = defaultdict(queue.Queue)
+        self._prompts: Dict[Optional[str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _answer_queue(self, session_id: Optional[str]) -> "queue.Queue[Any]":
+        with self._lock:
+            return self._answers[session_id]
+
+    def put(self, session_id: Optional[str], answer: Any) -> None:
+        """
+        Deliver an answer for a session; it is consumed by the session's next receive.
+        """
+        self._answer_queue(session_id).put(answer)
+
+    def send_prompt(self, session_id: Optional[str], prompt: Dict[str, Any]) -> None:
+        with self._lock:
+            self._prompts[session_id].append(prompt)
+
+    def pending_prompts(self, session_id: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Take the prompts sent to a session since the last call, oldest first.
+        """
+        with self._lock:
+            prompts = self._prompts.pop(session_id, None)
+        return list(prompts or ())
+
+    def receive(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        return self._answer_queue(session_id).get(timeout=self.timeout)
+
+    def discard(self, session_id: Optional[str]) -> None:
+        """
+        Forget a finished session's queues.
+        """
+        with self._lock:
+            self._answers.pop(session_id, None)
+            self._prompts.pop(session_id, None)
+
+
+class ReplayChannel(InputChannel):
+    # A scripted answer is not re-asked: the next one belongs to the next question.
+    max_attempts = 1
+
+    def __init__(self, script: Union[str, List[Any], Dict[str, List[Any]]]):
+        """
+        Scripted answers, for simulated conversations and capacity tests.
+
+        Parameters:
+        - script: A list of answers used by every session, a {session_id: [answers]} mapping
+          ("*" is the default script), or the path of a JSON file holding either form.
+        """
+        if isinstance(script, str):
+            with open(script, "r") as file:
+                script = json.load(file)
+        if isinstance(script, list):
+            script = {"*": script}
+        self.scripts: Dict[str, List[Any]] = {str(key): list(answers) for key, answers in script.items()}
+        self._positions: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def receive(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        answers = self.scripts.get(str(session_id), self.scripts.get("*"))
+        if answers is None:
+            raise ChannelExhaustedError(f"No scripted answers for session {session_id}")
+        with self._lock:
+            position = self._positions.get(session_id, 0)
+            self._positions[session_id] = position + 1
+        if position >= len(answers):
+            raise ChannelExhaustedError(f"Session {session_id} ran out of scripted answers after {len(answers)}")
+        return answers[position]
+
+    async def receive_async(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        return self.receive(session_id, prompt)
+
+    def reset(self, session_id: Optional[str] = None) -> None:
+        """
+        Replay the script from the start, for one session or all of them.
+        """
+        with self._lock:
+            if session_id is None:
+                self._positions.clear()
+            else:
+                self._positions.pop(session_id, None)
+
+
+class CallbackChannel(InputChannel):
+    def __init__(self, callback: Callable[[Optional[str], Dict[str, Any]], Any], max_attempts: int = 3):
+        """
+        Answers come from a callback(session_id, prompt), either a plain function or a coroutine
+        function (e.g. one that posts the prompt to a chat frontend and awaits the reply).
+
+        Parameters:
+        - callback: Returns (or, when async, resolves to) the answer.
+        - max_attempts: Times an invalid answer is re-asked; the callback sees prompt["error"].
+        """
+        self.callback = callback
+        self.max_attempts = max_attempts
+        self._is_async = inspect.iscoroutinefunction(callback)
+
+    def receive(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        if self._is_async:
+            # Sync engines run on worker threads without a loop of their own.
+            return asyncio.run(self.callback(session_id, prompt))
+        return self.callback(session_id, prompt)
+
+    async def receive_async(self, session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+        if self._is_async:
+            return await self.callback(session_id, prompt)
+        return self.callback(session_id, prompt)
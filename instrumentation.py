@@ -0,0 +1,165 @@
+import bisect
+import random
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Histogram bucket upper bounds in seconds: 10us .. ~168s, doubling.
+_BUCKET_BOUNDS = [0.00001 * (2 ** i) for i in range(25)]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """
+        Fixed-bucket latency histogram; recording is O(log buckets) and allocation free.
+        """
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, bucket_count in enumerate(other.counts):
+            self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound of the bucket holding the given fraction (0..1) of samples.
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return min(_BUCKET_BOUNDS[index], self.max) if index < len(_BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, sample_rate: float = 1.0, max_spans: int = 10000):
+        """
+        In-process tile execution spans, per tile-type latency histograms and counters.
+
+        Parameters:
+        - enabled: When False, callers skip timing altogether (they check tracer.enabled first).
+        - sample_rate: Fraction of executions kept as spans; histograms and counters see all of them.
+        - max_spans: Spans kept in the ring buffer; older ones are dropped.
+        """
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._random = random.random
+
+    def record(self, workflow_id: Optional[str], tile_id: Any, tile_type: str, started: float, duration: float,
+               outcome: str, error: Optional[str] = None) -> None:
+        """
+        Record one tile execution.
+
+        Parameters:
+        - workflow_id: The session the tile ran for.
+        - tile_id: The tile's id.
+        - tile_type: The tile's type, used to group histograms and counters.
+        - started: Wall-clock start time (time.time()).
+        - duration: Execution time in seconds.
+        - outcome: "ok" or "error".
+        - error: Error message when outcome is "error".
+        """
+        sampled = self.sample_rate >= 1.0 or self._random() < self.sample_rate
+        with self._lock:
+            histogram = self._histograms.get(tile_type)
+            if histogram is None:
+                histogram = self._histograms[tile_type] = LatencyHistogram()
+                self._counters[tile_type] = {"ok": 0, "error": 0}
+            histogram.record(duration)
+            self._counters[tile_type][outcome] = self._counters[tile_type].get(outcome, 0) + 1
+            if sampled:
+                self._spans.append({
+                    "workflow_id": workflow_id,
+                    "tile_id": tile_id,
+                    "tile_type": tile_type,
+                    "start": started,
+                    "duration": duration,
+                    "outcome": outcome,
+                    "error": error,
+                })
+
+    def spans(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Most recent sampled spans, oldest first.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        return spans[-limit:] if limit else spans
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per tile type: execution counters by outcome and a latency summary (seconds).
+        """
+        with self._lock:
+            return {
+                tile_type: {"outcomes": dict(self._counters[tile_type]), "latency": histogram.summary()}
+                for tile_type, histogram in self._histograms.items()
+            }
+
+    def overall(self) -> Dict[str, float]:
+        """
+        Latency summary across all tile types.
+        """
+        combined = LatencyHistogram()
+        with self._lock:
+            for histogram in self._histograms.values():
+                combined.merge(histogram)
+        return combined.summary()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._histograms.clear()
+            self._counters.clear()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """
+    The process-wide tracer used by TileExecutors that were not given one.
+    """
+    return _tracer
+
+
+def configure_tracing(enabled: bool = True, sample_rate: float = 1.0, max_spans: int = 10000) -> Tracer:
+    """
+    Reconfigure the process-wide tracer in place (existing executors pick the change up).
+    """
+    with _tracer._lock:
+        _tracer.enabled = enabled
+        _tracer.sample_rate = sample_rate
+        if max_spans != _tracer._spans.maxlen:
+            _tracer._spans = deque(_tracer._spans, maxlen=max_spans)
+    return _tracer
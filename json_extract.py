@@ -0,0 +1,225 @@
+"""
+Keep only selected fields of a JSON document, parsing it as a stream when ijson is installed.
+
+An APICallTile's "extract" names the parts of a response body its session keeps:
+
+    {"status": "order.status", "sku": "items.0.sku"}   -> {"status": ..., "sku": ...}
+    ["order.status", "items.0.sku"]                   -> {"order": {"status": ...}, "items": {"0": {"sku": ...}}}
+
+Paths use the {{placeholder}} syntax (template_renderer.parse_path): dotted keys, digits index
+lists. A mapping renames each selection; a list keeps every selection at its own path, so
+templates written against the full body ({{response.order.status}}) still resolve. Missing
+paths give None.
+
+With ijson the body is parsed event by event: only the selected subtrees are built, everything
+else is skipped without creating objects, and reading stops once every path has been found.
+Without it the body is parsed whole with json and then projected, which saves the memory the
+session would keep but not the parse.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from template_renderer import lookup_path, parse_path
+
+try:
+    import ijson
+except ImportError:  # optional: bodies are then parsed with json
+    ijson = None
+
+# Bytes read from a response body at a time.
+CHUNK_SIZE = 65536
+
+
+class ResponseTooLargeError(ValueError):
+    """A response body is longer than the tile's max_response_bytes."""
+
+
+def read_capped(chunks: Iterable[bytes], max_bytes: Optional[int]) -> Iterator[bytes]:
+    """
+    Pass chunks through, raising ResponseTooLargeError as soon as more than max_bytes have gone by.
+
+    Parameters:
+    - chunks: The body, in pieces.
+    - max_bytes: Most bytes allowed; None for no limit.
+    """
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise ResponseTooLargeError(f"Response body is over the {max_bytes} byte limit.")
+        yield chunk
+
+
+class _Node:
+    __slots__ = ("children", "names", "found")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.names: List[str] = []  # fields selecting exactly this path
+        self.found = False
+
+
+class CompiledExtract:
+    def __init__(self, spec: Union[Dict[str, str], List[str]]):
+        """
+        Compile an extract spec once, at tile configuration time.
+
+        Parameters:
+        - spec: {output name: path} or [path, ...] (see the module docstring).
+
+        Raises:
+        - ValueError: If the spec is not a non-empty mapping of names to paths or list of paths.
+        """
+        if isinstance(spec, dict) and spec and all(isinstance(path, str) and path for path in spec.values()):
+            self.nested = False
+            self.fields: List[Tuple[str, Tuple[Any, ...]]] = [(str(name), parse_path(path)) for name, path in spec.items()]
+        elif isinstance(spec, list) and spec and all(isinstance(path, str) and path for path in spec):
+            self.nested = True
+            paths = sorted({parse_path(path) for path in spec}, key=len)
+            # A path inside another selected one is already covered by it.
+            self.fields = []
+            for steps in paths:
+                if not any(steps[:len(kept)] == kept for _, kept in self.fields):
+                    self.fields.append((".".join(map(str, steps)), steps))
+        else:
+            raise ValueError(f"extract must be a mapping of names to paths or a list of paths, not {spec!r}")
+
+    def from_value(self, document: Any) -> Dict[str, Any]:
+        """
+        Project an already parsed document.
+        """
+        return self._assemble({name: lookup_path(document, steps) for name, steps in self.fields})
+
+    def from_chunks(self, chunks: Iterable[bytes]) -> Dict[str, Any]:
+        """
+        Parse a body given in pieces and project it, streaming when ijson is available.
+
+        Raises:
+        - ValueError: If the body is not valid JSON (as far as it had to be read).
+        """
+        if ijson is None:
+            return self.from_value(json.loads(b"".join(chunks)))
+        try:
+            return self._assemble(self._stream(chunks))
+        except ijson.JSONError as e:
+            raise ValueError(f"Invalid JSON response: {e}") from None
+
+    def _assemble(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.nested:
+            return {name: values.get(name) for name, _ in self.fields}
+        projection: Dict[str, Any] = {}
+        for name, steps in self.fields:
+            target = projection
+            for step in steps[:-1]:
+                target = target.setdefault(str(step), {})
+            target[str(steps[-1])] = values.get(name)
+        return projection
+
+    def _trie(self) -> _Node:
+        root = _Node()
+        for name, steps in self.fields:
+            node = root
+            for step in steps:
+                node = node.children.setdefault(str(step), _Node())
+            node.names.append(name)
+        return root
+
+    def _stream(self, chunks: Iterable[bytes]) -> Dict[str, Any]:
+        root = self._trie()
+        remaining = len(self.fields)
+        values: Dict[str, Any] = {}
+        events = ijson.basic_parse(_ChunkReader(chunks), buf_size=CHUNK_SIZE, use_float=True)
+        # One entry per open container: [its trie node, next list index (None for a mapping)].
+        stack: List[List[Any]] = []
+        target: Optional[_Node] = root
+        for event, value in events:
+            if event == "map_key":
+                target = stack[-1][0].children.get(value)
+                continue
+            if event in ("end_map", "end_array"):
+                stack.pop()
+                continue
+            if stack and stack[-1][1] is not None:
+                target = stack[-1][0].children.get(str(stack[-1][1]))
+                stack[-1][1] += 1
+            container = event in ("start_map", "start_array")
+            if target is None or target.found:
+                if container:
+                    _skip(events)
+            elif target.names:
+                remaining -= self._deliver(target, _build(event, value, events), values)
+                if remaining == 0:
+                    break
+            elif container:
+                stack.append([target, 0 if event == "start_array" else None])
+        return values
+
+    def _deliver(self, node: _Node, value: Any, values: Dict[str, Any]) -> int:
+        # Fill every field at or below node from its value; returns how many were filled.
+        if node.found:
+            return 0
+        node.found = True
+        filled = 0
+        for name in node.names:
+            values[name] = value
+            filled += 1
+        for step, child in node.children.items():
+            filled += self._deliver(child, lookup_path(value, (int(step) if step.isdigit() else step,)), values)
+        return filled
+
+
+class _ChunkReader:
+    # The file-like object ijson reads from.
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _skip(events: Iterator[Tuple[str, Any]]) -> None:
+    depth = 1
+    for event, _ in events:
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def _build(event: str, value: Any, events: Iterator[Tuple[str, Any]]) -> Any:
+    # Build the value starting with (event, value), consuming the rest of it from events.
+    if event not in ("start_map", "start_array"):
+        return value
+    result: Any = {} if event == "start_map" else []
+    stack = [result]
+    keys: List[Any] = [None]
+    for event, value in events:
+        if event == "map_key":
+            keys[-1] = value
+            continue
+        if event in ("end_map", "end_array"):
+            stack.pop()
+            keys.pop()
+            if not stack:
+                return result
+            continue
+        item = {} if event == "start_map" else [] if event == "start_array" else value
+        if isinstance(stack[-1], list):
+            stack[-1].append(item)
+        else:
+            stack[-1][keys[-1]] = item
+        if event in ("start_map", "start_array"):
+            stack.append(item)
+            keys.append(None)
+    raise ValueError("Response ended inside a JSON value.")
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("MicroBatcher")
+
+# Bulk protocol: POST {"requests": [<params of call 1>, ...]} to the bulk URL, which answers
+# {"results": [<body for call 1>, ...]} in the same order; null means "not found" for that call.
+REQUESTS_KEY = "requests"
+RESULTS_KEY = "results"
+
+
+class BatchedResponse:
+    def __init__(self, status_code: int, body: Any):
+        """
+        One call's share of a bulk response, shaped like requests.Response so tiles and the
+        response cache handle it like any other response.
+        """
+        self.status_code = status_code
+        self.body = body
+        self._content: Optional[bytes] = None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = json.dumps(self.body).encode("utf-8")
+        return self._content
+
+    def json(self) -> Any:
+        return self.body
+
+
+def split_bulk_response(response: Any, count: int) -> List[BatchedResponse]:
+    """
+    Hand each of count calls its result from a bulk response.
+
+    Parameters:
+    - response: The bulk endpoint's response (status_code and json()).
+    - count: Calls in the batch.
+
+    Returns:
+    - One BatchedResponse per call; a failed bulk call fails every call with its status code.
+    """
+    if response.status_code != 200:
+        return [BatchedResponse(response.status_code, None) for _ in range(count)]
+    results = (response.json() or {}).get(RESULTS_KEY)
+    if not isinstance(results, list) or len(results) != count:
+        raise ValueError(f"Bulk response must hold {RESULTS_KEY!r} with {count} entries.")
+    return [BatchedResponse(404, None) if result is None else BatchedResponse(200, result) for result in results]
+
+
+class _Batch:
+    __slots__ = ("items", "futures", "full")
+
+    def __init__(self, full):
+        self.items: List[Any] = []
+        self.futures: List[Any] = []
+        self.full = full
+
+
+class MicroBatcher:
+    def __init__(self, bulk_url: str, window_ms: float = 5.0, max_batch_size: int = 50):
+        """
+        Collects concurrent calls to one endpoint into bulk requests.
+
+        The first call of a batch waits up to window_ms for others to join, or until
+        max_batch_size calls are in, then sends one bulk request for all of them and hands each
+        caller its own result. Threads (sync engine, worker threads) and event-loop tasks are
+        batched separately, each with its own transport.
+
+        Parameters:
+        - bulk_url: The endpoint taking {"requests": [...]}; see REQUESTS_KEY / RESULTS_KEY.
+        - window_ms: Longest a call waits for company, in milliseconds.
+        - max_batch_size: Calls per bulk request.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.bulk_url = bulk_url
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._pending: Optional[_Batch] = None
+        self._pending_async: Dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._flushing = set()  # bulk tasks in flight, referenced so they are not collected
+        self.calls = 0
+        self.bulk_requests = 0
+
+    def _join(self, batch: _Batch, item: Any, future: Any) -> bool:
+        # Caller holds self._lock; True when the batch is full and must not take more calls.
+        batch.items.append(item)
+        batch.futures.append(future)
+        self.calls += 1
+        return len(batch.items) >= self.max_batch_size
+
+    def submit(self, item: Any, send: Callable[[Dict[str, Any]], Any]) -> BatchedResponse:
+        """
+        Add a call to the current batch and wait for its result.
+
+        Parameters:
+        - item: The call's rendered query parameters.
+        - send: Sends a bulk body to bulk_url and returns the response; used if this call
+          ends up leading the batch.
+
+        Returns:
+        - The call's BatchedResponse.
+        """
+        future: Future = Future()
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch(threading.Event())
+            if self._join(batch, item, future):
+                self._pending = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            self._flush(batch, send)
+        return future.result()
+
+    def _count_bulk_request(self) -> None:
+        with self._lock:
+            self.bulk_requests += 1
+
+    def _flush(self, batch: _Batch, send: Callable[[Dict[str, Any]], Any]) -> None:
+        self._count_bulk_request()
+        try:
+            responses = split_bulk_response(send({REQUESTS_KEY: batch.items}), len(batch.items))
+        except BaseException as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        for future, response in zip(batch.futures, responses):
+            future.set_result(response)
+
+    async def submit_async(self, item: Any, send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> BatchedResponse:
+        """
+        Event-loop counterpart of submit; send returns an awaitable.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            batch = self._pending_async.get(loop)
+            leader = batch is None
+            if leader:
+                batch = self._pending_async[loop] = _Batch(asyncio.Event())
+            if self._join(batch, item, future):
+                del self._pending_async[loop]
+                batch.full.set()
+        if leader:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if self._pending_async.get(loop) is batch:
+                        del self._pending_async[loop]
+                # Sent on its own task: cancelling the leader must not fail the calls that joined it.
+                task = loop.create_task(self._flush_async(batch, send))
+                self._flushing.add(task)
+                task.add_done_callback(self._flushing.discard)
+        return await asyncio.shield(future)
+
+    async def _flush_async(self, batch: _Batch, send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> None:
+        self._count_bulk_request()
+        try:
+            responses = split_bulk_response(await send({REQUESTS_KEY: batch.items}), len(batch.items))
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # mark retrieved when its caller was cancelled
+            return
+        for future, response in zip(batch.futures, responses):
+            if not future.done():
+                future.set_result(response)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Calls batched, bulk requests sent and the average batch size.
+        """
+        return {
+            "calls": self.calls,
+            "bulk_requests": self.bulk_requests,
+            "average_batch_size": self.calls / self.bulk_requests if self.bulk_requests else 0.0,
+        }
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        TTL + LRU cache of upstream responses with request coalescing.
+
+        Cached values are response objects (anything with status_code, content and json());
+        they are shared between sessions and must be treated as read-only.
+
+        Parameters:
+        - ttl: Seconds an entry stays fresh.
+        - max_entries: Maximum number of entries before the least recently used is evicted.
+        - max_bytes: Optional bound on the summed size of cached response bodies.
+        - clock: Monotonic time source, replaceable in tests.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.logger = logging.getLogger("ResponseCache")
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._in_flight_async: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict[str, Any]] = None) -> Hashable:
+        """
+        Cache key from the method, URL and rendered query parameters.
+        """
+        return (method.upper(), url, json.dumps(params or {}, sort_keys=True, default=str))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the fresh cached value for key, or None.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value; its size is the length of its content.
+        """
+        size = len(getattr(value, "content", b"") or b"")
+        with self._lock:
+            self._store(key, value, size)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any], cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached value for key, or call fetch() once for all concurrent callers.
+
+        Parameters:
+        - key: The cache key (see make_key).
+        - fetch: Performs the upstream call and returns the response.
+        - cacheable: Decides whether a fetched response may be stored (e.g. only 200s).
+
+        Returns:
+        - The cached or freshly fetched response.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                # Only the caller that goes upstream counts as a miss; the others are coalesced.
+                self.misses += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            if cacheable(value):
+                self._store(key, value, len(getattr(value, "content", b"") or b""))
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    async def get_or_fetch_async(self, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                                 cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Event-loop counterpart of get_or_fetch; concurrent tasks share one upstream call.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._in_flight_async.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = asyncio.get_running_loop().create_future()
+                self._in_flight_async[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            value = await fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight_async[key]
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        with self._lock:
+            if cacheable(value):
+                self._store(key, value, len(getattr(value, "content", b"") or b""))
+            del self._in_flight_async[key]
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters and current occupancy.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _lookup(self, key: Hashable) -> Optional[Any]:
+        # Caller holds self._lock.
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, size, value = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self._bytes -= size
+        return None
+
+    def _store(self, key: Hashable, value: Any, size: int) -> None:
+        # Caller holds self._lock.
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        self._entries[key] = (self.clock() + self.ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
@@ -0,0 +1,125 @@
+import itertools
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Tile types that wait on a person; per-tile time limits do not apply to them.
+INTERACTIVE_TILE_TYPES = ("UserInteractionTile",)
+
+
+class BudgetExceededError(RuntimeError):
+    def __init__(self, reason: str, message: str, tile_id: Any = None, steps: int = 0, elapsed: float = 0.0):
+        """
+        A run used up one of its budgets.
+
+        Parameters:
+        - reason: "max_steps", "deadline" or "tile_time_limit".
+        - message: Human readable description.
+        - tile_id: The tile that was about to run, or had just run, when the budget ran out.
+        - steps: Steps executed so far.
+        - elapsed: Seconds since the run started.
+        """
+        super().__init__(message)
+        self.reason = reason
+        self.tile_id = tile_id
+        self.steps = steps
+        self.elapsed = elapsed
+
+    def report(self) -> Dict[str, Any]:
+        return {"reason": self.reason, "tile_id": self.tile_id, "steps": self.steps, "elapsed": self.elapsed, "message": str(self)}
+
+
+class RunBudget:
+    def __init__(self, max_steps: Optional[int] = None, deadline_seconds: Optional[float] = None,
+                 tile_time_limit: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Step and time budget of one engine run, shared by all of its parallel branches.
+
+        Parameters:
+        - max_steps: Tiles the run may execute; None for no limit.
+        - deadline_seconds: Wall-clock seconds the run may take; None for no limit.
+        - tile_time_limit: Default seconds a single non-interactive tile may take; a tile's own
+          "time_limit" (next to its "configuration") overrides it.
+        - clock: Monotonic time source.
+        """
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.tile_time_limit = tile_time_limit
+        self.clock = clock
+        self.started = clock()
+        self.deadline = self.started + deadline_seconds if deadline_seconds is not None else None
+        # next() on itertools.count is atomic, so branch threads can share it without a lock.
+        self._counter = itertools.count(1)
+        self.steps = 0
+
+    @classmethod
+    def combine(cls, definition_limits: Dict[str, float], max_steps: Optional[int] = None,
+                deadline_seconds: Optional[float] = None, tile_time_limit: Optional[float] = None) -> "RunBudget":
+        """
+        A budget from an engine's limits and a definition's "limits"; where both set one, the smaller wins.
+        """
+        def tighter(engine_limit, definition_limit):
+            if engine_limit is None or definition_limit is None:
+                return definition_limit if engine_limit is None else engine_limit
+            return min(engine_limit, definition_limit)
+
+        return cls(
+            max_steps=tighter(max_steps, definition_limits.get("max_steps")),
+            deadline_seconds=tighter(deadline_seconds, definition_limits.get("deadline_seconds")),
+            tile_time_limit=tighter(tile_time_limit, definition_limits.get("tile_time_limit")),
+        )
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started
+
+    def charge(self, tile_id: Any) -> None:
+        """
+        Account for one step about to run tile_id.
+
+        Raises:
+        - BudgetExceededError: When the step budget or the deadline is used up.
+        """
+        self.steps = next(self._counter)
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise BudgetExceededError("max_steps", f"Run exceeded {self.max_steps} steps at tile {tile_id!r}.",
+                                      tile_id, self.steps - 1, self.elapsed())
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise BudgetExceededError("deadline", f"Run exceeded its {self.deadline_seconds}s deadline at tile {tile_id!r}.",
+                                      tile_id, self.steps - 1, self.elapsed())
+
+    def time_limit_for(self, tile: Dict[str, Any]) -> Optional[float]:
+        """
+        Seconds the tile may take: its own limit (non-interactive tiles only), capped by
+        what is left of the deadline. None when unlimited.
+        """
+        limit = None
+        if tile.get("type") not in INTERACTIVE_TILE_TYPES:
+            limit = tile.get("time_limit", self.tile_time_limit)
+        if self.deadline is not None:
+            remaining = max(self.deadline - self.clock(), 0.0)
+            limit = remaining if limit is None else min(limit, remaining)
+        return limit
+
+    def check_tile(self, tile: Dict[str, Any], duration: float) -> None:
+        """
+        Fail the run when a tile took longer than its time limit.
+
+        Raises:
+        - BudgetExceededError: With reason "tile_time_limit".
+        """
+        if tile.get("type") in INTERACTIVE_TILE_TYPES:
+            return
+        limit = tile.get("time_limit", self.tile_time_limit)
+        if limit is not None and duration > limit:
+            raise BudgetExceededError("tile_time_limit", f"Tile {tile.get('id')!r} took {duration:.3f}s, over its {limit}s limit.",
+                                      tile.get("id"), self.steps, self.elapsed())
+
+    def timed_out(self, tile: Dict[str, Any]) -> BudgetExceededError:
+        """
+        The error for a tile that was cancelled at its time limit (async engine).
+        """
+        if self.deadline is not None and self.clock() >= self.deadline:
+            return BudgetExceededError("deadline", f"Run exceeded its {self.deadline_seconds}s deadline at tile {tile.get('id')!r}.",
+                                       tile.get("id"), self.steps, self.elapsed())
+        limit = tile.get("time_limit", self.tile_time_limit)
+        return BudgetExceededError("tile_time_limit", f"Tile {tile.get('id')!r} was cancelled at its {limit}s limit.",
+                                   tile.get("id"), self.steps, self.elapsed())
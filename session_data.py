@@ -0,0 +1,392 @@
+import json
+import logging
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, List, Optional
+
+from template_renderer import parse_path
+
+logger = logging.getLogger("SessionData")
+
+# Key under which per-tile outputs are visible, e.g. {{tiles.4.response.status}}.
+NAMESPACE_KEY = "tiles"
+
+# Control-flow keys tiles return; kept beside the data, never stored in it.
+CONTROL_KEYS = ("next_tile",)
+
+_CHECKPOINT_MARKER = "__session_data__"
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate retained size of a JSON-like value: the length of its compact JSON encoding.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value) + 2
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+def project(output: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    """
+    Keep only the given dotted paths of a tile output, e.g. ["response.order_status"].
+    A path that is missing is left out.
+    """
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        steps = parse_path(path)
+        value: Any = output
+        for step in steps:
+            if isinstance(value, Mapping) and str(step) in value:
+                value = value[str(step)]
+            elif isinstance(value, list) and isinstance(step, int) and -len(value) <= step < len(value):
+                value = value[step]
+            else:
+                break
+        else:
+            target = projected
+            for step in steps[:-1]:
+                target = target.setdefault(str(step), {})
+            target[str(steps[-1])] = value
+    return projected
+
+
+class RetentionPolicy:
+    def __init__(self, max_value_bytes: Optional[int] = None, max_session_bytes: Optional[int] = None):
+        """
+        How much of what tiles return a session keeps.
+
+        Parameters:
+        - max_value_bytes: A single output field larger than this (e.g. a whole API body) is
+          replaced by {"omitted": True, "bytes": <size>}; project it with the tile's "retain"
+          paths to keep the parts that matter. None keeps everything.
+        - max_session_bytes: When a session's data grows past this, the outputs of the least
+          recently run tiles are dropped (never the latest one). None for no limit.
+        """
+        self.max_value_bytes = max_value_bytes
+        self.max_session_bytes = max_session_bytes
+
+    @property
+    def limits_size(self) -> bool:
+        """Whether sessions have to keep track of their size to apply this policy."""
+        return self.max_value_bytes is not None or self.max_session_bytes is not None
+
+
+DEFAULT_RETENTION = RetentionPolicy()
+
+
+class SessionData(MutableMapping):
+    def __init__(self, values: Optional[Dict[str, Any]] = None, retention: Optional[RetentionPolicy] = None):
+        """
+        A session's workflow data: flat variables plus each tile's output in its own namespace.
+
+        Reading works like the old flat dict: a tile's output keys (selected_option, response,
+        ...) are also visible at the top level, pointing at the latest tile that wrote them, and
+        data["tiles"][<tile id>] holds every tile's own output. next_tile is control flow and is
+        kept in .next_tile, not in the data.
+
+        Snapshots are copy-on-write: snapshot() is O(1) and the first write on either side copies
+        the top-level dicts only (values themselves are never mutated in place, only replaced).
+
+        Parameters:
+        - values: Initial variables; the dict is not modified.
+        - retention: RetentionPolicy for tile outputs; None keeps everything.
+        """
+        self._values: Dict[str, Any] = values if values is not None else {}
+        self._namespaces: Dict[str, Dict[str, Any]] = {}
+        # flat key -> namespace it mirrors; such keys cost nothing extra and are not checkpointed twice
+        self._aliases: Dict[str, str] = {}
+        # estimated bytes of each plain variable, and of each namespace's output; kept only when
+        # the retention policy limits sizes, so unlimited sessions never serialise values to count them
+        self._sizes: Dict[str, int] = {}
+        self._output_sizes: Dict[str, int] = {}
+        self._shared = values is not None
+        self.retention = retention or DEFAULT_RETENTION
+        self._sized = self.retention.limits_size
+        self.next_tile: Any = None
+        self._nbytes = 0
+        # Changes since the last take_changes(), when tracked (see track_changes).
+        self.changes: Optional[List[List[Any]]] = None
+        for key in list(self._values):
+            if key in CONTROL_KEYS:
+                self._own()
+                self.next_tile = self._values.pop(key)
+            elif self._sized:
+                self._sizes[key] = estimate_size(self._values[key])
+                self._nbytes += self._sizes[key]
+
+    @classmethod
+    def wrap(cls, data: Any, retention: Optional[RetentionPolicy] = None) -> "SessionData":
+        """
+        The SessionData for data: data itself, a restored checkpoint, or a new one over a flat dict.
+        """
+        if isinstance(data, SessionData):
+            return data
+        if data is None:
+            return cls(retention=retention)
+        if isinstance(data, Mapping) and data.get(_CHECKPOINT_MARKER):
+            return cls.restore(data, retention)
+        return cls(dict(data), retention)
+
+    def _own(self) -> None:
+        # Copy-on-write: take private copies of the shared top-level dicts before a write.
+        if self._shared:
+            self._values = dict(self._values)
+            self._namespaces = dict(self._namespaces)
+            self._aliases = dict(self._aliases)
+            self._sizes = dict(self._sizes)
+            self._output_sizes = dict(self._output_sizes)
+            self._shared = False
+
+    def snapshot(self) -> "SessionData":
+        """
+        An independent copy in O(1); parallel branches and checkpoints start from one.
+        """
+        copy = SessionData.__new__(SessionData)
+        copy._values = self._values
+        copy._namespaces = self._namespaces
+        copy._aliases = self._aliases
+        copy._sizes = self._sizes
+        copy._output_sizes = self._output_sizes
+        copy.retention = self.retention
+        copy._sized = self._sized
+        copy.next_tile = self.next_tile
+        copy._nbytes = self._nbytes
+        copy.changes = None
+        copy._shared = self._shared = True
+        return copy
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate size of the data (see estimate_size): kept up to date under a RetentionPolicy
+        with byte limits, computed on demand otherwise.
+        """
+        if self._sized:
+            return self._nbytes
+        plain = sum(estimate_size(value) for key, value in self._values.items() if key not in self._aliases)
+        return plain + sum(estimate_size(value) for output in self._namespaces.values() for value in output.values())
+
+    # -- mapping interface (the flat view) ----------------------------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._values:
+            return self._values[key]
+        if key in CONTROL_KEYS:
+            return self.next_tile
+        if key == NAMESPACE_KEY:
+            return self._namespaces
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Hot path for the engine and conditions: avoid the KeyError round trip.
+        if key in self._values:
+            return self._values[key]
+        if key in CONTROL_KEYS:
+            return self.next_tile
+        if key == NAMESPACE_KEY:
+            return self._namespaces
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._values or key == NAMESPACE_KEY
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in CONTROL_KEYS:
+            self.next_tile = value
+            return
+        self._own()
+        if self.changes is not None:
+            self.changes.append(["set", key, value])
+        self._values[key] = value
+        if self._aliases.pop(key, None) is None:
+            self._nbytes -= self._sizes.get(key, 0)
+        if self._sized:
+            size = estimate_size(value)
+            self._sizes[key] = size
+            self._nbytes += size
+
+    def __delitem__(self, key: str) -> None:
+        if key in CONTROL_KEYS:
+            self.next_tile = None
+            return
+        self._own()
+        del self._values[key]
+        if self.changes is not None:
+            self.changes.append(["del", key])
+        if self._aliases.pop(key, None) is None:
+            self._nbytes -= self._sizes.pop(key, 0)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"SessionData({self._values!r}, next_tile={self.next_tile!r})"
+
+    # -- tile outputs -------------------------------------------------------------------------
+
+    def record(self, tile_id: Any, output: Optional[Dict[str, Any]], retain: Optional[List[str]] = None) -> None:
+        """
+        Store what a tile returned: control keys go to .next_tile, the rest into the tile's
+        namespace (projected to retain, capped by the retention policy) and the flat view.
+
+        Parameters:
+        - tile_id: The tile that produced output.
+        - output: The tile's return value.
+        - retain: Dotted paths of output to keep (the tile definition's "retain"); None keeps all.
+        """
+        output = dict(output or {})
+        for key in CONTROL_KEYS:
+            if key in output:
+                self.next_tile = output.pop(key)
+        if not output:
+            # Routing-only tiles (LogicBuilder, FlowJump) get no namespace at all.
+            return
+        if retain is not None:
+            output = project(output, retain)
+        max_value_bytes = self.retention.max_value_bytes
+        size = 0
+        if self._sized:
+            for key, value in output.items():
+                value_size = estimate_size(value)
+                if max_value_bytes is not None and value_size > max_value_bytes:
+                    output[key] = {"omitted": True, "bytes": value_size}
+                    value_size = estimate_size(output[key])
+                size += value_size
+
+        self._own()
+        namespace = str(tile_id)
+        previous = self._namespaces.pop(namespace, None)
+        if previous is not None:
+            self._nbytes -= self._output_sizes.pop(namespace, 0)
+            for key in previous:
+                if key not in output and self._aliases.get(key) == namespace:
+                    # No longer backed by the namespace: it stays, as a plain variable.
+                    del self._aliases[key]
+                    if self._sized:
+                        self._sizes[key] = estimate_size(self._values[key])
+                        self._nbytes += self._sizes[key]
+        self._namespaces[namespace] = output
+        if self._sized:
+            self._output_sizes[namespace] = size
+            self._nbytes += size
+        for key, value in output.items():
+            if self._aliases.get(key) is None and key in self._values:
+                self._nbytes -= self._sizes.pop(key, 0)
+            self._values[key] = value
+            self._aliases[key] = namespace
+        if self.changes is not None:
+            self.changes.append(["record", tile_id, output])
+        self._enforce_session_limit(namespace)
+
+    def _enforce_session_limit(self, latest: str) -> None:
+        limit = self.retention.max_session_bytes
+        if limit is None:
+            return
+        for namespace in list(self._namespaces):
+            if self._nbytes <= limit or namespace == latest:
+                break
+            self._drop_output(namespace)
+            logger.debug("Dropped output of tile %s to keep the session under %d bytes", namespace, limit)
+
+    def _drop_output(self, namespace: str) -> None:
+        output = self._namespaces.pop(namespace)
+        self._nbytes -= self._output_sizes.pop(namespace, 0)
+        for key in output:
+            if self._aliases.get(key) == namespace:
+                del self._aliases[key]
+                del self._values[key]
+        if self.changes is not None:
+            self.changes.append(["drop", namespace])
+
+    def output_of(self, tile_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        What tile_id last returned (after retention), or None.
+        """
+        return self._namespaces.get(str(tile_id))
+
+    # -- change tracking ----------------------------------------------------------------------
+
+    def track_changes(self) -> None:
+        """
+        Start logging every change to the data (not to next_tile) in .changes, as JSON-able ops
+        that apply_changes replays; execution journals record them as per-step deltas.
+        """
+        if self.changes is None:
+            self.changes = []
+
+    def take_changes(self) -> List[List[Any]]:
+        """
+        The changes logged since the last call, clearing the log.
+        """
+        changes = self.changes or []
+        if self.changes is not None:
+            self.changes = []
+        return changes
+
+    def apply_changes(self, changes: List[List[Any]]) -> None:
+        """
+        Replay changes logged by another SessionData (see track_changes). Tile outputs are logged
+        as stored, after projection and retention, and retention drops are logged too, so replaying
+        into a SessionData without retention limits (the default) reproduces the original.
+        """
+        for change in changes:
+            op = change[0]
+            if op == "set":
+                self[change[1]] = change[2]
+            elif op == "del":
+                if change[1] in self._values:
+                    del self[change[1]]
+            elif op == "record":
+                self.record(change[1], change[2])
+            elif op == "drop":
+                if change[1] in self._namespaces:
+                    self._drop_output(change[1])
+            else:
+                raise ValueError(f"Unknown session data change {op!r}")
+
+    # -- export / checkpoints -----------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The flat view as a plain dict, with the tile namespaces under "tiles".
+        """
+        exported = dict(self._values)
+        exported[NAMESPACE_KEY] = {namespace: dict(output) for namespace, output in self._namespaces.items()}
+        return exported
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        Compact JSON-serialisable form for session stores; flat aliases are stored once, as
+        references to their namespace. SessionData.wrap / restore reads it back.
+
+        The checkpoint owns its dicts (one level deep), so later writes to the session do not
+        show through it.
+        """
+        return {
+            _CHECKPOINT_MARKER: 1,
+            "values": {key: value for key, value in self._values.items() if key not in self._aliases},
+            "tiles": {namespace: dict(output) for namespace, output in self._namespaces.items()},
+            "aliases": dict(self._aliases),
+        }
+
+    @classmethod
+    def restore(cls, checkpoint: Mapping, retention: Optional[RetentionPolicy] = None) -> "SessionData":
+        data = cls(dict(checkpoint.get("values") or {}), retention)
+        data._shared = False
+        data._namespaces = {namespace: dict(output) for namespace, output in (checkpoint.get("tiles") or {}).items()}
+        data._aliases = dict(checkpoint.get("aliases") or {})
+        for namespace, output in data._namespaces.items():
+            if data._sized:
+                size = sum(estimate_size(value) for value in output.values())
+                data._output_sizes[namespace] = size
+                data._nbytes += size
+        for key, namespace in data._aliases.items():
+            data._values[key] = data._namespaces[namespace][key]
+        return data
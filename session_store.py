@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote
+
+
+class SessionStore:
+    """
+    Where suspended workflow sessions are checkpointed between steps.
+
+    A checkpoint is a JSON-serialisable dict (see WorkflowManager for its fields). Every
+    backend stores it serialised, so what comes back from load() never aliases what was saved
+    and a session can be resumed by any process that shares the backend.
+    """
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def list_sessions(self) -> List[str]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _dumps(state: Dict[str, Any]) -> str:
+        return json.dumps(state, separators=(",", ":"), default=str)
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self):
+        """
+        Process-local store; checkpoints are kept as compact JSON strings.
+        """
+        self._sessions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        encoded = self._dumps(state)
+        with self._lock:
+            self._sessions[session_id] = encoded
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            encoded = self._sessions.get(session_id)
+        return json.loads(encoded) if encoded is not None else None
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str):
+        """
+        SQLite-backed store, shareable by every worker process on the host.
+
+        Parameters:
+        - path: Database file; created if missing.
+        """
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads; keep one per thread.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        connection = self._connection()
+        connection.execute(
+            "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (session_id, self._dumps(state), time.time()),
+        )
+        connection.commit()
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, session_id: str) -> None:
+        connection = self._connection()
+        connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        connection.commit()
+
+    def list_sessions(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT session_id FROM sessions")]
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class FileSessionStore(SessionStore):
+    def __init__(self, directory: str):
+        """
+        One JSON file per session, written atomically; suits a shared volume.
+
+        Parameters:
+        - directory: Directory holding the checkpoint files; created if missing.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        # Percent-encoded, so distinct session IDs never share a file ("a/b" -> "a%2Fb").
+        return os.path.join(self.directory, f"{quote(session_id, safe='')}.json")
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(self._dumps(state))
+            os.replace(temp_path, self._path(session_id))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._read(self._path(session_id))
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def list_sessions(self) -> List[str]:
+        sessions = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json"):
+                state = self._read(os.path.join(self.directory, file_name))
+                if state is not None:
+                    sessions.append(state.get("session_id", unquote(file_name[:-5])))
+        return sessions
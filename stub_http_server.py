@@ -0,0 +1,128 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# A route handler receives (query params, parsed JSON body) and returns (status code, JSON-able body).
+RouteHandler = Callable[[Dict[str, Any], Any], Tuple[int, Any]]
+
+
+def bulk_route(item_route: Any) -> RouteHandler:
+    """
+    A POST route for a bulk lookup endpoint (see micro_batcher): answers {"requests": [params, ...]}
+    with {"results": [...]}, one entry per request from item_route, which is a fixed body or a
+    RouteHandler called with each request's params. Items that are not 200 come back as null.
+    """
+    def handle(params: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+        requests = (body or {}).get("requests")
+        if not isinstance(requests, list):
+            return 400, {"error": "expected {\"requests\": [...]}"}
+        results = []
+        for item in requests:
+            status, result = item_route(item, None) if callable(item_route) else (200, item_route)
+            results.append(result if status == 200 else None)
+        return 200, {"results": results}
+
+    return handle
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is what those tests want, not an error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubHTTPServer:
+    def __init__(self, routes: Optional[Dict[Tuple[str, str], Any]] = None, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        """
+        Local JSON HTTP server for exercising APICallTiles without a real upstream.
+
+        Parameters:
+        - routes: Mapping of (method, path) to either a fixed JSON body (served with 200)
+          or a RouteHandler returning (status code, body).
+        - host: Interface to bind.
+        - port: Port to bind; 0 picks a free one.
+        - latency: Seconds to sleep before answering each request.
+        """
+        self.routes = dict(routes or {})
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def add_route(self, method: str, path: str, response: Any) -> None:
+        self.routes[(method.upper(), path)] = response
+
+    def start(self) -> "StubHTTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubHTTPServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _dispatch(self, method: str, raw_path: str, body: bytes) -> Tuple[int, Any]:
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(raw_path)
+        route = self.routes.get((method, parsed.path))
+        if route is None:
+            return 404, {"error": f"no stub route for {method} {parsed.path}"}
+        if not callable(route):
+            return 200, route
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        payload = json.loads(body) if body else None
+        return route(params, payload)
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs
+            # add ~40ms to every keep-alive request.
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, payload = stub._dispatch(self.command, self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,147 @@
+"""
+{{placeholder}} templates for tile configuration.
+
+A templated value (string, or dict/list containing strings) is compiled once into a renderer
+that reads from workflow_data:
+
+    "{{order_id}}"                        -> the raw value of workflow_data["order_id"]
+    "Hi {{response.results.0.name.first}}" -> string with the value substituted
+    {"order_id": "{{order_id}}"}           -> dict with each value rendered
+
+A string that is exactly one placeholder keeps the value's type; placeholders inside longer
+strings are converted with str(). Missing values render as None / "".
+"""
+
+import functools
+import re
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+
+class TemplateSyntaxError(ValueError):
+    pass
+
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z0-9_]+)*)\s*\}\}")
+
+
+def lookup_path(data: Any, steps: Sequence[Any]) -> Any:
+    """
+    Follow a parsed path (keys and list indexes) through nested mappings and lists.
+
+    Parameters:
+    - data: The root mapping, usually workflow_data.
+    - steps: Path segments; int segments index lists (or string keys that look like ints).
+
+    Returns:
+    - The value found, or None if any segment is missing.
+    """
+    value = data
+    for step in steps:
+        if isinstance(value, Mapping):
+            if step in value:
+                value = value[step]
+            elif isinstance(step, int):
+                value = value.get(str(step))
+            else:
+                return None
+        elif isinstance(value, Sequence) and not isinstance(value, (str, bytes)) and isinstance(step, int):
+            if not -len(value) <= step < len(value):
+                return None
+            value = value[step]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def parse_path(path: str) -> Tuple[Any, ...]:
+    return tuple(int(part) if part.isdigit() else part for part in path.split("."))
+
+
+class CompiledTemplate:
+    def __init__(self, render: Callable[[Mapping[str, Any]], Any], placeholders: List[str], constant: bool):
+        """
+        A compiled templated value.
+
+        Parameters:
+        - render: Function producing the rendered value from workflow_data.
+        - placeholders: Every placeholder path used, for validation and reporting.
+        - constant: True when the value contains no placeholders at all.
+        """
+        self._render = render
+        self.placeholders = placeholders
+        self.is_constant = constant
+
+    def render(self, workflow_data: Optional[Mapping[str, Any]] = None) -> Any:
+        return self._render(workflow_data if workflow_data is not None else {})
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_string(template: str) -> CompiledTemplate:
+    matches = list(_PLACEHOLDER_RE.finditer(template))
+    leftover = _PLACEHOLDER_RE.sub("", template)
+    if "{{" in leftover or "}}" in leftover:
+        raise TemplateSyntaxError(f"Malformed placeholder in template {template!r}")
+    if not matches:
+        return CompiledTemplate(lambda data: template, [], True)
+
+    paths = [match.group(1) for match in matches]
+    if len(matches) == 1 and matches[0].span() == (0, len(template)):
+        steps = parse_path(paths[0])
+        return CompiledTemplate(lambda data: lookup_path(data, steps), paths, False)
+
+    # Alternate literal text and path lookups, joined at render time.
+    parts: List[Any] = []
+    position = 0
+    for match in matches:
+        if match.start() > position:
+            parts.append(template[position:match.start()])
+        parts.append(parse_path(match.group(1)))
+        position = match.end()
+    if position < len(template):
+        parts.append(template[position:])
+    parts = tuple(parts)
+
+    def render(data):
+        rendered = []
+        for part in parts:
+            if isinstance(part, str):
+                rendered.append(part)
+            else:
+                value = lookup_path(data, part)
+                rendered.append("" if value is None else str(value))
+        return "".join(rendered)
+    return CompiledTemplate(render, paths, False)
+
+
+def compile_template(value: Any) -> CompiledTemplate:
+    """
+    Compile a templated configuration value once.
+
+    Parameters:
+    - value: A string, a dict or list (compiled recursively), or any other constant.
+
+    Returns:
+    - The CompiledTemplate.
+
+    Raises:
+    - TemplateSyntaxError: If a string contains a malformed placeholder.
+    """
+    if isinstance(value, str):
+        return _compile_string(value)
+    if isinstance(value, dict):
+        items = [(key, compile_template(item)) for key, item in value.items()]
+        placeholders = [path for _, item in items for path in item.placeholders]
+        if not placeholders:
+            return CompiledTemplate(lambda data: value, [], True)
+        renderers = [(key, item.render) for key, item in items]
+        return CompiledTemplate(lambda data: {key: render(data) for key, render in renderers}, placeholders, False)
+    if isinstance(value, list):
+        items = [compile_template(item) for item in value]
+        placeholders = [path for item in items for path in item.placeholders]
+        if not placeholders:
+            return CompiledTemplate(lambda data: value, [], True)
+        renderers = [item.render for item in items]
+        return CompiledTemplate(lambda data: [render(data) for render in renderers], placeholders, False)
+    return CompiledTemplate(lambda data: value, [], True)
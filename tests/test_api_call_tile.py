@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from TileExecuter import TileExecutor
+from async_http_client import AsyncHTTPClient
+from async_workflow_engine import AsyncWorkflowEngine
+from circuit_breaker import UpstreamGuard
+from http_pool import HTTPSessionPool
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+
+
+def make_executor(max_retries: int = 0) -> TileExecutor:
+    # A private pool and guard, so retries and circuit state do not leak between tests.
+    return TileExecutor(http_pool=HTTPSessionPool(max_retries=max_retries, backoff_factor=0),
+                        tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard())
+
+
+def make_engine(max_retries: int = 0) -> WorkflowEngine:
+    engine = WorkflowEngine()
+    engine.tile_executor = make_executor(max_retries)
+    return engine
+
+
+def status_workflow(url: str, **config) -> dict:
+    return {
+        "workflow_name": "status",
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "name": "lookup", "type": "APICallTile", "configuration": dict({"api_url": url, "next_tile": None}, **config)},
+            {"id": 2, "name": "apologise", "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+        ],
+    }
+
+
+def flaky_route(failures: int, status: int = 503):
+    lock = threading.Lock()
+    calls = []
+
+    def flaky(params, body):
+        with lock:
+            calls.append(1)
+            attempt = len(calls)
+        return (status, {}) if attempt <= failures else (200, {"order_status": "Late"})
+    return flaky
+
+
+def run_async(definition: dict, client: AsyncHTTPClient) -> dict:
+    async def main():
+        engine = AsyncWorkflowEngine(http_client=client, tile_executor=make_executor())
+        try:
+            return await engine.run_workflow("s1", definition)
+        finally:
+            await engine.close()
+
+    return asyncio.run(main())
+
+
+def test_successful_call_stores_response():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "On Time"}}) as server:
+        data = make_engine().run_workflow("s1", status_workflow(server.url("/status")))
+    assert data["response"] == {"order_status": "On Time"}
+    assert server.request_count == 1
+
+
+def test_timeout_takes_fallback_tile():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "On Time"}}, latency=0.5) as server:
+        data = make_engine().run_workflow("s1", status_workflow(server.url("/status"), timeout=[1.0, 0.05], fallback_tile=2,
+                                                                fallback_action="Escalate to Support Agent"))
+    assert data["response"] is None
+    assert data["error"]["reason"] == "error"
+    assert "timed out" in data["error"]["message"].lower()
+    assert data["fallback_action"] == "Escalate to Support Agent"
+
+
+def test_retries_unavailable_upstream():
+    with StubHTTPServer({("GET", "/status"): flaky_route(2)}) as server:
+        engine = make_engine(max_retries=2)
+        data = engine.run_workflow("s1", status_workflow(server.url("/status")))
+    assert data["response"] == {"order_status": "Late"}
+    assert server.request_count == 3
+    assert engine.tile_executor.http_pool.stats()["retries"] == 2
+
+
+def test_error_status_takes_fallback_tile():
+    with StubHTTPServer({("GET", "/status"): lambda params, body: (500, {})}) as server:
+        data = make_engine().run_workflow("s1", status_workflow(server.url("/status"), fallback_tile=2))
+    assert data["error"]["reason"] == "status"
+    assert "500" in data["error"]["message"]
+    assert "fallback_action" not in data
+
+
+def test_fallback_action_without_tile_escalates():
+    with StubHTTPServer({("GET", "/status"): lambda params, body: (500, {})}) as server:
+        engine = make_engine()
+        data = engine.run_workflow("s1", status_workflow(server.url("/status"), fallback_action="Escalate to Support Agent"))
+    assert engine.workflow_manager.get_workflow_status("s1") == WorkflowStatus.ESCALATED
+    assert data["fallback_action"] == "Escalate to Support Agent"
+
+
+def test_failure_without_fallback_fails_run():
+    with StubHTTPServer({("GET", "/status"): lambda params, body: (500, {})}) as server:
+        engine = make_engine()
+        engine.run_workflow("s1", status_workflow(server.url("/status")))
+    assert engine.workflow_manager.get_workflow_status("s1") == WorkflowStatus.FAILED
+
+
+def test_async_client_retries_idempotent_calls_only():
+    with StubHTTPServer({("GET", "/status"): flaky_route(2), ("POST", "/status"): flaky_route(2)}) as server:
+        client = AsyncHTTPClient(max_retries=2, backoff_factor=0)
+        data = run_async(status_workflow(server.url("/status")), client)
+        assert data["response"] == {"order_status": "Late"}
+        assert (server.request_count, client.retries) == (3, 2)
+
+        client = AsyncHTTPClient(max_retries=2, backoff_factor=0)
+        run_async(status_workflow(server.url("/status"), http_method="POST", payload={}), client)
+        assert (server.request_count, client.retries) == (4, 0)
+
+
+def test_async_call_applies_the_tile_timeout():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "On Time"}}, latency=0.5) as server:
+        started = time.perf_counter()
+        data = run_async(status_workflow(server.url("/status"), timeout=[1.0, 0.05], fallback_tile=2),
+                         AsyncHTTPClient(max_retries=0))
+        assert time.perf_counter() - started < 0.4
+    assert data["response"] is None
+    assert data["error"]["reason"] == "error"
@@ -0,0 +1,58 @@
+import asyncio
+
+from TileExecuter import TileExecutor
+from async_workflow_engine import AsyncWorkflowEngine
+from circuit_breaker import UpstreamGuard
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowStatus
+
+
+def order_workflow(url: str, **config) -> dict:
+    return {
+        "workflow_name": "order",
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "type": "UserInteractionTile", "configuration": {"prompt": "Issue?", "options": ["late", "wrong"], "next_tile": 2}},
+            {"id": 2, "type": "APICallTile", "configuration": dict({"api_url": url, "next_tile": None}, **config)},
+        ],
+    }
+
+
+def run(definition: dict, sessions: int, **engine_options):
+    async def main():
+        engine = AsyncWorkflowEngine(tile_executor=TileExecutor(tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard()),
+                                     **engine_options)
+        queues = {}
+        for index in range(sessions):
+            queues[f"s{index}"] = asyncio.Queue()
+            queues[f"s{index}"].put_nowait("late")
+        try:
+            results = await engine.run_many(definition, list(queues), queues)
+        finally:
+            await engine.close()
+        return engine, results
+
+    return asyncio.run(main())
+
+
+def test_sessions_share_one_loop():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "Late"}}, latency=0.2) as server:
+        engine, results = run(order_workflow(server.url("/status")), 50)
+    assert [data["response"] for data in results] == [{"order_status": "Late"}] * 50
+    assert all(data["selected_option"] == "late" for data in results)
+    assert server.request_count == 50
+    assert {engine.workflow_manager.get_workflow_status(f"s{index}") for index in range(50)} == {WorkflowStatus.COMPLETED}
+
+
+def test_failed_call_ends_run_escalated():
+    with StubHTTPServer({("GET", "/status"): lambda params, body: (503, {})}) as server:
+        engine, results = run(order_workflow(server.url("/status"), fallback_action="Escalate to Support Agent"), 1)
+    assert results[0]["fallback_action"] == "Escalate to Support Agent"
+    assert engine.workflow_manager.get_workflow_status("s0") == WorkflowStatus.ESCALATED
+
+
+def test_budget_exceeded_is_recorded():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "Late"}}) as server:
+        engine, _ = run(order_workflow(server.url("/status")), 1, max_steps=1)
+    assert engine.workflow_manager.get_workflow_status("s0") == WorkflowStatus.BUDGET_EXCEEDED
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def open_breaker(clock: Clock) -> CircuitBreaker:
+    breaker = CircuitBreaker("upstream", min_calls=2, open_seconds=5, clock=clock)
+    for _ in range(2):
+        breaker.record(breaker.before_call(), True)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_on_failure_rate_and_rejects_until_open_seconds_pass():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now = 6
+    trial = breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(trial, False)
+    assert breaker.state == CLOSED
+
+
+def test_calls_admitted_before_a_state_change_are_ignored():
+    clock = Clock()
+    breaker = CircuitBreaker("upstream", min_calls=2, open_seconds=5, clock=clock)
+    slow = breaker.before_call()
+    for _ in range(2):
+        breaker.record(breaker.before_call(), True)
+    clock.now = 6
+    trial = breaker.before_call()
+    # The slow call from the closed circuit ends now: it must neither close the circuit nor
+    # free the trial slot.
+    breaker.record(slow, False)
+    breaker.cancel(slow)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(trial, True)
+    assert breaker.state == OPEN
+
+
+def test_bulkhead_fails_fast_without_max_wait():
+    bulkhead = Bulkhead("upstream", 1)
+    bulkhead.acquire()
+    with pytest.raises(BulkheadFullError):
+        bulkhead.acquire()
+    bulkhead.release()
+    assert bulkhead.in_flight == 0
+    assert bulkhead.rejected == 1
+
+
+def test_bulkhead_hands_slots_to_waiting_threads_in_arrival_order():
+    bulkhead = Bulkhead("upstream", 1, max_wait=5)
+    bulkhead.acquire()
+    order = []
+
+    def call(name):
+        bulkhead.acquire()
+        order.append(name)
+        bulkhead.release()
+
+    threads = []
+    for name in ("first", "second", "third"):
+        thread = threading.Thread(target=call, args=(name,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    bulkhead.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["first", "second", "third"]
+    assert bulkhead.in_flight == 0
+
+
+def test_async_bulkhead_waits_in_order_times_out_and_survives_cancellation():
+    async def scenario():
+        bulkhead = Bulkhead("upstream", 1, max_wait=0.2)
+        await bulkhead.acquire_async()
+        order = []
+
+        async def call(name):
+            await bulkhead.acquire_async()
+            order.append(name)
+            bulkhead.release()
+
+        first = asyncio.ensure_future(call("first"))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.ensure_future(call("cancelled"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(call("second"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        bulkhead.release()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        assert bulkhead.in_flight == 0
+
+        await bulkhead.acquire_async()
+        with pytest.raises(BulkheadFullError):
+            await bulkhead.acquire_async()
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import pytest
+
+from compiled_workflow import CompiledWorkflow
+
+
+def tile(tile_id, tile_type="FlowJumpTile", **config):
+    return {"id": tile_id, "type": tile_type, "configuration": config}
+
+
+def test_indexes_tiles_and_resolves_edges_and_connections():
+    compiled = CompiledWorkflow({
+        "workflow_name": "support",
+        "start_tile": 1,
+        "tiles": [
+            tile(1, "LogicBuilderTile", condition="true", true_tile=2, false_tile=3),
+            tile(2, jump_target=3),
+            tile(3, jump_target=None),
+        ],
+        "connections": [{"source_tile_id": 3, "target_tile_id": 1}, {"source_tile_id": 1, "target_tile_id": 2}],
+    })
+    assert compiled.get_tile(2)["configuration"] == {"jump_target": 3}
+    assert compiled.get_tile(99) is None
+    assert compiled.edges[1] == {"true_tile": 2, "false_tile": 3}
+    assert compiled.adjacency == {1: [2], 2: [], 3: [1]}
+    assert compiled.successors(1) == [2, 3]
+    assert compiled.successors(3) == [1]
+
+
+def test_identical_definitions_share_a_key():
+    definition = {"workflow_name": "w", "start_tile": 1, "tiles": [tile(1, jump_target=None)]}
+    assert CompiledWorkflow(definition).key == CompiledWorkflow(dict(definition)).key
+
+
+@pytest.mark.parametrize("definition", [
+    {"workflow_name": "w", "start_tile": 2, "tiles": [tile(1, jump_target=None)]},
+    {"workflow_name": "w", "start_tile": 1, "tiles": [tile(1, jump_target=None), tile(1, jump_target=None)]},
+    {"workflow_name": "w", "start_tile": 1, "tiles": [tile(1, jump_target=7)]},
+    {"workflow_name": "w", "start_tile": 1, "tiles": [tile(1, jump_target=None)],
+     "connections": [{"source_tile_id": 1, "target_tile_id": 5}]},
+    {"workflow_name": "w", "start_tile": 1, "tiles": [tile(1, jump_target=None)], "tileids": [1, 2]},
+])
+def test_rejects_broken_references(definition):
+    with pytest.raises(ValueError):
+        CompiledWorkflow(definition)
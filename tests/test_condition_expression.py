@@ -0,0 +1,52 @@
+import pytest
+
+from TileExecuter import TileExecutor
+from compiled_workflow import CompiledWorkflow
+from condition_expression import ConditionSyntaxError, compile_condition
+
+DATA = {"selected_option": "Order Delayed", "response": {"status": "late", "results": [{"age": 31}]}, "count": 3}
+
+
+@pytest.mark.parametrize("source, expected", [
+    ('selected_option == "Order Delayed"', True),
+    ('selected_option == "Order Delayed" and response.status == "on time"', False),
+    ("response.results[0].age >= 18 or not response", True),
+    ('selected_option in ["Order Delayed", "Wrong Items Delivered"]', True),
+    ('"late" not in response.status', False),
+    ("count * 2 + 1 == 7 and count % 2 == 1", True),
+    ("missing.path == null", True),
+    ("response.results[5].age > 1", False),
+    ('count > "three"', False),
+])
+def test_evaluates_against_workflow_data(source, expected):
+    assert compile_condition(source)(DATA) is expected
+
+
+def test_literals_are_constant_and_sources_are_shared():
+    assert compile_condition("True").is_constant
+    assert compile_condition(False).constant_value is False
+    assert compile_condition("count > 1") is compile_condition("count > 1")
+
+
+@pytest.mark.parametrize("source", ["count >", "(count == 1", "count == 1 1", "__import__('os')"])
+def test_rejects_malformed_expressions(source):
+    with pytest.raises(ConditionSyntaxError):
+        compile_condition(source)
+
+
+def test_logic_builder_tile_branches_on_its_condition():
+    definition = {
+        "workflow_name": "route",
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "type": "LogicBuilderTile",
+             "configuration": {"condition": 'selected_option == "Order Delayed"', "true_tile": 2, "false_tile": 3}},
+            {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+            {"id": 3, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+        ],
+    }
+    compiled = CompiledWorkflow(definition)
+    executor = TileExecutor()
+    tile = compiled.get_tile(1)
+    assert executor.execute_tile(tile, {"selected_option": "Order Delayed"}, compiled.key)["next_tile"] == 2
+    assert executor.execute_tile(tile, {"selected_option": "Wrong Items Delivered"}, compiled.key)["next_tile"] == 3
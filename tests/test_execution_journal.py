@@ -0,0 +1,87 @@
+from TileExecuter import TileExecutor
+from execution_journal import ExecutionJournal
+from input_channels import CallbackChannel
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflow_manager import WorkflowManager
+from workflowengine_new import WorkflowEngine
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: nothing in the engine catches it."""
+
+
+def refund_workflow(server: StubHTTPServer) -> dict:
+    return {
+        "workflow_name": "refund",
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "type": "UserInteractionTile", "configuration": {"prompt": "Issue?", "options": ["late", "wrong"], "next_tile": 2}},
+            {"id": 2, "type": "APICallTile", "configuration": {"api_url": server.url("/orders/refund"), "method": "POST",
+                                                               "payload": {"order": "{{order_id}}"}, "next_tile": 3}},
+            {"id": 3, "type": "UserInteractionTile", "configuration": {"prompt": "Anything else?", "options": ["yes", "no"], "next_tile": None}},
+        ],
+    }
+
+
+def make_engine(directory: str = None) -> WorkflowEngine:
+    engine = WorkflowEngine(journal=ExecutionJournal(directory) if directory else None)
+    engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False))
+    return engine
+
+
+def last_option() -> CallbackChannel:
+    return CallbackChannel(lambda session_id, prompt: prompt["options"][-1])
+
+
+def test_resume_after_crash_does_not_repeat_committed_post(tmp_path):
+    with StubHTTPServer({("POST", "/orders/refund"): {"refund": "ok"}}) as server:
+        workflow = refund_workflow(server)
+        expected = make_engine().run_workflow("reference", workflow, {"order_id": 7}, last_option()).to_dict()
+        before = server.request_count
+
+        engine = make_engine(str(tmp_path))
+
+        def crash_after_refund(event):
+            if event["tile_id"] == 2:
+                raise Crash()
+
+        engine.tile_executor.add_listener(crash_after_refund)
+        try:
+            engine.run_workflow("s1", workflow, {"order_id": 7}, last_option())
+        except Crash:
+            pass
+        engine.journal.commit()
+        assert server.request_count - before == 1
+
+        restarted = make_engine(str(tmp_path))
+        recovered = restarted.journal.recover()
+        assert list(recovered) == ["s1"]
+        data = restarted.resume_workflow(recovered["s1"], workflow, last_option())
+        restarted.journal.close()
+
+    assert data.to_dict() == expected
+    assert server.request_count - before == 1
+    assert make_engine(str(tmp_path)).journal.recover() == {}
+
+
+def test_manager_recovers_waiting_sessions(tmp_path):
+    with StubHTTPServer({("POST", "/orders/refund"): {"refund": "ok"}}) as server:
+        workflow = refund_workflow(server)
+        manager = WorkflowManager(workflow_engine=make_engine(str(tmp_path)))
+        manager.register_workflow(workflow)
+        for index in range(4):
+            manager.start_workflow(f"s{index}", "refund", {"order_id": index})
+        manager.submit_reply("s0", "late")
+        manager.submit_reply("s1", "late")
+        manager.submit_reply("s1", "no")
+        manager.workflow_engine.journal.commit()
+
+        # A new process with an empty session store rebuilds the live sessions from the journal.
+        restarted = WorkflowManager(workflow_engine=make_engine(str(tmp_path)), registry=manager.registry)
+        recovered = restarted.recover()
+        assert sorted(recovered) == ["s0", "s2", "s3"]
+        assert recovered["s0"]["current_tile_id"] == 3
+        assert recovered["s2"]["current_tile_id"] == 1
+        assert restarted.submit_reply("s0", "no")["status"] == "completed"
+        restarted.workflow_engine.journal.close()
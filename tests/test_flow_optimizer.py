@@ -0,0 +1,182 @@
+import copy
+import json
+import os
+import random
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from TileExecuter import TileExecutor
+from benchmarks.workflow_generator import generate_workflow
+from flow_optimizer import optimize_workflow
+from input_channels import CallbackChannel
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowEngine
+
+WORKFLOW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workflow1.json")
+
+# Tiles whose execution a user or an upstream can observe; routing tiles are what the optimizer removes.
+OBSERVABLE_TILE_TYPES = ("APICallTile", "UserInteractionTile", "ParallelTile", "JoinTile")
+
+ROUTING = {
+    "workflow_name": "routing",
+    "start_tile": 1,
+    "tiles": [
+        {"id": 1, "type": "FlowJumpTile", "configuration": {"jump_target": 2}},
+        {"id": 2, "type": "LogicBuilderTile", "configuration": {"condition": "1 == 0", "true_tile": 9, "false_tile": 3}},
+        {"id": 3, "type": "UserInteractionTile",
+         "configuration": {"prompt": "Issue?", "options": ["Late", "Wrong"], "next_tile": 4}},
+        {"id": 4, "type": "LogicBuilderTile",
+         "configuration": {"condition": 'selected_option == "Late"', "true_tile": 5, "false_tile": 6}},
+        {"id": 5, "type": "FlowJumpTile", "configuration": {"jump_target": 6}},
+        {"id": 6, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+        {"id": 9, "type": "UserInteractionTile", "configuration": {"prompt": "Never", "options": ["x"], "next_tile": None}},
+    ],
+}
+
+
+def test_collapses_jumps_and_folds_constant_conditions():
+    optimized, report = optimize_workflow(ROUTING)
+    assert optimized["start_tile"] == 3
+    assert [tile["id"] for tile in optimized["tiles"]] == [3, 4]
+    config = optimized["tiles"][1]["configuration"]
+    assert (config["true_tile"], config["false_tile"]) == (None, None)
+    assert sorted(report["collapsed_jumps"]) == [1, 2, 5, 6]
+    assert report["folded_conditions"] == {2: False}
+    assert report["removed_unreachable"] == [9]
+    assert ROUTING["start_tile"] == 1  # the input is left alone
+
+
+def test_keeps_a_start_tile_that_ends_the_run():
+    definition = {"workflow_name": "empty", "start_tile": 1,
+                  "tiles": [{"id": 1, "type": "FlowJumpTile", "configuration": {"jump_target": None}}]}
+    optimized, _ = optimize_workflow(definition)
+    assert optimized["start_tile"] == 1
+    assert len(optimized["tiles"]) == 1
+
+
+# -- equivalence: the optimized flow must behave exactly like the original --------------------
+
+def _echo(path: str, calls: List[Tuple[str, Any, Any]]):
+    def handle(params: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+        calls.append((path, params, body))
+        # A deterministic answer that still differs between sessions, so branches on it vary.
+        digest = zlib.crc32(json.dumps([params, body], sort_keys=True).encode("utf-8"))
+        return 200, {"params": params, "body": body, "order_status": "On Time" if digest % 2 else "Delayed"}
+    return handle
+
+
+def _stub_api_calls(definition: Dict[str, Any], server: StubHTTPServer, calls: List[Tuple[str, Any, Any]]) -> Dict[str, Any]:
+    # Point every APICallTile at its own echo route; done before optimizing, so both copies share them.
+    definition = copy.deepcopy(definition)
+    for tile in definition.get("tiles", []):
+        config = tile.get("configuration", {})
+        if tile.get("type") == "APICallTile":
+            path = f"/tiles/{tile.get('id')}"
+            for method in ("GET", "POST", "PUT", "DELETE"):
+                server.add_route(method, path, _echo(path, calls))
+            config["api_url"] = server.url(path)
+            config.pop("batch", None)
+    return definition
+
+
+def with_constant_conditions(definition: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A copy of a generated workflow whose body LogicBuilderTiles have constant conditions, so the
+    optimizer has branches to fold and not only jumps to collapse.
+    """
+    definition = copy.deepcopy(definition)
+    definition["workflow_name"] += "-constant"
+    for tile in definition["tiles"]:
+        config = tile["configuration"]
+        if tile["type"] == "LogicBuilderTile" and config.get("condition") == "session != null":
+            config["condition"] = "true" if tile["id"] % 3 else "1 == 0"
+    return definition
+
+
+def _run(engine: WorkflowEngine, definition: Dict[str, Any], sessions: int, seed: int,
+         calls: List[Tuple[str, Any, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    compiled = engine.compile_workflow(definition)
+    events: List[Dict[str, Any]] = []
+    engine.tile_executor.add_listener(events.append)
+    transcripts, steps = [], 0
+    try:
+        for index in range(sessions):
+            rng = random.Random(seed * 100003 + index)
+            transcript: List[Any] = []
+
+            def answer(session_id: Optional[str], prompt: Dict[str, Any]) -> Any:
+                options = prompt.get("options") or []
+                # Loops must end: later prompts lean towards the last option ("stop" in loop flows).
+                choice = options[-1] if options and len(transcript) >= 8 else (rng.choice(options) if options else "")
+                transcript.append(("prompt", prompt.get("text"), list(options), choice))
+                return choice
+
+            del events[:]
+            del calls[:]
+            data = engine.run_workflow(f"s{index}", compiled, {"session": f"s{index}", "order_id": index}, CallbackChannel(answer))
+            steps += len(events)
+            observed = [(event["tile_id"], event["tile_type"], event["outcome"], event["error"])
+                        for event in events if event["tile_type"] in OBSERVABLE_TILE_TYPES]
+            transcripts.append({
+                "prompts": transcript,
+                "upstream_calls": list(calls),
+                "tiles": observed,
+                "workflow_data": data.to_dict(),
+            })
+    finally:
+        engine.tile_executor.remove_listener(events.append)
+    return transcripts, steps
+
+
+def check_equivalence(definition: Dict[str, Any], sessions: int = 20, seed: int = 0) -> Tuple[Dict[str, Any], int, int]:
+    """
+    Run a definition and its optimized form over the same scripted sessions and compare them.
+
+    Each session answers prompts with seeded random choices; APICallTiles hit a local echo server.
+    Per session the prompts and answers, the upstream requests, the sequence of observable tiles
+    (API calls, questions, fan-outs and joins, with outcomes) and the final workflow data must match.
+
+    Returns:
+    - (optimizer report, steps run by the original, steps run by the optimized form).
+    """
+    calls: List[Tuple[str, Any, Any]] = []
+    with StubHTTPServer() as server:
+        original = _stub_api_calls(definition, server, calls)
+        optimized, report = optimize_workflow(original)
+        engine = WorkflowEngine()
+        engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False))
+        before, steps_before = _run(engine, original, sessions, seed, calls)
+        after, steps_after = _run(engine, optimized, sessions, seed, calls)
+
+    for index, (expected, actual) in enumerate(zip(before, after)):
+        for aspect in ("prompts", "upstream_calls", "tiles", "workflow_data"):
+            assert expected[aspect] == actual[aspect], f"session {index} differs in {aspect}"
+    return report, steps_before, steps_after
+
+
+def _generated() -> List[Dict[str, Any]]:
+    definitions = []
+    for shape in ("linear", "branching", "loop"):
+        generated = generate_workflow(shape, 60, api_url="http://placeholder/", api_every=7,
+                                      question_every=9 if shape == "linear" else 0)
+        definitions.extend([generated, with_constant_conditions(generated)])
+    return definitions
+
+
+@pytest.mark.parametrize("definition", _generated(), ids=lambda definition: definition["workflow_name"])
+def test_optimized_generated_flows_behave_like_the_originals(definition):
+    report, steps_before, steps_after = check_equivalence(definition)
+    assert report["tiles_after"] < report["tiles_before"]
+    assert steps_after < steps_before
+
+
+def test_optimized_workflow1_behaves_like_the_original():
+    definition = WorkflowEngine.load_workflow_from_file(WORKFLOW_FILE)
+    check_equivalence(definition)
+
+
+def test_optimized_routing_flow_behaves_like_the_original():
+    check_equivalence(ROUTING)
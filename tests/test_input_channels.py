@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_workflow_engine import AsyncWorkflowEngine
+from input_channels import (CallbackChannel, ChannelExhaustedError, InvalidChoiceError, QueueChannel, ReplayChannel,
+                            resolve_choice)
+from workflowengine_new import WorkflowEngine
+
+OPTIONS = ["Order Delayed", "Wrong Items Delivered"]
+
+DEFINITION = {
+    "workflow_name": "ask",
+    "start_tile": 1,
+    "tiles": [
+        {"id": 1, "type": "UserInteractionTile",
+         "configuration": {"prompt": "What seems to be the issue?", "options": OPTIONS, "next_tile": 2}},
+        {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+    ],
+}
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("Order Delayed", "Order Delayed"),
+    ("  wrong items delivered ", "Wrong Items Delivered"),
+    ("2", "Wrong Items Delivered"),
+    (1, "Order Delayed"),
+])
+def test_resolve_choice_accepts_options_case_and_numbers(answer, expected):
+    assert resolve_choice(OPTIONS, answer) == expected
+
+
+@pytest.mark.parametrize("answer", ["Refund", "3", 0, True])
+def test_resolve_choice_rejects_other_answers(answer):
+    with pytest.raises(InvalidChoiceError):
+        resolve_choice(OPTIONS, answer)
+
+
+def test_replay_channel_drives_sessions_from_a_script():
+    channel = ReplayChannel({"*": ["1"], "s2": ["wrong items delivered"]})
+    engine = WorkflowEngine()
+    assert engine.run_workflow("s1", DEFINITION, channel=channel)["selected_option"] == "Order Delayed"
+    assert engine.run_workflow("s2", DEFINITION, channel=channel)["selected_option"] == "Wrong Items Delivered"
+    with pytest.raises(ChannelExhaustedError):
+        channel.receive("s1", {})
+
+
+def test_queue_channel_re_asks_after_an_invalid_answer():
+    channel = QueueChannel(timeout=5)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(WorkflowEngine().run_workflow("s1", DEFINITION, channel=channel)))
+    worker.start()
+    channel.put("s1", "Refund")
+    channel.put("s1", "Order Delayed")
+    worker.join(5)
+    assert result["selected_option"] == "Order Delayed"
+    prompts = channel.pending_prompts("s1")
+    assert [prompt.get("error") is not None for prompt in prompts] == [False, True]
+
+
+def test_async_callback_channel_answers_on_the_event_loop():
+    async def answer(session_id, prompt):
+        await asyncio.sleep(0)
+        return prompt["options"][-1]
+
+    async def run():
+        engine = AsyncWorkflowEngine()
+        try:
+            return await engine.run_workflow("s1", DEFINITION, channel=CallbackChannel(answer))
+        finally:
+            await engine.close()
+
+    assert asyncio.run(run())["selected_option"] == "Wrong Items Delivered"
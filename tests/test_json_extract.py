@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from TileExecuter import TileExecutor
+from circuit_breaker import UpstreamGuard
+from instrumentation import Tracer
+from json_extract import CompiledExtract, ResponseTooLargeError, read_capped
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowEngine
+
+ORDER = {"order": {"status": "Late", "id": 7}, "items": [{"sku": "A1", "qty": 2}, {"sku": "B2"}], "audit": ["x"] * 100}
+
+
+def chunked(document, size: int = 16):
+    body = json.dumps(document).encode("utf-8")
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def test_mapping_renames_selections_and_missing_paths_give_none():
+    extract = CompiledExtract({"status": "order.status", "sku": "items.1.sku", "gone": "order.eta"})
+    expected = {"status": "Late", "sku": "B2", "gone": None}
+    assert extract.from_value(ORDER) == expected
+    assert extract.from_chunks(chunked(ORDER)) == expected
+
+
+def test_list_keeps_selections_at_their_paths():
+    extract = CompiledExtract(["order", "order.status", "items.0.sku"])
+    expected = {"order": {"status": "Late", "id": 7}, "items": {"0": {"sku": "A1"}}}
+    assert extract.from_value(ORDER) == expected
+    assert extract.from_chunks(chunked(ORDER)) == expected
+
+
+@pytest.mark.parametrize("spec", [{}, [], {"status": ""}, "order.status"])
+def test_rejects_malformed_specs(spec):
+    with pytest.raises(ValueError):
+        CompiledExtract(spec)
+
+
+def test_read_capped_stops_at_the_limit():
+    assert b"".join(read_capped([b"abc", b"def"], 6)) == b"abcdef"
+    with pytest.raises(ResponseTooLargeError):
+        list(read_capped([b"abc", b"def"], 5))
+
+
+def run_lookup(server, **config):
+    engine = WorkflowEngine()
+    engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard())
+    definition = {
+        "workflow_name": "lookup",
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "type": "APICallTile",
+             "configuration": dict({"api_url": server.url("/order"), "next_tile": None, "fallback_tile": 2}, **config)},
+            {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+        ],
+    }
+    return engine.run_workflow("s1", definition)
+
+
+def test_api_call_tile_keeps_only_the_extracted_fields():
+    with StubHTTPServer({("GET", "/order"): ORDER}) as server:
+        data = run_lookup(server, extract={"status": "order.status"})
+    assert data["response"] == {"status": "Late"}
+
+
+def test_api_call_tile_refuses_bodies_over_max_response_bytes():
+    with StubHTTPServer({("GET", "/order"): ORDER}) as server:
+        data = run_lookup(server, max_response_bytes=100)
+    assert data["response"] is None
+    assert data["error"]["reason"] == "too_large"
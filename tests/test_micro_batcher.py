@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from TileExecuter import TileExecutor
+from async_workflow_engine import AsyncWorkflowEngine
+from circuit_breaker import UpstreamGuard
+from instrumentation import Tracer
+from micro_batcher import BatchedResponse, MicroBatcher, split_bulk_response
+from stub_http_server import StubHTTPServer, bulk_route
+from workflowengine_new import WorkflowEngine
+
+
+def order_status(params, body):
+    return 200, {"order_id": params.get("order_id"), "order_status": "On Time"}
+
+
+def order_status_workflow(server) -> dict:
+    return {
+        "workflow_name": "order-status",
+        "start_tile": 1,
+        "tiles": [{"id": 1, "type": "APICallTile", "configuration": {
+            "api_url": server.url("/orders"), "params": {"order_id": "{{order_id}}"}, "next_tile": None,
+            "batch": {"bulk_url": server.url("/orders/bulk"), "window_ms": 50, "max_batch_size": 5}}}],
+    }
+
+
+def stub_server() -> StubHTTPServer:
+    return StubHTTPServer({("GET", "/orders"): order_status, ("POST", "/orders/bulk"): bulk_route(order_status)})
+
+
+def test_concurrent_calls_share_bulk_requests_and_get_their_own_results():
+    sent = []
+
+    def send(body):
+        sent.append(body["requests"])
+        return BatchedResponse(200, {"results": [{"echo": item} for item in body["requests"]]})
+
+    batcher = MicroBatcher("http://bulk.invalid", window_ms=200, max_batch_size=4)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda index: batcher.submit({"id": index}, send), range(8)))
+    assert [response.json() for response in responses] == [{"echo": {"id": index}} for index in range(8)]
+    assert sorted(len(batch) for batch in sent) == [4, 4]
+    assert batcher.stats() == {"calls": 8, "bulk_requests": 2, "average_batch_size": 4.0}
+
+
+def test_split_bulk_response_maps_null_to_404_and_failures_to_every_call():
+    assert [r.status_code for r in split_bulk_response(BatchedResponse(200, {"results": [{}, None]}), 2)] == [200, 404]
+    assert [r.status_code for r in split_bulk_response(BatchedResponse(503, None), 3)] == [503, 503, 503]
+    with pytest.raises(ValueError):
+        split_bulk_response(BatchedResponse(200, {"results": [{}]}), 2)
+
+
+def test_sync_sessions_are_batched_through_the_bulk_endpoint():
+    with stub_server() as server:
+        engine = WorkflowEngine()
+        engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard())
+        compiled = engine.compile_workflow(order_status_workflow(server))
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda index: engine.run_workflow(f"s{index}", compiled, {"order_id": index}), range(10)))
+        assert [data["response"]["order_id"] for data in results] == list(range(10))
+        assert server.request_count < 10
+
+
+def test_async_sessions_are_batched_on_the_event_loop():
+    async def run(server):
+        engine = AsyncWorkflowEngine(tile_executor=TileExecutor(tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard()))
+        compiled = WorkflowEngine.compile_workflow(order_status_workflow(server))
+        try:
+            return await asyncio.gather(*(engine.run_workflow(f"s{index}", compiled, workflow_data={"order_id": index})
+                                          for index in range(10)))
+        finally:
+            await engine.close()
+
+    with stub_server() as server:
+        results = asyncio.run(run(server))
+        assert [data["response"]["order_id"] for data in results] == list(range(10))
+        assert server.request_count == 2
@@ -0,0 +1,75 @@
+import time
+
+from TileExecuter import TileExecutor
+from circuit_breaker import UpstreamGuard
+from instrumentation import Tracer
+from stub_http_server import StubHTTPServer
+from workflowengine_new import WorkflowEngine
+
+
+def make_engine(**options) -> WorkflowEngine:
+    engine = WorkflowEngine(**options)
+    engine.tile_executor = TileExecutor(tracer=Tracer(enabled=False), upstream_guard=UpstreamGuard())
+    return engine
+
+
+def fan_out_workflow(server, policy: str, quorum=None) -> dict:
+    # "order" answers at once; "profile" first waits, then calls; "refund" always fails.
+    return {
+        "workflow_name": "fan-out-" + policy,
+        "start_tile": 1,
+        "tiles": [
+            {"id": 1, "type": "ParallelTile", "configuration": {
+                "branches": [{"name": "order", "start_tile": 2}, {"name": "profile", "start_tile": 3},
+                             {"name": "refund", "start_tile": 5}],
+                "join_tile": 6}},
+            {"id": 2, "type": "APICallTile", "configuration": {"api_url": server.url("/order"), "next_tile": 6}},
+            {"id": 3, "type": "WaitTile", "configuration": {"seconds": 0.3, "next_tile": 4}},
+            {"id": 4, "type": "APICallTile", "configuration": {"api_url": server.url("/profile"), "next_tile": 6}},
+            {"id": 5, "type": "APICallTile", "configuration": {"api_url": server.url("/refund"), "next_tile": 6}},
+            {"id": 6, "type": "JoinTile", "configuration": {"policy": policy, "quorum": quorum,
+                                                            "next_tile": 7, "failure_tile": 8}},
+            {"id": 7, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+            {"id": 8, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+        ],
+    }
+
+
+def routes(profile_calls=None):
+    def profile(params, body):
+        if profile_calls is not None:
+            profile_calls.append(params)
+        return 200, {"profile": 2}
+    return {("GET", "/order"): {"order": 1}, ("GET", "/profile"): profile,
+            ("GET", "/refund"): lambda params, body: (500, {})}
+
+
+def test_all_policy_fails_when_a_branch_fails():
+    with StubHTTPServer(routes()) as server:
+        data = make_engine().run_workflow("s1", fan_out_workflow(server, "all"))
+    # "refund" fails long before the waiting "profile" branch could finish.
+    assert data["join"]["satisfied"] is False
+    assert data["join"]["failed"] == ["refund"]
+    assert "profile" in data["join"]["cancelled"]
+    assert data["branches"]["profile"] is None
+
+
+def test_decided_join_stops_running_branches_before_their_next_tile():
+    profile_calls = []
+    with StubHTTPServer(routes(profile_calls)) as server:
+        data = make_engine().run_workflow("s1", fan_out_workflow(server, "any"))
+        # Give the waiting branch time to wake up; it must not go on to call upstream.
+        time.sleep(0.5)
+    assert data["join"]["completed"] == ["order"]
+    assert "profile" in data["join"]["cancelled"]
+    assert data["join"]["satisfied"] is True
+    assert data["branches"]["order"] == {"response": {"order": 1}}
+    assert profile_calls == []
+
+
+def test_branches_run_on_the_caller_thread_when_the_shared_pool_is_busy():
+    with StubHTTPServer(routes()) as server:
+        data = make_engine(max_branch_threads=1).run_workflow("s1", fan_out_workflow(server, "quorum", 2))
+    assert sorted(data["join"]["completed"]) == ["order", "profile"]
+    assert data["join"]["satisfied"] is True
+    assert data["branches"]["profile"] == {"response": {"profile": 2}}
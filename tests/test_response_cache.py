@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from TileExecuter import TileExecutor
+from compiled_workflow import CompiledWorkflow
+from response_cache import ResponseCache
+from stub_http_server import StubHTTPServer
+
+
+class Response:
+    def __init__(self, status_code: int = 200, content: bytes = b"{}"):
+        self.status_code = status_code
+        self.content = content
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(ttl=60)
+    release = threading.Event()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        release.wait(5)
+        return Response()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_fetch, "key", fetch) for _ in range(8)]
+        while cache.coalesced < 7:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(fetches) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.get_or_fetch("key", fetch) is results[0]
+    assert len(fetches) == 1
+
+
+def test_failed_fetch_is_shared_and_not_cached():
+    cache = ResponseCache(ttl=60)
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.get_or_fetch, "key", failing) for _ in range(4)]
+        while cache.coalesced < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        errors = [future.exception() for future in futures]
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert cache.get("key") is None
+
+
+def test_uncacheable_response_is_fetched_again():
+    cache = ResponseCache(ttl=60)
+    cache.get_or_fetch("key", lambda: Response(503), lambda response: response.status_code == 200)
+    assert cache.get("key") is None
+
+
+def test_async_misses_share_one_fetch():
+    cache = ResponseCache(ttl=60)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        return Response()
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch_async("key", fetch) for _ in range(20)))
+
+    results = asyncio.run(main())
+    assert len(fetches) == 1
+    assert cache.coalesced == 19
+    assert all(result is results[0] for result in results)
+
+
+def test_api_call_tile_sessions_share_cached_lookup():
+    with StubHTTPServer({("GET", "/status"): {"order_status": "On Time"}}, latency=0.1) as server:
+        definition = {"workflow_name": "cached", "start_tile": 1, "tiles": [
+            {"id": 1, "type": "APICallTile", "name": "lookup",
+             "configuration": {"api_url": server.url("/status"), "next_tile": None, "cache": {"ttl": 60}}},
+        ]}
+        executor = TileExecutor()
+        compiled = CompiledWorkflow(definition)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda index: executor.execute_tile(compiled.get_tile(1), {}, compiled.key), range(10)))
+
+    assert [data["response"] for data in results] == [{"order_status": "On Time"}] * 10
+    assert server.request_count == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from compiled_workflow import CompiledWorkflow
+from run_budget import BudgetExceededError, RunBudget
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+
+
+def chain(length: int, limits=None) -> dict:
+    tiles = [{"id": index, "type": "FlowJumpTile", "configuration": {"jump_target": index + 1 if index < length else None}}
+             for index in range(1, length + 1)]
+    definition = {"workflow_name": "chain", "start_tile": 1, "tiles": tiles}
+    if limits:
+        definition["limits"] = limits
+    return definition
+
+
+def test_combine_takes_the_tighter_limit():
+    budget = RunBudget.combine({"max_steps": 10, "deadline_seconds": 5}, max_steps=100, deadline_seconds=None)
+    assert (budget.max_steps, budget.deadline_seconds) == (10, 5)
+
+
+def test_charge_stops_at_max_steps():
+    budget = RunBudget(max_steps=2)
+    budget.charge(1)
+    budget.charge(2)
+    with pytest.raises(BudgetExceededError) as raised:
+        budget.charge(3)
+    assert (raised.value.reason, raised.value.tile_id) == ("max_steps", 3)
+
+
+def test_run_over_max_steps_ends_as_budget_exceeded():
+    engine = WorkflowEngine(max_steps=3)
+    engine.run_workflow("long", chain(5))
+    assert engine.workflow_manager.get_workflow_status("long") == WorkflowStatus.BUDGET_EXCEEDED
+    engine.run_workflow("fits", chain(3))
+    assert engine.workflow_manager.get_workflow_status("fits") != WorkflowStatus.BUDGET_EXCEEDED
+    # The engine's limit applies even where the definition allows more.
+    engine.run_workflow("looser", chain(5, {"max_steps": 10}))
+    assert engine.workflow_manager.get_workflow_status("looser") == WorkflowStatus.BUDGET_EXCEEDED
+
+
+def test_loops_without_an_exit_are_rejected_unless_a_person_breaks_them():
+    spin = {"workflow_name": "spin", "start_tile": 1, "tiles": [
+        {"id": 1, "type": "FlowJumpTile", "configuration": {"jump_target": 2}},
+        {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": 1}},
+    ]}
+    with pytest.raises(ValueError):
+        CompiledWorkflow(spin)
+    ask = {"workflow_name": "ask", "start_tile": 1, "tiles": [
+        {"id": 1, "type": "UserInteractionTile", "configuration": {"prompt": "Again?", "options": ["yes"], "next_tile": 2}},
+        {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": 1}},
+    ]}
+    assert CompiledWorkflow(ask).cycles == [{"tiles": [1, 2], "has_exit": False, "interactive": True, "waits": False}]
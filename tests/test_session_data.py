@@ -0,0 +1,38 @@
+from session_data import RetentionPolicy, SessionData
+
+
+def test_snapshot_is_copy_on_write():
+    data = SessionData({"user": "ada"})
+    data.record(1, {"order": {"id": 7}})
+    branch = data.snapshot()
+    branch["user"] = "grace"
+    branch.record(2, {"refund": True})
+    assert data["user"] == "ada"
+    assert "refund" not in data
+    assert data.output_of(2) is None
+    assert branch["order"] == {"id": 7}
+    assert branch.output_of(2) == {"refund": True}
+
+
+def test_record_projects_to_retain_and_caps_values():
+    data = SessionData(retention=RetentionPolicy(max_value_bytes=64))
+    data.record(1, {"response": {"status": "On Time", "body": "x" * 500}, "next_tile": 2},
+                retain=["response.status"])
+    assert data.next_tile == 2
+    assert data["response"] == {"status": "On Time"}
+    data.record(3, {"blob": "y" * 500})
+    assert data["blob"]["omitted"] is True
+
+
+def test_checkpoint_round_trips_and_is_not_changed_by_later_writes():
+    data = SessionData({"user": "ada"})
+    data.record(1, {"order": {"id": 7}})
+    checkpoint = data.checkpoint()
+    data.record(1, {"order": {"id": 8}})
+    data.record(2, {"refund": True})
+    assert checkpoint["tiles"] == {"1": {"order": {"id": 7}}}
+    assert checkpoint["aliases"] == {"order": "1"}
+    restored = SessionData.wrap(checkpoint)
+    assert restored["order"] == {"id": 7}
+    assert restored["user"] == "ada"
+    assert "refund" not in restored
@@ -0,0 +1,45 @@
+import pytest
+
+from session_store import FileSessionStore, InMemorySessionStore, SQLiteSessionStore
+from workflow_manager import WorkflowManager
+
+ASK = {
+    "workflow_name": "ask",
+    "start_tile": 1,
+    "tiles": [
+        {"id": 1, "type": "UserInteractionTile",
+         "configuration": {"prompt": "Issue?", "options": ["Late", "Wrong"], "next_tile": 2}},
+        {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+    ],
+}
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return FileSessionStore(str(tmp_path / "sessions"))
+
+
+def test_save_load_delete(store):
+    store.save("a/b", {"session_id": "a/b", "current_tile_id": 3})
+    store.save("a_b", {"session_id": "a_b", "current_tile_id": 4})
+    assert store.load("a/b")["current_tile_id"] == 3
+    assert sorted(store.list_sessions()) == ["a/b", "a_b"]
+    store.delete("a/b")
+    assert store.load("a/b") is None
+    assert store.list_sessions() == ["a_b"]
+
+
+def test_a_waiting_session_is_resumed_by_another_manager(store):
+    first = WorkflowManager(session_store=store)
+    first.register_workflow(ASK)
+    assert first.start_workflow("s1", ASK, {"customer": "ada"})["status"] == "waiting"
+
+    second = WorkflowManager(session_store=store)
+    second.register_workflow(ASK)
+    assert second.submit_reply("s1", "Late")["status"] == "completed"
+    data = second.get_workflow_state("s1")["workflow_data"]
+    assert (data["customer"], data["selected_option"]) == ("ada", "Late")
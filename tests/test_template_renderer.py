@@ -0,0 +1,36 @@
+import pytest
+
+from compiled_workflow import CompiledWorkflow
+from template_renderer import TemplateSyntaxError, compile_template
+
+DATA = {"order_id": 42, "response": {"results": [{"name": {"first": "Ada"}}]}, "note": None}
+
+
+def test_single_placeholder_keeps_the_value_type():
+    assert compile_template("{{order_id}}").render(DATA) == 42
+    assert compile_template("{{ response.results.0.name }}").render(DATA) == {"first": "Ada"}
+
+
+def test_placeholders_inside_text_are_converted_to_strings():
+    template = compile_template("Hi {{response.results.0.name.first}}, order {{order_id}}{{note}}.")
+    assert template.render(DATA) == "Hi Ada, order 42."
+    assert template.placeholders == ["response.results.0.name.first", "order_id", "note"]
+
+
+def test_dicts_and_lists_render_recursively_and_constants_stay_constant():
+    template = compile_template({"params": {"order_id": "{{order_id}}"}, "tags": ["{{missing}}", "fixed"]})
+    assert template.render(DATA) == {"params": {"order_id": 42}, "tags": [None, "fixed"]}
+    assert compile_template({"plain": ["text", 1]}).is_constant
+
+
+def test_malformed_placeholders_are_rejected_when_the_workflow_is_compiled():
+    with pytest.raises(TemplateSyntaxError):
+        compile_template("{{order id}}")
+    definition = {
+        "workflow_name": "bad",
+        "start_tile": 1,
+        "tiles": [{"id": 1, "type": "APICallTile",
+                   "configuration": {"api_url": "http://example.invalid/{{order id}}", "next_tile": None}}],
+    }
+    with pytest.raises(ValueError):
+        CompiledWorkflow(definition)
@@ -0,0 +1,28 @@
+from TileExecuter import TileExecutor
+from compiled_workflow import CompiledWorkflow
+
+
+def definition(name: str) -> dict:
+    return {"workflow_name": name, "start_tile": 1,
+            "tiles": [{"id": 1, "type": "FlowJumpTile", "configuration": {"jump_target": None}}]}
+
+
+def test_tile_instances_are_built_once_per_definition():
+    executor = TileExecutor()
+    compiled = CompiledWorkflow(definition("a"))
+    tile = compiled.get_tile(1)
+    first = executor.get_tile_instance(tile, compiled.key)
+    assert executor.get_tile_instance(tile, compiled.key) is first
+    assert executor.get_tile_instance(tile, CompiledWorkflow(definition("a")).key) is first
+    assert executor.get_tile_instance(tile) is not first
+
+
+def test_least_recently_used_definitions_are_evicted():
+    executor = TileExecutor(max_cached_definitions=2)
+    a, b, c = (CompiledWorkflow(definition(name)) for name in "abc")
+    kept = executor.get_tile_instance(a.get_tile(1), a.key)
+    evicted = executor.get_tile_instance(b.get_tile(1), b.key)
+    executor.get_tile_instance(a.get_tile(1), a.key)
+    executor.get_tile_instance(c.get_tile(1), c.key)
+    assert executor.get_tile_instance(a.get_tile(1), a.key) is kept
+    assert executor.get_tile_instance(b.get_tile(1), b.key) is not evicted
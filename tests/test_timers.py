@@ -0,0 +1,100 @@
+import asyncio
+
+from async_workflow_engine import AsyncWorkflowEngine
+from timer_scheduler import FakeClock, TimerScheduler
+from workflow_manager import WorkflowManager
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+
+FOLLOW_UP = {
+    "workflow_name": "follow_up",
+    "start_tile": "wait",
+    "tiles": [
+        {"id": "wait", "type": "WaitTile", "name": "wait", "configuration": {"seconds": "{{delay}}", "next_tile": "ask"}},
+        {"id": "ask", "type": "UserInteractionTile", "name": "ask",
+         "configuration": {"prompt": "Did it arrive?", "options": ["yes", "no"], "next_tile": None}},
+    ],
+}
+
+
+def make_manager(clock: FakeClock) -> WorkflowManager:
+    manager = WorkflowManager(workflow_engine=WorkflowEngine(clock=clock))
+    manager.register_workflow(FOLLOW_UP)
+    return manager
+
+
+def test_session_sleeps_until_its_timer_fires():
+    clock = FakeClock(1000.0)
+    manager = make_manager(clock)
+    state = manager.start_workflow("s1", "follow_up", {"delay": 60})
+    assert state["status"] == WorkflowStatus.SLEEPING
+    assert state["wake_at"] == 1060.0
+
+    clock.advance(59)
+    assert manager.run_due_timers() == {}
+    clock.advance(1)
+    woken = manager.run_due_timers()
+    assert woken["s1"]["status"] == WorkflowStatus.WAITING
+    assert woken["s1"]["prompt"]["text"] == "Did it arrive?"
+    assert manager.submit_reply("s1", "yes")["status"] == WorkflowStatus.COMPLETED
+
+
+def test_timers_fire_in_due_order_and_in_batches():
+    clock = FakeClock(0.0)
+    manager = make_manager(clock)
+    for index in range(5):
+        manager.start_workflow(f"s{index}", "follow_up", {"delay": 50 - index * 10})
+    clock.advance(30)
+    assert list(manager.run_due_timers(limit=2)) == ["s4", "s3"]
+    assert list(manager.run_due_timers()) == ["s2"]
+    assert len(manager.timers) == 2
+
+
+def test_stopped_session_is_not_woken():
+    clock = FakeClock(0.0)
+    manager = make_manager(clock)
+    manager.start_workflow("s1", "follow_up", {"delay": 5})
+    manager.stop_workflow("s1")
+    clock.advance(10)
+    assert manager.run_due_timers() == {}
+    assert manager.get_workflow_state("s1")["workflow_state"]["status"] == WorkflowStatus.STOPPED
+
+
+def test_new_manager_restores_timers_from_store():
+    clock = FakeClock(0.0)
+    manager = make_manager(clock)
+    manager.start_workflow("s1", "follow_up", {"delay": 30})
+
+    restarted = WorkflowManager(session_store=manager.session_store, workflow_engine=WorkflowEngine(clock=clock),
+                                registry=manager.registry)
+    assert restarted.restore_timers() == 1
+    assert restarted.timers.due_at("s1") == 30.0
+    clock.advance(30)
+    assert restarted.run_due_timers()["s1"]["status"] == WorkflowStatus.WAITING
+
+
+def test_blocking_engines_sleep_on_the_clock():
+    definition = {"workflow_name": "pause", "start_tile": "a", "tiles": [
+        {"id": "a", "type": "WaitTile", "name": "a", "configuration": {"seconds": 30, "next_tile": "b"}},
+        {"id": "b", "type": "WaitTile", "name": "b", "configuration": {"until": 100}},
+    ]}
+    clock = FakeClock(0.0)
+    WorkflowEngine(clock=clock).run_workflow("s1", definition)
+    assert clock.now == 100
+
+    clock = FakeClock(0.0)
+    engine = AsyncWorkflowEngine(clock=clock)
+    asyncio.run(engine.run_workflow("s1", definition))
+    asyncio.run(engine.close())
+    assert clock.now == 100
+    assert engine.workflow_manager.get_workflow_status("s1") == WorkflowStatus.COMPLETED
+
+
+def test_rescheduling_replaces_the_earlier_timer():
+    scheduler = TimerScheduler(FakeClock(0.0))
+    scheduler.schedule("a", 10)
+    scheduler.schedule("b", 20)
+    scheduler.schedule("a", 30)
+    scheduler.cancel("b")
+    assert scheduler.pop_due(25) == []
+    assert scheduler.pop_due(30) == ["a"]
+    assert len(scheduler) == 0
@@ -0,0 +1,47 @@
+import json
+import os
+
+from workflow_registry import WorkflowRegistry
+
+
+def definition(message: str) -> dict:
+    return {
+        "workflow_name": "greeting",
+        "start_tile": 1,
+        "tiles": [{"id": 1, "type": "FlowJumpTile", "configuration": {"jump_target": None}, "note": message}],
+    }
+
+
+def write(directory, message: str) -> None:
+    with open(os.path.join(directory, "greeting.json"), "w") as file:
+        json.dump(definition(message), file)
+
+
+def test_restart_reads_unchanged_files_from_the_json_cache(tmp_path):
+    definitions, cache = tmp_path / "definitions", tmp_path / "cache"
+    definitions.mkdir()
+    write(definitions, "hello")
+    first = WorkflowRegistry(str(definitions), cache_dir=str(cache))
+    fingerprint = first.latest_version("greeting")
+    cached = [name for name in os.listdir(cache) if name.startswith("greeting-")]
+    assert cached == [f"greeting-{fingerprint}.json"]
+    with open(cache / cached[0]) as file:
+        assert json.load(file) == definition("hello")
+
+    restarted = WorkflowRegistry(str(definitions), cache_dir=str(cache))
+    assert restarted.latest_version("greeting") == fingerprint
+    assert restarted.get("greeting").key == ("greeting", fingerprint)
+
+
+def test_pinned_version_survives_a_hot_swap_and_eviction(tmp_path):
+    definitions, cache = tmp_path / "definitions", tmp_path / "cache"
+    definitions.mkdir()
+    write(definitions, "hello")
+    registry = WorkflowRegistry(str(definitions), cache_dir=str(cache), max_versions_per_workflow=1)
+    pinned = registry.latest_version("greeting")
+    write(definitions, "hi there")
+    os.utime(definitions / "greeting.json", ns=(1, 1))
+    assert registry.refresh() == ["greeting"]
+    assert registry.latest_version("greeting") != pinned
+    assert pinned not in registry.versions("greeting")
+    assert registry.get("greeting", pinned).key == ("greeting", pinned)
@@ -0,0 +1,61 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from workflow_manager import WorkflowManager
+from workflow_registry import WorkflowRegistry
+from workflow_service import WorkflowService
+
+DEFINITION = {
+    "workflow_name": "support",
+    "start_tile": 1,
+    "tiles": [
+        {"id": 1, "type": "UserInteractionTile",
+         "configuration": {"prompt": "What is wrong?", "options": ["Order Delayed", "Wrong Items"], "next_tile": 2}},
+        {"id": 2, "type": "FlowJumpTile", "configuration": {"jump_target": None}},
+    ],
+}
+
+
+def with_client(scenario):
+    async def run():
+        registry = WorkflowRegistry()
+        registry.register(DEFINITION)
+        service = WorkflowService(WorkflowManager(registry=registry), workers=2)
+        async with TestClient(TestServer(service.make_app())) as client:
+            await scenario(client)
+
+    asyncio.run(run())
+
+
+def test_session_waits_for_a_reply_then_completes():
+    async def scenario(client):
+        response = await client.post("/sessions", json={"workflow": "support", "session_id": "s1",
+                                                        "data": {"customer": "ada"}})
+        assert response.status == 201
+        state = await response.json()
+        assert state["status"] == "waiting"
+        assert state["prompt"]["options"] == ["Order Delayed", "Wrong Items"]
+
+        response = await client.post("/sessions/s1/reply", json={"reply": "Nothing"})
+        assert response.status == 422
+        response = await client.post("/sessions/s1/reply", json={"reply": "Order Delayed"})
+        assert (await response.json())["status"] == "completed"
+
+        response = await client.get("/sessions/s1")
+        assert (await response.json())["workflow_data"]["customer"] == "ada"
+
+    with_client(scenario)
+
+
+def test_bad_requests_are_refused_with_400_or_404():
+    async def scenario(client):
+        for body in ({}, {"workflow": "support", "data": ["not", "a", "dict"]}, {"workflow": "support", "data": "x"}):
+            response = await client.post("/sessions", json=body)
+            assert response.status == 400, body
+        response = await client.post("/sessions", data=b"{not json")
+        assert response.status == 400
+        response = await client.get("/sessions/unknown")
+        assert response.status == 404
+
+    with_client(scenario)
@@ -1,4 +1,39 @@
-import requests
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from circuit_breaker import EscalationError, UpstreamError, UpstreamGuard, get_default_guard
+from http_pool import get_default_pool
+from micro_batcher import BatchedResponse, MicroBatcher
+from condition_expression import compile_condition
+from input_channels import ConsoleChannel, resolve_choice
+from json_extract import CHUNK_SIZE, CompiledExtract, ResponseTooLargeError, read_capped
+from response_cache import ResponseCache
+from template_renderer import compile_template
+
+# Per-step messages go to debug level: printing every step is a measurable share of CPU at volume.
+logger = logging.getLogger("tiles")
+
+class TileRuntime:
+    def __init__(self, session_id=None, http_client=None, input_queue=None, channel=None, idempotency_key=None, effects=None):
+        """
+        Per-run services handed to a tile at execute time. Tile instances are cached and
+        shared between sessions, so anything belonging to one run lives here instead.
+
+        Parameters:
+        - session_id: The workflow session the tile runs for.
+        - http_client: Shared async HTTP client (AsyncHTTPClient) used by execute_async.
+        - input_queue: asyncio.Queue the session's user replies arrive on.
+        - channel: InputChannel UserInteractionTiles prompt and read answers through.
+        - idempotency_key: Key of the step's side effects (see execution_journal).
+        - effects: ExecutionJournal holding side effects committed before a crash.
+        """
+        self.session_id = session_id
+        self.http_client = http_client
+        self.input_queue = input_queue
+        self.channel = channel
+        self.idempotency_key = idempotency_key
+        self.effects = effects
 
 class Tile:
     def __init__(self, name):
@@ -9,14 +44,18 @@ class Tile:
         """Configure the tile with the required parameters."""
         pass
 
-    def execute(self):
-        """Execute the tile's functionality."""
+    def execute(self, workflow_data=None):
+        """Execute the tile's functionality against the run's workflow_data."""
         pass
 
+    async def execute_async(self, workflow_data=None, runtime=None):
+        """Execute the tile on an event loop. Tiles that never block reuse execute()."""
+        return self.execute(workflow_data)
+
     def connect(self, tile):
         """Connect this tile to another tile."""
         self.connected_tiles.append(tile)
-        print(f"{self.name} is now connected to {tile.name}")
+        logger.debug("%s is now connected to %s", self.name, tile.name)
 
 class UserInteractionTile(Tile):
     def __init__(self, name):
@@ -24,56 +63,75 @@ class UserInteractionTile(Tile):
         self.prompt = None
         self.options = []
         self.next_tile=None
+        self._prompt_template=compile_template(None)
 
     def configure(self, prompt, options,next_tile):
-        """Set the user prompt and options for interaction."""
+        """Set the user prompt and options for interaction. The prompt may contain {{placeholders}}."""
         self.prompt = prompt
         self.options = options
         self.next_tile=next_tile
-        print(f"User Interaction Tile configured with prompt: '{self.prompt}' and options: {self.options}")
-    def sendprompt(self):
-        """Simulate user interaction by asking the prompt and receiving input."""
-        print(f"Prompt: {self.prompt}")
-        for idx, option in enumerate(self.options, 1):
-            print(f"{idx}. {option}")
-    def wait_for_response(self):
-        # Wait for user input from CLI
-        user_input = input("Please enter your choice: ")
-        return user_input
-
-    def execute(self):
-        '''"""Simulate user interaction by asking the prompt and receiving input."""
-        print(f"Prompt: {self.prompt}")
-        for idx, option in enumerate(self.options, 1):
-            print(f"{idx}. {option}")'''
-        # Simulate user selecting an option
-        #selected_option = self.options[0]  # Placeholder for user input
-        selected_option = self.wait_for_response()
-        print(f"User selected: {selected_option}")
+        self._prompt_template=compile_template(prompt)
+        logger.debug("User Interaction Tile configured with prompt: '%s' and options: %s", self.prompt, self.options)
+    def render_prompt(self, workflow_data=None):
+        """The prompt with this run's workflow_data substituted."""
+        return self._prompt_template.render(workflow_data)
+    def prompt_message(self, workflow_data=None):
+        """What is sent to the user: {"text", "options"}."""
+        return {"text": self.render_prompt(workflow_data), "options": list(self.options)}
+
+    def execute(self, workflow_data=None, runtime=None):
+        """Ask the prompt on the session's input channel (the terminal when there is none)."""
+        channel = runtime.channel if runtime is not None and runtime.channel is not None else ConsoleChannel()
+        session_id = runtime.session_id if runtime is not None else None
+        selected_option = channel.ask(session_id, self.prompt_message(workflow_data))
+        return self.respond(selected_option, workflow_data)
+
+    def respond(self, selected_option, workflow_data=None):
+        """Record the user's reply; used directly when a suspended session is resumed.
+
+        The reply must be one of the options (case-insensitive) or its 1-based number;
+        anything else raises InvalidChoiceError."""
+        selected_option = resolve_choice(self.options, selected_option)
+        logger.debug("User selected: %s", selected_option)
         return {"selected_option":selected_option,"next_tile":self.next_tile}
 
+    async def execute_async(self, workflow_data=None, runtime=None):
+        """Prompt the user and await the reply on the session's input queue or channel."""
+        if runtime is not None and runtime.input_queue is not None:
+            selected_option = await runtime.input_queue.get()
+        else:
+            channel = runtime.channel if runtime is not None and runtime.channel is not None else ConsoleChannel()
+            session_id = runtime.session_id if runtime is not None else None
+            selected_option = await channel.ask_async(session_id, self.prompt_message(workflow_data))
+        return self.respond(selected_option, workflow_data)
+
 class LogicBuilderTile(Tile):
     def __init__(self, name):
         super().__init__(name)
         self.condition = None
+        self.evaluate_condition = None
         self.true_tile = None
         self.false_tile = None
 
     def configure(self, condition, true_tile, false_tile):
-        """Set the condition and the tiles to execute based on the condition."""
+        """Set the condition and the tiles to execute based on the condition.
+
+        The condition is an expression over workflow_data (see condition_expression) and is
+        compiled here, once; a non-string condition is a constant."""
         self.condition = condition
+        self.evaluate_condition = compile_condition(condition)
         self.true_tile = true_tile
         self.false_tile = false_tile
-        print(f"Logic Builder Tile configured with condition: {self.condition}")
+        logger.debug("Logic Builder Tile configured with condition: %s", self.condition)
 
-    def execute(self):
+    def execute(self, workflow_data=None):
         """Execute based on the condition."""
-        if self.condition:
-            print(f"Condition met, moving to {self.true_tile}")
+        if self.evaluate_condition(workflow_data):
+            logger.debug("Condition met, moving to %s", self.true_tile)
             #return self.true_tile
             return {"next_tile":self.true_tile}
         else:
-            print(f"Condition not met, moving to {self.false_tile}")
+            logger.debug("Condition not met, moving to %s", self.false_tile)
             #return self.false_tile
             return {"next_tile":self.false_tile}
 
@@ -86,15 +144,163 @@ class FlowJumpTile(Tile):
     def configure(self, jump_target):
         """Set the target tile to jump to."""
         self.jump_target = jump_target
-        print(f"Flow Jump Tile configured to jump to {self.jump_target}")
+        logger.debug("Flow Jump Tile configured to jump to %s", self.jump_target)
 
-    def execute(self):
+    def execute(self, workflow_data=None):
         """Jump to the configured target."""
-        print(f"Jumping to {self.jump_target}")
+        logger.debug("Jumping to %s", self.jump_target)
         #return self.jump_target
         return {"next_tile":self.jump_target}
 
 
+class WaitTile(Tile):
+    def __init__(self, name):
+        super().__init__(name)
+        self.seconds = None
+        self.until = None
+        self.next_tile = None
+        self._seconds_template = compile_template(None)
+        self._until_template = compile_template(None)
+
+    def configure(self, seconds=None, until=None, next_tile=None):
+        """Wait `seconds`, or until the absolute time `until`, then move to next_tile.
+
+        until is epoch seconds or an ISO-8601 timestamp (naive ones are UTC). Either value may be a
+        {{placeholder}}, rendered when a session reaches the tile. The engine does the waiting:
+        WorkflowEngine.advance parks the session as SLEEPING until wake_time, while blocking runs
+        and parallel branches sleep in place."""
+        if (seconds is None) == (until is None):
+            raise ValueError(f"WaitTile {self.name!r} needs exactly one of seconds or until.")
+        self.seconds = seconds
+        self.until = until
+        self.next_tile = next_tile
+        self._seconds_template = compile_template(seconds)
+        self._until_template = compile_template(until)
+        logger.debug("Wait Tile configured to wait %s then move to %s",
+                     f"{seconds} seconds" if seconds is not None else f"until {until}", self.next_tile)
+
+    def wake_time(self, workflow_data, now):
+        """The epoch time a session reaching this tile at `now` may move on."""
+        if self.until is not None:
+            return _epoch_seconds(self._until_template.render(workflow_data))
+        try:
+            return now + float(self._seconds_template.render(workflow_data))
+        except (TypeError, ValueError):
+            raise ValueError(f"WaitTile {self.name!r} has no valid number of seconds to wait: {self.seconds!r}") from None
+
+    def execute(self, workflow_data=None):
+        """The wait is over: move on."""
+        return {"next_tile":self.next_tile}
+
+
+def _epoch_seconds(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+        try:
+            moment = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Cannot wait until {value!r}: expected epoch seconds or an ISO-8601 timestamp.") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class ParallelTile(Tile):
+    def __init__(self, name):
+        super().__init__(name)
+        self.branches = []  # [(branch name, start tile id)]
+        self.join_tile = None
+
+    def configure(self, branches, join_tile):
+        """Set the branches to fan out to and the JoinTile they all lead to.
+
+        A branch is either a start tile id (named after the id) or {"name": ..., "start_tile": ...}.
+        Each branch runs from its start tile until it reaches join_tile."""
+        self.branches = [
+            (str(branch.get("name", branch.get("start_tile"))), branch.get("start_tile")) if isinstance(branch, dict)
+            else (str(branch), branch)
+            for branch in branches
+        ]
+        self.join_tile = join_tile
+        logger.debug("Parallel Tile configured with branches %s joining at %s", [name for name, _ in self.branches], self.join_tile)
+
+    def execute(self, workflow_data=None):
+        """The branches themselves are run by the engine; afterwards control moves to the join."""
+        return {"next_tile":self.join_tile}
+
+    @staticmethod
+    def branch_output(before, after):
+        """The keys a branch added or changed, relative to the data it started from."""
+        return {key: value for key, value in after.items()
+                if key != "next_tile" and (key not in before or before[key] is not value)}
+
+    def merge_results(self, workflow_data, results, join_tile):
+        """Record branch outcomes under workflow_data["branches"][<branch name>] and the
+        join outcome under workflow_data["join"].
+
+        results maps branch name -> (status, output) with status "completed", "failed" or
+        "cancelled"; only completed branches contribute output."""
+        branches = dict(workflow_data.get("branches") or {})
+        for name, (status, output) in results.items():
+            branches[name] = output if status == "completed" else None
+        completed = [name for name, (status, _) in results.items() if status == "completed"]
+        workflow_data["branches"] = branches
+        workflow_data["join"] = {
+            "policy": join_tile.policy,
+            "completed": completed,
+            "failed": [name for name, (status, _) in results.items() if status == "failed"],
+            "cancelled": [name for name, (status, _) in results.items() if status == "cancelled"],
+            "satisfied": len(completed) >= join_tile.required_count(len(self.branches)),
+        }
+        return workflow_data
+
+
+class JoinTile(Tile):
+    POLICIES = ("all", "any", "quorum")
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.policy = "all"
+        self.quorum = None
+        self.next_tile = None
+        self.failure_tile = None
+
+    def configure(self, policy, quorum, next_tile, failure_tile):
+        """Set the join policy ("all", "any" or "quorum" with a quorum count) and where to go
+        when it is, or is not, satisfied."""
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported join policy: {policy}")
+        if policy == "quorum" and not quorum:
+            raise ValueError("Join policy 'quorum' needs a quorum count")
+        self.policy = policy
+        self.quorum = quorum
+        self.next_tile = next_tile
+        self.failure_tile = failure_tile
+        logger.debug("Join Tile configured with policy: %s", self.policy)
+
+    def required_count(self, total):
+        """How many of total branches must complete for the join to be satisfied."""
+        if self.policy == "any":
+            return min(1, total)
+        if self.policy == "quorum":
+            return min(self.quorum, total)
+        return total
+
+    def execute(self, workflow_data=None):
+        """Continue if the preceding fan-out met the policy, otherwise take the failure edge."""
+        join = (workflow_data or {}).get("join") or {}
+        if join.get("satisfied"):
+            return {"next_tile":self.next_tile}
+        logger.debug("Join policy %s not met, moving to %s", self.policy, self.failure_tile)
+        return {"next_tile":self.failure_tile}
+
 
 class APICallTile(Tile):
     def __init__(self, name):
@@ -104,36 +310,213 @@ class APICallTile(Tile):
         self.payload = None
         self.params={}
         self.next_tile=None
+        self.timeout=None
+        self.http_pool=None
+        self.response_cache=None
+        self.upstream_guard=None
+        self.fallback_tile=None
+        self.fallback_action=None
+        self.batcher=None
+        self.extract=None
+        self.max_response_bytes=None
+        self._url_template=compile_template(None)
+        self._params_template=compile_template({})
+        self._payload_template=compile_template(None)
+
+    def configure(self, api_url, http_method, params,payload,next_tile,timeout=None,http_pool=None,cache=None,
+                  upstream_guard=None,fallback_tile=None,fallback_action=None,batch=None,extract=None,
+                  max_response_bytes=None):
+        """Set the API endpoint, HTTP method, and optional payload.
+
+        api_url, params and payload may contain {{placeholders}} (see template_renderer); they are
+        compiled here and rendered against workflow_data on every call. timeout overrides the pool's (connect, read) timeout for this tile; http_pool defaults
+        to the process-wide pool from http_pool.get_default_pool(). cache, e.g.
+        {"ttl": 30, "max_entries": 1000, "max_bytes": 1048576}, enables a response cache for GETs.
+
+        Calls go through upstream_guard (default: circuit_breaker.get_default_guard()), which fails
+        fast while the host's circuit is open or its bulkhead is full. When a call fails for any
+        reason the tile moves to fallback_tile, recording fallback_action (e.g. "Escalate to Support
+        Agent") for the caller. With a fallback_action but no fallback_tile the run ends ESCALATED
+        (EscalationError); with neither the failure is raised and fails the run.
+
+        batch, e.g. {"bulk_url": ".../orders/bulk", "window_ms": 5, "max_batch_size": 50}, sends
+        GETs that arrive within window_ms of each other (from any session) as one bulk POST of
+        their rendered params; see micro_batcher for the bulk protocol.
 
-    def configure(self, api_url, http_method, params,payload,next_tile):
-        """Set the API endpoint, HTTP method, and optional payload."""
+        extract, e.g. {"status": "order.status"} or ["order.status", "items.0.sku"], keeps only those
+        parts of the body as the tile's response, parsed as a stream where possible (see
+        json_extract). max_response_bytes refuses longer bodies (UpstreamError "too_large", so the
+        fallback applies) without reading past the limit. With either set, uncached calls read the
+        body in chunks instead of all at once."""
         self.api_url = api_url
         self.http_method = http_method
         self.payload = payload
         self.params=params
         self.next_tile=next_tile
-        print(f"API Call Tile configured with URL: {self.api_url}, Method: {self.http_method}")
+        self.timeout=timeout
+        self.http_pool=http_pool
+        self.upstream_guard=upstream_guard
+        self.fallback_tile=fallback_tile
+        self.fallback_action=fallback_action
+        self._url_template=compile_template(api_url)
+        self._params_template=compile_template(params)
+        self._payload_template=compile_template(payload)
+        self.extract=CompiledExtract(extract) if extract is not None else None
+        self.max_response_bytes=max_response_bytes
+        if batch:
+            if http_method != "GET":
+                raise ValueError("Only GET API calls can be batched")
+            self.batcher = MicroBatcher(
+                bulk_url=batch["bulk_url"],
+                window_ms=batch.get("window_ms", 5.0),
+                max_batch_size=batch.get("max_batch_size", 50),
+            )
+        if cache:
+            self.response_cache = ResponseCache(
+                ttl=cache.get("ttl", 60.0),
+                max_entries=cache.get("max_entries", 1024),
+                max_bytes=cache.get("max_bytes"),
+            )
+        logger.debug("API Call Tile configured with URL: %s, Method: %s", self.api_url, self.http_method)
 
-    def execute(self):
-        """Execute the API call and retrieve data."""
+    def execute(self, workflow_data=None, runtime=None):
+        """Execute the API call and retrieve data.
+
+        A POST with runtime.idempotency_key sends it as the Idempotency-Key header. If
+        runtime.effects (the execution journal) holds that key as committed before a crash, its
+        recorded output is returned without calling again; a new successful call is recorded there."""
+        if self.http_method not in ("GET", "POST"):
+            logger.error("Unsupported HTTP method: %s", self.http_method)
+            return None
+        http_pool = self.http_pool or get_default_pool()
+        guard = self.upstream_guard or get_default_guard()
+        api_url, params, payload = self._render_request(workflow_data)
+        key = runtime.idempotency_key if runtime is not None and self.http_method == "POST" else None
+        effects = runtime.effects if key is not None else None
+        if effects is not None:
+            committed = effects.committed_effect(runtime.session_id, key)
+            if committed is not None:
+                logger.info("Skipping API call to %s: already committed as %s", api_url, key)
+                return committed
+        headers = {"Idempotency-Key": key} if key is not None else None
+        # Cached responses are replayed, so their bodies have to be read whole.
+        stream = self._streams_body() and self.response_cache is None
+        if self.batcher is not None:
+            bulk_url = self.batcher.bulk_url
+            fetch = lambda: self.batcher.submit(params or {}, lambda body: guard.call(
+                bulk_url, lambda: http_pool.request("POST", bulk_url, json=body, timeout=self.timeout)))
+        elif self.http_method == "GET":
+            fetch = lambda: guard.call(api_url, lambda: http_pool.request("GET", api_url, params=params, timeout=self.timeout,
+                                                                         stream=stream))
+        else:
+            fetch = lambda: guard.call(api_url, lambda: http_pool.request("POST", api_url, params=params, json=payload, headers=headers,
+                                                                         timeout=self.timeout, stream=stream))
         try:
-            if self.http_method == "GET":
-                response = requests.get(self.api_url)
-            elif self.http_method == "POST":
-                response = requests.post(self.api_url, json=self.payload)
+            if self.http_method == "GET" and self.response_cache is not None:
+                # Cache hits never reach the breaker or a batch; only real upstream calls count.
+                response = self.response_cache.get_or_fetch(
+                    self.response_cache.make_key("GET", api_url, params), fetch, self._is_cacheable)
             else:
-                print(f"Unsupported HTTP method: {self.http_method}")
-                return None
+                response = fetch()
+        except UpstreamError as e:
+            return self._fallback(e)
+        except Exception as e:
+            return self._fallback(UpstreamError(UpstreamGuard.host_of(api_url), "error", f"API call to {api_url} failed: {e}"))
+        output = self._handle_response(response, api_url)
+        if effects is not None and response.status_code == 200:
+            effects.record_effect(runtime.session_id, key, output)
+        return output
 
-            if response.status_code == 200:
-                print(f"API Call successful. Data: {response.json()}")
-                return {"response":response.json(),"next_tile":self.next_tile} # Returning the API response data
+    async def execute_async(self, workflow_data=None, runtime=None):
+        """Execute the API call through the runtime's shared async HTTP client."""
+        if runtime is None or runtime.http_client is None:
+            return await asyncio.to_thread(self.execute, workflow_data, runtime)
+        if self.http_method not in ("GET", "POST"):
+            logger.error("Unsupported HTTP method: %s", self.http_method)
+            return None
+        guard = self.upstream_guard or get_default_guard()
+        api_url, params, payload = self._render_request(workflow_data)
+        payload = payload if self.http_method == "POST" else None
+        if self.batcher is not None:
+            bulk_url = self.batcher.bulk_url
+            fetch = lambda: self.batcher.submit_async(params or {}, lambda body: guard.call_async(
+                bulk_url, lambda: runtime.http_client.request("POST", bulk_url, json=body, timeout=self.timeout)))
+        else:
+            max_bytes = self.max_response_bytes
+            fetch = lambda: guard.call_async(api_url, lambda: runtime.http_client.request(self.http_method, api_url, params=params, json=payload,
+                                                                                          timeout=self.timeout, max_bytes=max_bytes))
+        try:
+            if self.http_method == "GET" and self.response_cache is not None:
+                response = await self.response_cache.get_or_fetch_async(
+                    self.response_cache.make_key("GET", api_url, params), fetch, self._is_cacheable)
             else:
-                print(f"API Call failed with status code: {response.status_code}")
-                return {"response":None,"next_tile":None}
+                response = await fetch()
+        except UpstreamError as e:
+            return self._fallback(e)
         except Exception as e:
-            print(f"Error during API call: {e}")
-            return {response:None,"next_tile":None}
+            return self._fallback(UpstreamError(UpstreamGuard.host_of(api_url), "error", f"API call to {api_url} failed: {e}"))
+        return self._handle_response(response, api_url)
+
+    def _render_request(self, workflow_data):
+        """Render the precompiled URL, query params and payload templates for this run."""
+        api_url = self._url_template.render(workflow_data)
+        params = self._params_template.render(workflow_data) or None
+        payload = self._payload_template.render(workflow_data)
+        return api_url, params, payload
+
+    @staticmethod
+    def _is_cacheable(response):
+        return response.status_code == 200
+
+    def _streams_body(self):
+        return self.extract is not None or self.max_response_bytes is not None
+
+    def _handle_response(self, response, api_url):
+        try:
+            if response.status_code != 200:
+                return self._fallback(UpstreamError(UpstreamGuard.host_of(api_url), "status",
+                                                    f"API call to {api_url} failed with status code {response.status_code}"))
+            if not self._streams_body():
+                logger.debug("API Call to %s successful (%d bytes)", api_url, len(response.content))
+                return {"response":response.json(),"next_tile":self.next_tile} # Returning the API response data
+            try:
+                body = self._read_body(response)
+            except ResponseTooLargeError as e:
+                return self._fallback(UpstreamError(UpstreamGuard.host_of(api_url), "too_large", f"API call to {api_url} failed: {e}"))
+            logger.debug("API Call to %s successful", api_url)
+            return {"response":body,"next_tile":self.next_tile}
+        finally:
+            if self._streams_body() and hasattr(response, "close"):
+                response.close()  # a body read only in part must not hold its connection
+
+    def _read_body(self, response):
+        """Parse the body once, within max_response_bytes, keeping only what extract selects."""
+        if isinstance(response, BatchedResponse):
+            # Already parsed out of the bulk response.
+            body = response.json()
+            return self.extract.from_value(body) if self.extract is not None else body
+        length = (getattr(response, "headers", None) or {}).get("Content-Length")
+        if self.max_response_bytes is not None and length is not None and length.isdigit() and int(length) > self.max_response_bytes:
+            raise ResponseTooLargeError(f"Response body of {length} bytes is over the {self.max_response_bytes} byte limit.")
+        chunks = response.iter_content(CHUNK_SIZE) if hasattr(response, "iter_content") else [response.content]
+        chunks = read_capped(chunks, self.max_response_bytes)
+        if self.extract is not None:
+            return self.extract.from_chunks(chunks)
+        return json.loads(b"".join(chunks))
+
+    def _fallback(self, error):
+        """Take the fallback route for a failed call, or raise the failure when there is none."""
+        if self.fallback_tile is None and self.fallback_action is None:
+            logger.error("%s", error)
+            raise error
+        logger.warning("%s; taking fallback %s", error, self.fallback_action or self.fallback_tile)
+        output = {"response":None,"error":{"reason":error.reason,"host":error.host,"message":str(error)},"next_tile":self.fallback_tile}
+        if self.fallback_action is not None:
+            output["fallback_action"] = self.fallback_action
+        if self.fallback_tile is None:
+            # Nowhere to go: hand the session over instead of ending it as if it had completed.
+            raise EscalationError(error, self.fallback_action, output)
+        return output
         
 '''# Create tile instances
 user_interaction = UserInteractionTile("User Interaction 1")
@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class SystemClock:
+    """
+    Wall-clock time in epoch seconds; WaitTiles, the engines and TimerScheduler read time through a clock.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def sleep_async(self, seconds: float) -> None:
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+
+class FakeClock(SystemClock):
+    def __init__(self, start: float = 0.0):
+        """
+        A clock that only moves when told to, for tests: sleeping advances it instantly.
+
+        Parameters:
+        - start: The initial time, in epoch seconds.
+        """
+        self.now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> float:
+        """
+        Move the clock forward by seconds; returns the new time.
+        """
+        with self._lock:
+            self.now += seconds
+            return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.advance(seconds)
+
+    async def sleep_async(self, seconds: float) -> None:
+        self.sleep(seconds)
+        await asyncio.sleep(0)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class TimerScheduler:
+    def __init__(self, clock: Optional[SystemClock] = None):
+        """
+        Wake-up times of parked sessions, kept in a binary heap.
+
+        Scheduling and popping the earliest timer are O(log n); a timer costs one heap entry
+        (due time, key) plus one dict entry, so millions of pending timers fit in a few hundred
+        MB. Cancelling or rescheduling only updates the dict: the stale heap entry is skipped
+        when it comes up, and the heap is rebuilt once stale entries outnumber live ones.
+
+        Parameters:
+        - clock: Where the current time comes from; the system clock by default.
+        """
+        self.clock = clock or SYSTEM_CLOCK
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._due
+
+    def schedule(self, key: str, due: float) -> None:
+        """
+        Set key's timer to fire at due (epoch seconds), replacing any earlier timer for it.
+        """
+        with self._lock:
+            replaced = self._due.get(key) is not None
+            self._due[key] = due
+            heapq.heappush(self._heap, (due, key))
+            if replaced:
+                self._drop_stale()
+
+    def cancel(self, key: str) -> bool:
+        """
+        Drop key's timer; False if it had none.
+        """
+        with self._lock:
+            if self._due.pop(key, None) is None:
+                return False
+            self._drop_stale()
+            return True
+
+    def _drop_stale(self) -> None:
+        # Caller holds self._lock.
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._heap = [(due, key) for key, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def due_at(self, key: str) -> Optional[float]:
+        """
+        When key's timer fires, or None.
+        """
+        return self._due.get(key)
+
+    def next_due(self) -> Optional[float]:
+        """
+        When the earliest timer fires, or None when there are none.
+        """
+        with self._lock:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Remove and return the keys whose timers are due, earliest first.
+
+        Parameters:
+        - now: The time to compare against; the clock's current time by default.
+        - limit: Most keys to return; the rest stay scheduled for the next call.
+        """
+        if now is None:
+            now = self.clock.time()
+        due_keys = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due_keys) < limit):
+                due, key = heapq.heappop(self._heap)
+                if self._due.get(key) == due:
+                    del self._due[key]
+                    due_keys.append(key)
+        return due_keys
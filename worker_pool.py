@@ -0,0 +1,160 @@
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from session_store import FileSessionStore, InMemorySessionStore, SessionStore, SQLiteSessionStore
+from workflow_manager import WorkflowManager, compact_state
+from workflowengine_new import WorkflowEngine
+
+# Per-process state of a pool worker, set up once by _init_worker.
+_worker_manager: Optional[WorkflowManager] = None
+_worker_stats: Dict[str, Any] = {}
+
+
+def make_session_store(store_spec: Sequence[Any]) -> SessionStore:
+    """
+    Build a session store from a picklable spec: ("memory",), ("sqlite", path) or ("file", directory).
+    """
+    kind = store_spec[0]
+    if kind == "memory":
+        return InMemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(store_spec[1])
+    if kind == "file":
+        return FileSessionStore(store_spec[1])
+    raise ValueError(f"Unsupported session store: {kind}")
+
+
+def _init_worker(definition_paths: List[str], store_spec: Sequence[Any]) -> None:
+    # Runs once per worker process: load and compile every definition up front.
+    global _worker_manager, _worker_stats
+    _worker_manager = WorkflowManager(make_session_store(store_spec))
+    for path in definition_paths:
+        _worker_manager.register_workflow(WorkflowEngine.load_workflow_from_file(path))
+    _worker_stats = {"pid": os.getpid(), "tasks": 0, "errors": 0, "busy_seconds": 0.0, "started_at": time.time()}
+
+
+def _run_task(action: str, workflow_id: str, argument: Any, extra: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        if action == "start":
+            if argument not in _worker_manager.registry.names():
+                raise ValueError(f"Workflow definition {argument!r} is not loaded in this worker.")
+            state = _worker_manager.start_workflow(workflow_id, argument, extra)
+        elif action == "reply":
+            state = _worker_manager.submit_reply(workflow_id, argument)
+        elif action == "state":
+            state = _worker_manager.session_store.load(workflow_id) or {"session_id": workflow_id, "status": None}
+        else:
+            raise ValueError(f"Unsupported worker action: {action}")
+        # Only what the caller needs crosses the process boundary.
+        return compact_state(state)
+    except Exception:
+        _worker_stats["errors"] += 1
+        raise
+    finally:
+        _worker_stats["tasks"] += 1
+        _worker_stats["busy_seconds"] += time.perf_counter() - started
+
+
+def _report_stats() -> Dict[str, Any]:
+    stats = dict(_worker_stats)
+    elapsed = time.time() - stats.pop("started_at")
+    stats["uptime_seconds"] = elapsed
+    stats["tasks_per_second"] = stats["tasks"] / elapsed if elapsed > 0 else 0.0
+    stats["utilization"] = stats["busy_seconds"] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+class WorkflowWorkerPool:
+    def __init__(self, definition_paths: List[str], num_workers: Optional[int] = None, store_spec: Tuple[Any, ...] = ("memory",)):
+        """
+        Run workflow sessions on a set of worker processes, one shard per process.
+
+        A session is always routed to the same worker (by a stable hash of its workflow_id), so
+        its tile instance caches stay warm and even the in-memory store works. Only ids, replies
+        and compact status dicts cross process boundaries.
+
+        Parameters:
+        - definition_paths: Workflow JSON files each worker loads and compiles at startup.
+        - num_workers: Number of worker processes; defaults to the CPU count.
+        - store_spec: Session store every worker opens: ("memory",), ("sqlite", path) or ("file", directory).
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.logger = logging.getLogger("WorkflowWorkerPool")
+        # One single-process executor per shard gives deterministic routing.
+        self._workers = [
+            ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(list(definition_paths), tuple(store_spec)))
+            for _ in range(self.num_workers)
+        ]
+        self._submitted = [0] * self.num_workers
+
+    def shard_for(self, workflow_id: str) -> int:
+        """
+        Index of the worker that owns workflow_id.
+        """
+        return zlib.crc32(workflow_id.encode("utf-8")) % self.num_workers
+
+    def _submit(self, action: str, workflow_id: str, argument: Any = None, extra: Any = None) -> Future:
+        shard = self.shard_for(workflow_id)
+        self._submitted[shard] += 1
+        return self._workers[shard].submit(_run_task, action, workflow_id, argument, extra)
+
+    def start_session(self, workflow_id: str, workflow_name: str, initial_data: Optional[Dict[str, Any]] = None) -> Future:
+        """
+        Start a session on its worker.
+
+        Parameters:
+        - workflow_id: Unique identifier for the session.
+        - workflow_name: Name of a definition loaded by the workers.
+        - initial_data: Optional initial workflow data.
+
+        Returns:
+        - A Future resolving to the session's compact state.
+        """
+        return self._submit("start", workflow_id, workflow_name, initial_data)
+
+    def submit_reply(self, workflow_id: str, reply: Any) -> Future:
+        """
+        Deliver a user reply to a waiting session on its worker.
+
+        Returns:
+        - A Future resolving to the session's compact state.
+        """
+        return self._submit("reply", workflow_id, reply)
+
+    def get_state(self, workflow_id: str) -> Future:
+        """
+        Returns:
+        - A Future resolving to the session's compact state.
+        """
+        return self._submit("state", workflow_id)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Per-worker throughput: tasks handled, errors, busy time, tasks/s and utilization.
+        """
+        reports = [worker.submit(_report_stats) for worker in self._workers]
+        stats = []
+        for shard, report in enumerate(reports):
+            worker_stats = report.result()
+            worker_stats["shard"] = shard
+            worker_stats["submitted"] = self._submitted[shard]
+            stats.append(worker_stats)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop all worker processes.
+        """
+        for worker in self._workers:
+            worker.shutdown(wait=wait)
+
+    def __enter__(self) -> "WorkflowWorkerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
@@ -1,97 +1,292 @@
 import logging
-from typing import Dict, Any, Optional
-from workflowengine_new import WorkflowEngine  # Assuming WorkflowEngine is implemented separately
+from typing import Dict, Any, Optional, Union
+from compiled_workflow import CompiledWorkflow
+from input_channels import InvalidChoiceError
+from session_data import SessionData
+from session_store import SessionStore, InMemorySessionStore
+from timer_scheduler import TimerScheduler
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+from workflow_registry import WorkflowRegistry
 
 # Setup logger for debugging and tracking workflow execution
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ACTIVE_STATUSES = (WorkflowStatus.RUNNING, WorkflowStatus.WAITING, WorkflowStatus.SLEEPING, WorkflowStatus.PAUSED)
+
+
+def compact_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What a caller outside the manager needs of a session checkpoint; workflow_data stays in the store.
+    """
+    return {
+        "session_id": state.get("session_id"),
+        "status": state.get("status"),
+        "current_tile_id": state.get("current_tile_id"),
+        "prompt": state.get("prompt"),
+        "error": state.get("error"),
+        "fallback_action": state.get("fallback_action"),
+        "wake_at": state.get("wake_at"),
+    }
+
+
 class WorkflowManager:
-    def __init__(self):
+    def __init__(self, session_store: Optional[SessionStore] = None, workflow_engine: Optional[WorkflowEngine] = None,
+                 registry: Optional[WorkflowRegistry] = None):
+        """
+        Initialize the Workflow Manager.
+
+        Sessions are not held in process memory: each one is checkpointed (current tile id and
+        workflow data, in SessionData.checkpoint form) into the session store whenever it waits
+        for the user, and is resumed from there by whichever manager receives the reply.
+
+        A session that reaches a WaitTile is checkpointed as SLEEPING and gets a timer; call
+        run_due_timers periodically to resume the ones whose time has come. Timers live in this
+        process: after a restart, restore_timers (or recover) rebuilds them from the store.
+
+        Parameters:
+        - session_store: Where session checkpoints live; defaults to an in-memory store.
+        - workflow_engine: Engine used to advance sessions.
+        - registry: Where definitions are looked up by name; sessions stay pinned to the version
+          they started on. Defaults to an empty in-memory registry.
+        """
+        self.session_store = session_store or InMemorySessionStore()
+        self.workflow_engine = workflow_engine or WorkflowEngine()
+        self.registry = registry or WorkflowRegistry()
+        self.timers = TimerScheduler(self.workflow_engine.clock)
+
+    @property
+    def workflow_definitions(self) -> Dict[str, CompiledWorkflow]:
+        """
+        The latest compiled version of every registered workflow, by workflow_name.
         """
-        Initialize the Workflow Manager with empty containers for active workflows and workflow data.
+        return {name: self.registry.get(name) for name in self.registry.names()}
+
+    def register_workflow(self, workflow_definition: Union[CompiledWorkflow, Dict[str, Any]]) -> CompiledWorkflow:
+        """
+        Compile a workflow definition and make it available for starting and resuming sessions.
+
+        Parameters:
+        - workflow_definition: The raw or compiled workflow definition.
+
+        Returns:
+        - The CompiledWorkflow.
         """
-        self.active_workflows: Dict[str, WorkflowEngine] = {}  # Workflow instances indexed by workflow_id
-        self.workflow_data_store: Dict[str, Dict[str, Any]] = {}  # Data associated with each workflow instance
+        return self.registry.register(workflow_definition)
 
-    def start_workflow(self, workflow_id: str, workflow_definition: Dict[str, Any], initial_data: Optional[Dict[str, Any]] = None) -> None:
+    def start_workflow(self, workflow_id: str, workflow_definition: Union[CompiledWorkflow, Dict[str, Any], str], initial_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Starts the workflow execution by initializing its state and triggering the first tile.
+        Starts the workflow execution by initializing its state and running it up to the first user interaction.
 
         Parameters:
         - workflow_id: Unique identifier for the workflow instance.
-        - workflow_definition: The configuration or structure that defines the workflow.
+        - workflow_definition: The configuration or structure that defines the workflow, or the
+          name of a registered workflow (its latest version is used).
         - initial_data: Optional, initial input data to start the workflow.
+
+        Returns:
+        - The session checkpoint after the first run (status, current tile, prompt, data).
         """
-        if workflow_id in self.active_workflows:
+        existing = self.session_store.load(workflow_id)
+        if existing is not None and existing.get("status") in ACTIVE_STATUSES:
             logger.warning(f"Workflow {workflow_id} is already running.")
-            return
+            return existing
 
-        # Initialize the workflow state using the WorkflowEngine
-        try:
-            workflow_engine = WorkflowEngine(workflow_definition)
-            self.active_workflows[workflow_id] = workflow_engine
-            self.workflow_data_store[workflow_id] = initial_data if initial_data else {}
+        if isinstance(workflow_definition, str):
+            try:
+                compiled = self.registry.get(workflow_definition)
+            except KeyError as e:
+                raise ValueError(str(e)) from e
+        else:
+            compiled = self.register_workflow(workflow_definition)
+        state = {
+            "session_id": workflow_id,
+            "workflow_name": compiled.workflow_name,
+            "definition_key": compiled.key[1],
+            "status": WorkflowStatus.RUNNING,
+            "current_tile_id": compiled.start_tile,
+            "workflow_data": dict(initial_data or {}),
+            "initial_data": dict(initial_data or {}),
+            "prompt": None,
+        }
+        state = self._advance(state)
+        logger.info(f"Workflow {workflow_id} started successfully.")
+        return state
 
-            # Start the workflow
-            workflow_engine.run_workflow(self.workflow_data_store[workflow_id])
-            logger.info(f"Workflow {workflow_id} started successfully.")
+    def submit_reply(self, workflow_id: str, reply: Any) -> Dict[str, Any]:
+        """
+        Resume a session waiting on user input with the user's reply.
+
+        Parameters:
+        - workflow_id: Unique identifier for the workflow instance.
+        - reply: The user's answer to the pending prompt.
+
+        Returns:
+        - The session checkpoint after running up to the next interaction or the end.
+        """
+        state = self._load(workflow_id)
+        if state.get("status") != WorkflowStatus.WAITING:
+            raise ValueError(f"Workflow {workflow_id} is {state.get('status')}, not waiting for a reply.")
+        return self._advance(state, reply)
+
+    def _advance(self, state: Dict[str, Any], reply: Any = None, woken: bool = False) -> Dict[str, Any]:
+        workflow_id = state["session_id"]
+        compiled = self._definition_for(state)
+        state["status"] = WorkflowStatus.RUNNING
+        try:
+            # A failed step leaves state["workflow_data"] untouched: advance works on its own SessionData.
+            workflow_data = SessionData.wrap(state["workflow_data"], self.workflow_engine.retention)
+            result = self.workflow_engine.advance(compiled, state["current_tile_id"], workflow_data, reply, workflow_id, woken)
+        except InvalidChoiceError:
+            # The reply is checked before anything runs: the session keeps waiting for a valid one.
+            state["status"] = WorkflowStatus.WAITING
+            raise
         except Exception as e:
-            logger.error(f"Error starting workflow {workflow_id}: {e}")
+            logger.error(f"Error running workflow {workflow_id}: {e}")
+            state["status"] = WorkflowStatus.FAILED
+            state["error"] = str(e)
+            self.session_store.save(workflow_id, state)
             raise
+        state.update(result)
+        state["workflow_data"] = result["workflow_data"].checkpoint()
+        if result["status"] != WorkflowStatus.SLEEPING:
+            state.pop("wake_at", None)
+        self.session_store.save(workflow_id, state)
+        if result["status"] == WorkflowStatus.SLEEPING:
+            self.timers.schedule(workflow_id, result["wake_at"])
+        return state
 
-    def stop_workflow(self, workflow_id: str) -> None:
+    def run_due_timers(self, limit: int = 1000) -> Dict[str, Dict[str, Any]]:
         """
-        Stops the workflow execution and removes it from active workflows.
+        Resume sleeping sessions whose WaitTile time has come, earliest first.
 
         Parameters:
-        - workflow_id: Unique identifier for the workflow instance to be stopped.
+        - limit: Most sessions to resume in this call; the rest stay due for the next one.
+
+        Returns:
+        - session id -> compact_state of every session resumed.
         """
-        if workflow_id in self.active_workflows:
+        now = self.timers.clock.time()
+        resumed = {}
+        for workflow_id in self.timers.pop_due(now, limit):
             try:
-                self.active_workflows[workflow_id].stop_workflow()
-                del self.active_workflows[workflow_id]
-                del self.workflow_data_store[workflow_id]
-                logger.info(f"Workflow {workflow_id} stopped and removed.")
+                state = self.wake_workflow(workflow_id, now)
             except Exception as e:
-                logger.error(f"Error stopping workflow {workflow_id}: {e}")
-                raise
+                logger.error(f"Could not wake workflow {workflow_id}: {e}")
+                continue
+            if state is not None:
+                resumed[workflow_id] = compact_state(state)
+        return resumed
+
+    def wake_workflow(self, workflow_id: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Resume one sleeping session whose timer has fired (see run_due_timers).
+
+        Callers that also deliver replies or stops for the session must not run this at the same
+        time for it; WorkflowService queues it like any other request of the session.
+
+        Returns:
+        - The session checkpoint after running on, or None if it is no longer sleeping (stopped,
+          or woken elsewhere) or not yet due, in which case its timer is set again.
+        """
+        now = self.timers.clock.time() if now is None else now
+        state = self.session_store.load(workflow_id)
+        if state is None or state.get("status") != WorkflowStatus.SLEEPING:
+            return None
+        if state.get("wake_at", now) > now:
+            self.timers.schedule(workflow_id, state["wake_at"])
+            return None
+        return self._advance(state, woken=True)
+
+    def restore_timers(self) -> int:
+        """
+        Schedule a timer for every session the store has as SLEEPING, e.g. after a restart.
+
+        Returns:
+        - The number of timers scheduled.
+        """
+        restored = 0
+        for workflow_id in self.session_store.list_sessions():
+            state = self.session_store.load(workflow_id)
+            if state is not None and state.get("status") == WorkflowStatus.SLEEPING:
+                self.timers.schedule(workflow_id, state["wake_at"])
+                restored += 1
+        logger.info(f"Restored {restored} workflow timers.")
+        return restored
+
+    def _definition_for(self, state: Dict[str, Any]) -> CompiledWorkflow:
+        # Sessions resume on the version they started on, even after the definition was hot-swapped.
+        try:
+            return self.registry.get(state["workflow_name"], state.get("definition_key"))
+        except KeyError:
+            pass
+        try:
+            compiled = self.registry.get(state["workflow_name"])
+        except KeyError:
+            raise ValueError(f"Workflow definition {state['workflow_name']!r} is not registered with this manager.") from None
+        logger.warning(f"Session {state['session_id']} started on a revision of {state['workflow_name']!r} that is no longer available.")
+        return compiled
+
+    def _load(self, workflow_id: str) -> Dict[str, Any]:
+        state = self.session_store.load(workflow_id)
+        if state is None:
+            raise ValueError(f"Workflow {workflow_id} not found.")
+        return state
+
+    def stop_workflow(self, workflow_id: str) -> None:
+        """
+        Stops the workflow execution. Its checkpoint is kept so it can be inspected or restarted.
+
+        Parameters:
+        - workflow_id: Unique identifier for the workflow instance to be stopped.
+        """
+        state = self.session_store.load(workflow_id)
+        if state is not None and state.get("status") in ACTIVE_STATUSES:
+            state["status"] = WorkflowStatus.STOPPED
+            self.session_store.save(workflow_id, state)
+            self.timers.cancel(workflow_id)
+            if self.workflow_engine.journal is not None:
+                self.workflow_engine.journal.end(workflow_id, WorkflowStatus.STOPPED)
+            logger.info(f"Workflow {workflow_id} stopped.")
         else:
             logger.warning(f"Workflow {workflow_id} not found in active workflows.")
 
     def pause_workflow(self, workflow_id: str) -> None:
         """
-        Pauses the execution of a workflow.
+        Pauses a workflow waiting on user input; replies are refused until it is resumed.
 
         Parameters:
         - workflow_id: Unique identifier for the workflow instance to be paused.
         """
-        if workflow_id in self.active_workflows:
-            try:
-                self.active_workflows[workflow_id].pause_workflow()
-                logger.info(f"Workflow {workflow_id} paused.")
-            except Exception as e:
-                logger.error(f"Error pausing workflow {workflow_id}: {e}")
-                raise
+        state = self.session_store.load(workflow_id)
+        if state is not None and state.get("status") == WorkflowStatus.WAITING:
+            state["status"] = WorkflowStatus.PAUSED
+            self.session_store.save(workflow_id, state)
+            logger.info(f"Workflow {workflow_id} paused.")
         else:
-            logger.warning(f"Workflow {workflow_id} not found.")
+            logger.warning(f"Workflow {workflow_id} not found or not waiting.")
 
-    def resume_workflow(self, workflow_id: str) -> None:
+    def resume_workflow(self, workflow_id: str, reply: Any = None) -> Optional[Dict[str, Any]]:
         """
-        Resumes a paused workflow.
+        Resumes a paused workflow, optionally delivering the reply it was waiting for.
 
         Parameters:
         - workflow_id: Unique identifier for the workflow instance to be resumed.
+        - reply: Optional user reply to continue with immediately.
+
+        Returns:
+        - The session checkpoint, or None if the workflow was not paused.
         """
-        if workflow_id in self.active_workflows:
-            try:
-                self.active_workflows[workflow_id].resume_workflow()
-                logger.info(f"Workflow {workflow_id} resumed.")
-            except Exception as e:
-                logger.error(f"Error resuming workflow {workflow_id}: {e}")
-                raise
-        else:
-            logger.warning(f"Workflow {workflow_id} not found.")
+        state = self.session_store.load(workflow_id)
+        if state is None or state.get("status") != WorkflowStatus.PAUSED:
+            logger.warning(f"Workflow {workflow_id} not found or not paused.")
+            return None
+        state["status"] = WorkflowStatus.WAITING
+        self.session_store.save(workflow_id, state)
+        logger.info(f"Workflow {workflow_id} resumed.")
+        if reply is not None:
+            return self.submit_reply(workflow_id, reply)
+        return state
 
     def get_workflow_state(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -103,21 +298,18 @@ class WorkflowManager:
         Returns:
         - The current state of the workflow (e.g., the last executed tile, data).
         """
-        if workflow_id in self.active_workflows:
-            try:
-                current_state = self.active_workflows[workflow_id].get_current_state()
-                workflow_data = self.workflow_data_store.get(workflow_id, {})
-                logger.info(f"Retrieved state for workflow {workflow_id}.")
-                return {
-                    "workflow_state": current_state,
-                    "workflow_data": workflow_data
-                }
-            except Exception as e:
-                logger.error(f"Error retrieving state for workflow {workflow_id}: {e}")
-                raise
-        else:
+        state = self.session_store.load(workflow_id)
+        if state is None:
             logger.warning(f"Workflow {workflow_id} not found.")
             return None
+        return {
+            "workflow_state": {
+                "status": state.get("status"),
+                "current_tile_id": state.get("current_tile_id"),
+                "prompt": state.get("prompt"),
+            },
+            "workflow_data": SessionData.wrap(state.get("workflow_data")).to_dict(),
+        }
 
     def get_all_active_workflows(self) -> Dict[str, Any]:
         """
@@ -126,31 +318,76 @@ class WorkflowManager:
         Returns:
         - A dictionary of all active workflows and their states.
         """
-        try:
-            active_workflow_list = {workflow_id: engine.get_current_state() for workflow_id, engine in self.active_workflows.items()}
-            logger.info("Retrieved all active workflows.")
-            return active_workflow_list
-        except Exception as e:
-            logger.error(f"Error retrieving active workflows: {e}")
-            raise
+        active_workflow_list = {}
+        for workflow_id in self.session_store.list_sessions():
+            state = self.session_store.load(workflow_id)
+            if state is not None and state.get("status") in ACTIVE_STATUSES:
+                active_workflow_list[workflow_id] = state.get("status")
+        logger.info("Retrieved all active workflows.")
+        return active_workflow_list
 
-    def restart_workflow(self, workflow_id: str) -> None:
+    def recover(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Bring back the sessions the engine's execution journal had running when the last process stopped.
+
+        Each one continues from the tile after its last completed one: a session that was waiting
+        for the user waits again, with its prompt, and one cut off mid-run runs on to its next
+        interaction or its end; API calls it had already made are not repeated (see
+        ExecutionJournal). Sessions the store has as sleeping get their timer back; finished,
+        stopped or paused ones are left as they are.
+
+        Returns:
+        - session id -> compact_state of every session resumed.
+        """
+        journal = self.workflow_engine.journal
+        if journal is None:
+            raise ValueError("The workflow engine has no execution journal to recover from.")
+        recovered = {}
+        for workflow_id, session in journal.recover().items():
+            stored = self.session_store.load(workflow_id)
+            if stored is not None and stored.get("status") == WorkflowStatus.SLEEPING:
+                self.timers.schedule(workflow_id, stored["wake_at"])
+                continue
+            if stored is not None and stored.get("status") not in (WorkflowStatus.RUNNING, WorkflowStatus.WAITING):
+                if stored.get("status") != WorkflowStatus.PAUSED:
+                    journal.end(workflow_id, stored.get("status"))
+                continue
+            state = {
+                "session_id": workflow_id,
+                "workflow_name": session["workflow_name"],
+                "definition_key": session["definition_key"],
+                "status": WorkflowStatus.RUNNING,
+                "current_tile_id": session["current_tile_id"],
+                "workflow_data": session["workflow_data"].checkpoint(),
+                "initial_data": (stored or {}).get("initial_data", {}),
+                "prompt": None,
+            }
+            try:
+                recovered[workflow_id] = compact_state(self._advance(state))
+            except Exception as e:
+                logger.error(f"Could not recover workflow {workflow_id}: {e}")
+        logger.info(f"Recovered {len(recovered)} workflows from the execution journal.")
+        return recovered
+
+    def restart_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """
         Restarts a completed or failed workflow by re-initializing its state and starting from the beginning.
 
         Parameters:
         - workflow_id: Unique identifier for the workflow instance to be restarted.
-        """
-        if workflow_id in self.active_workflows:
-            logger.warning(f"Workflow {workflow_id} is already running. Stop it first to restart.")
-            return
-
-        if workflow_id in self.workflow_data_store:
-            workflow_definition = self.workflow_data_store[workflow_id]["workflow_definition"]
-            initial_data = self.workflow_data_store[workflow_id]["initial_data"]
 
-            self.start_workflow(workflow_id, workflow_definition, initial_data)
-            logger.info(f"Workflow {workflow_id} restarted.")
-        else:
+        Returns:
+        - The new session checkpoint, or None if the workflow cannot be restarted.
+        """
+        state = self.session_store.load(workflow_id)
+        if state is None:
             logger.error(f"Cannot restart workflow {workflow_id}. No data found.")
+            return None
+        if state.get("status") in ACTIVE_STATUSES:
+            logger.warning(f"Workflow {workflow_id} is already running. Stop it first to restart.")
+            return None
 
+        compiled = self._definition_for(state)
+        restarted = self.start_workflow(workflow_id, compiled, state.get("initial_data"))
+        logger.info(f"Workflow {workflow_id} restarted.")
+        return restarted
@@ -0,0 +1,330 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from compiled_workflow import CompiledWorkflow
+from flow_optimizer import format_report, optimize_workflow
+
+logger = logging.getLogger("WorkflowRegistry")
+
+_INDEX_FILE = "index.json"
+
+
+class _Version:
+    __slots__ = ("name", "fingerprint", "label", "definition", "compiled", "cache_path")
+
+    def __init__(self, name: str, fingerprint: str, label: Optional[str], definition: Optional[Dict[str, Any]] = None,
+                 cache_path: Optional[str] = None):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.label = label
+        self.definition = definition
+        self.compiled: Optional[CompiledWorkflow] = None
+        self.cache_path = cache_path
+
+
+class WorkflowRegistry:
+    def __init__(self, directory: Optional[str] = None, cache_dir: Optional[str] = None,
+                 max_versions_per_workflow: int = 8, on_change: Optional[Callable[[str, CompiledWorkflow], None]] = None,
+                 optimize: bool = False):
+        """
+        Named, versioned workflow definitions, loaded once and compiled on first use.
+
+        A version is identified by the definition's content fingerprint (CompiledWorkflow.key[1]),
+        or by its optional "version" label. get(name) returns the latest version; sessions pin
+        the fingerprint they started on and keep resolving to it after a hot swap.
+
+        Parameters:
+        - directory: Folder of *.json definitions to load; None for definitions registered in code only.
+        - cache_dir: Where parsed definitions are cached between runs (one JSON file per version plus
+          an index of file mtimes/sizes), so a restart only re-parses files that changed and pinned
+          old versions survive it.
+        - max_versions_per_workflow: Versions of one workflow kept in memory; older ones are reloaded
+          from cache_dir if a pinned session needs them (without a cache_dir nothing is dropped).
+        - on_change: Called with (name, compiled) after refresh() installs a new latest version.
+        - optimize: Run raw definitions through flow_optimizer.optimize_workflow before compiling
+          them (collapsing static jumps and constant branches); the fingerprint is the optimized one's.
+        """
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.max_versions_per_workflow = max_versions_per_workflow
+        self.on_change = on_change
+        self.optimize = optimize
+        # Optimized and plain definitions of the same files are indexed apart.
+        self._index_file = "index-optimized.json" if optimize else _INDEX_FILE
+        self._versions: Dict[str, "OrderedDict[str, _Version]"] = {}
+        self._latest: Dict[str, str] = {}
+        # file path -> (mtime_ns, size, name, fingerprint, version label) as last seen
+        self._files: Dict[str, Tuple[Any, ...]] = {}
+        self._lock = threading.RLock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        if directory:
+            self._load_index()
+            self.refresh()
+
+    # -- lookup -------------------------------------------------------------------------------
+
+    def get(self, name: str, version: Optional[str] = None) -> CompiledWorkflow:
+        """
+        The compiled workflow name, at its latest version or the given one.
+
+        Parameters:
+        - name: The definition's workflow_name.
+        - version: A fingerprint (as pinned in session checkpoints), or the "version" label of a
+          version loaded by this process.
+
+        Raises:
+        - KeyError: If the workflow or the version is unknown.
+        """
+        with self._lock:
+            entry = self._find(name, version)
+            if entry.compiled is None:
+                entry.compiled = CompiledWorkflow(self._definition_of(entry))
+                entry.definition = None  # the compiled workflow keeps its own reference
+            return entry.compiled
+
+    def _find(self, name: str, version: Optional[str]) -> _Version:
+        versions = self._versions.get(name)
+        if version is None:
+            if name not in self._latest:
+                raise KeyError(f"Workflow {name!r} is not registered.")
+            return versions[self._latest[name]]
+        if versions is not None:
+            entry = versions.get(version)
+            if entry is not None:
+                versions.move_to_end(version)
+                return entry
+            for entry in reversed(versions.values()):
+                if entry.label == version:
+                    return entry
+        entry = self._from_cache(name, version)
+        if entry is None:
+            raise KeyError(f"Version {version!r} of workflow {name!r} is not available.")
+        self._remember(entry, make_latest=False)
+        return entry
+
+    def _definition_of(self, entry: _Version) -> Dict[str, Any]:
+        if entry.definition is not None:
+            return entry.definition
+        with open(entry.cache_path, "r") as file:
+            return json.load(file)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._latest)
+
+    def versions(self, name: str) -> List[str]:
+        """
+        Fingerprints of the versions of name held in memory, oldest first.
+        """
+        with self._lock:
+            return list(self._versions.get(name, {}))
+
+    def latest_version(self, name: str) -> str:
+        with self._lock:
+            if name not in self._latest:
+                raise KeyError(f"Workflow {name!r} is not registered.")
+            return self._latest[name]
+
+    # -- registration -------------------------------------------------------------------------
+
+    def register(self, workflow_definition: Any) -> CompiledWorkflow:
+        """
+        Add a definition (raw or compiled) from code and make it the latest version of its name.
+        """
+        with self._lock:
+            if isinstance(workflow_definition, CompiledWorkflow):
+                compiled = workflow_definition
+            else:
+                compiled = self._compile(workflow_definition)
+            name, fingerprint = compiled.key
+            entry = self._versions.get(name, {}).get(fingerprint)
+            if entry is None:
+                entry = _Version(name, fingerprint, compiled.definition.get("version"))
+                entry.cache_path = self._write_cache(name, fingerprint, compiled.definition)
+            entry.compiled = entry.compiled or compiled
+            entry.definition = None
+            self._remember(entry, make_latest=True)
+            return entry.compiled
+
+    def _compile(self, workflow_definition: Dict[str, Any]) -> CompiledWorkflow:
+        if not self.optimize:
+            return CompiledWorkflow(workflow_definition)
+        optimized, report = optimize_workflow(workflow_definition)
+        if report["tiles_after"] != report["tiles_before"] or report["rewritten_references"]:
+            logger.info(f"Optimized {format_report(report)}")
+        return CompiledWorkflow(optimized)
+
+    def _remember(self, entry: _Version, make_latest: bool) -> None:
+        versions = self._versions.setdefault(entry.name, OrderedDict())
+        versions[entry.fingerprint] = entry
+        versions.move_to_end(entry.fingerprint)
+        if make_latest:
+            self._latest[entry.name] = entry.fingerprint
+        excess = len(versions) - self.max_versions_per_workflow
+        if excess > 0:
+            # Only versions that can be reloaded from the cache are dropped, oldest first.
+            latest = self._latest.get(entry.name)
+            evictable = [fingerprint for fingerprint, version in versions.items()
+                         if fingerprint != latest and version.cache_path is not None]
+            for fingerprint in evictable[:excess]:
+                del versions[fingerprint]
+
+    # -- directory scanning -------------------------------------------------------------------
+
+    def refresh(self) -> List[str]:
+        """
+        Rescan the directory and install new versions of changed definitions.
+
+        A definition that fails to parse or compile is logged and skipped; the previous version
+        stays the latest. Sessions already running keep their pinned version either way.
+
+        Returns:
+        - Names of the workflows that got a new latest version.
+        """
+        if not self.directory:
+            return []
+        with self._lock:
+            changed = self._scan()
+        self._save_index()
+        return changed
+
+    def _scan(self) -> List[str]:
+        changed = []
+        seen = set()
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            known = self._files.get(path)
+            unchanged = known is not None and tuple(known[:2]) == (stat.st_mtime_ns, stat.st_size)
+            if unchanged and self._latest.get(known[2]) == known[3]:
+                continue
+            name = self._load_file(path, stat, known if unchanged else None)
+            if name is not None:
+                changed.append(name)
+        for path in set(self._files) - seen:
+            name, fingerprint = self._files.pop(path)[2:4]
+            if self._latest.get(name) == fingerprint:
+                # Pinned sessions still resolve the version; new sessions can no longer start it.
+                del self._latest[name]
+                logger.info(f"Workflow {name!r} was removed from {self.directory}.")
+        return changed
+
+    def _load_file(self, path: str, stat: os.stat_result, cached: Optional[Tuple[Any, ...]]) -> Optional[str]:
+        if cached is not None:
+            # Unchanged since the cache was written: name and version are known, parsing waits for get().
+            name, fingerprint, label = cached[2:5]
+            cache_path = self._cache_path(name, fingerprint)
+            if cache_path and os.path.exists(cache_path):
+                entry = self._versions.get(name, {}).get(fingerprint) or _Version(name, fingerprint, label, cache_path=cache_path)
+                self._remember(entry, make_latest=True)
+                return None
+        try:
+            with open(path, "r") as file:
+                definition = json.load(file)
+            compiled = self._compile(definition)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load workflow definition {path}: {e}")
+            known = self._files.get(path)
+            if known is not None and known[2] not in self._latest:
+                # Fresh start on a broken file: fall back to the version it held when last indexed.
+                entry = self._from_cache(known[2], known[3])
+                if entry is not None:
+                    entry.label = known[4]
+                    self._remember(entry, make_latest=True)
+            return None
+        name, fingerprint = compiled.key
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, name, fingerprint, definition.get("version"))
+        if self._latest.get(name) == fingerprint:
+            return None
+        self.register(compiled)
+        logger.info(f"Loaded workflow {name!r} version {fingerprint[:12]} from {path}")
+        if self.on_change is not None:
+            self.on_change(name, compiled)
+        return name
+
+    def watch(self, interval: float = 2.0) -> None:
+        """
+        Poll the directory every interval seconds on a daemon thread and hot-swap changed definitions.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Refreshing workflow definitions failed: {e}")
+
+        self._watcher = threading.Thread(target=poll, name="workflow-registry-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching the directory.
+        """
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+    # -- on-disk cache ------------------------------------------------------------------------
+
+    def _cache_path(self, name: str, fingerprint: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))
+        return os.path.join(self.cache_dir, f"{safe_name}-{fingerprint}.json")
+
+    def _write_cache(self, name: str, fingerprint: str, definition: Dict[str, Any]) -> Optional[str]:
+        cache_path = self._cache_path(name, fingerprint)
+        if cache_path is None or os.path.exists(cache_path):
+            return cache_path
+        descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            # default=str, as for the fingerprint: values JSON has no type for are stored as text.
+            json.dump(definition, file, default=str)
+        os.replace(temp_path, cache_path)
+        return cache_path
+
+    def _from_cache(self, name: str, fingerprint: str) -> Optional[_Version]:
+        cache_path = self._cache_path(name, fingerprint)
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+        return _Version(name, fingerprint, None, cache_path=cache_path)
+
+    def _load_index(self) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            with open(os.path.join(self.cache_dir, self._index_file), "r") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        self._files = {path: tuple(entry) for path, entry in index.items()}
+
+    def _save_index(self) -> None:
+        if not self.cache_dir:
+            return
+        with self._lock:
+            index = {path: list(entry) for path, entry in self._files.items()}
+        descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, os.path.join(self.cache_dir, self._index_file))
@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from execution_journal import ExecutionJournal
+from input_channels import InvalidChoiceError
+from workflow_manager import WorkflowManager, compact_state
+from workflow_registry import WorkflowRegistry
+from workflowengine_new import WorkflowEngine, WorkflowStatus
+
+logger = logging.getLogger("WorkflowService")
+
+# Statuses after which a session produces no more events.
+TERMINAL_STATUSES = (WorkflowStatus.COMPLETED, WorkflowStatus.FAILED, WorkflowStatus.STOPPED, WorkflowStatus.BUDGET_EXCEEDED,
+                     WorkflowStatus.ESCALATED)
+
+
+class ServiceOverloadedError(RuntimeError):
+    """The admission queue is full; the request was not accepted."""
+
+
+class SessionEvents:
+    def __init__(self, max_queued_events: int = 256):
+        """
+        Fan-out of per-session events to the event streams subscribed to them.
+
+        Only sessions somebody is watching cost anything: events of other sessions are dropped
+        where they are produced. A subscriber that falls max_queued_events behind loses its oldest
+        events rather than holding up the session.
+
+        Parameters:
+        - max_queued_events: Events buffered per subscriber.
+        """
+        self.max_queued_events = max_queued_events
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.max_queued_events)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[session_id]
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Deliver an event to its session's subscribers; call on the event loop.
+        """
+        for queue in self._subscribers.get(event.get("session_id"), ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def publish_threadsafe(self, event: Dict[str, Any]) -> None:
+        """
+        Deliver an event from a worker thread.
+        """
+        # A racy membership test is fine here: at worst one event of a stream that is just
+        # opening is missed, and every stream starts with a fresh state snapshot anyway.
+        if self._loop is not None and event.get("session_id") in self._subscribers:
+            self._loop.call_soon_threadsafe(self.publish, event)
+
+
+class WorkflowService:
+    def __init__(self, manager: Optional[WorkflowManager] = None, max_pending: int = 1000, workers: int = 32,
+                 heartbeat_seconds: float = 15.0, timer_interval: float = 0.5):
+        """
+        HTTP front end for a WorkflowManager.
+
+        Sessions live in the manager's session store, not in the service, so the number of open
+        sessions is bounded by the store. Work is admitted into a bounded queue and run on a pool of
+        `workers` threads; when the queue is full, requests are refused with 503 and Retry-After
+        instead of queueing without limit. Requests for one session run one at a time, in order:
+        each session has its own queue, and a worker only picks up sessions with nothing running,
+        so a busy session never holds a worker idle. Sessions sleeping on a WaitTile are checked
+        every `timer_interval` seconds; each due one is woken as a request of its session (see
+        WorkflowManager.wake_workflow) and its new state is published as an event.
+
+        Endpoints:
+        - POST /sessions {"workflow": name, "session_id"?: str, "data"?: {...}} -> 201, session state
+        - POST /sessions/{id}/reply {"reply": answer} -> session state (422 on an invalid choice)
+        - GET /sessions/{id} -> session state with its workflow_data
+        - GET /sessions/{id}/events -> server-sent events: "state" (first the current state, then
+          after every change) and "tile" (every tile run); the stream ends with the session.
+        - GET /health -> queue depth and counters
+
+        Parameters:
+        - manager: The WorkflowManager to serve; a new one by default.
+        - max_pending: Requests admitted but not yet running before new ones are refused.
+        - workers: Threads running manager calls.
+        - heartbeat_seconds: Idle time after which an event stream gets a keep-alive comment.
+        - timer_interval: Seconds between checks for sleeping sessions that are due.
+        """
+        self.manager = manager or WorkflowManager()
+        self.max_pending = max_pending
+        self.workers = workers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.timer_interval = timer_interval
+        self.events = SessionEvents()
+        # Sessions with queued requests and nothing running, in the order they became ready.
+        self._ready: Optional[asyncio.Queue] = None
+        # session id -> its requests not yet started; present while the session is queued or running.
+        self._sessions: Dict[str, Deque[Tuple[Callable, tuple, asyncio.Future]]] = {}
+        self._pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._timer_task: Optional[asyncio.Task] = None
+        self._wakes: Set[asyncio.Task] = set()
+        self.admitted = 0
+        self.rejected = 0
+
+    # -- application --------------------------------------------------------------------------
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._errors])
+        app.router.add_post("/sessions", self.start_session)
+        app.router.add_post("/sessions/{session_id}/reply", self.submit_reply)
+        app.router.add_get("/sessions/{session_id}", self.get_session)
+        app.router.add_get("/sessions/{session_id}/events", self.stream_events)
+        app.router.add_get("/health", self.health)
+        app.on_startup.append(self._start_workers)
+        app.on_cleanup.append(self._stop_workers)
+        return app
+
+    async def _start_workers(self, app: web.Application) -> None:
+        self.events.bind(asyncio.get_running_loop())
+        self._ready = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="workflow-service")
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._timer_task = asyncio.create_task(self._run_timers())
+        self.manager.workflow_engine.tile_executor.add_listener(self.events.publish_threadsafe)
+
+    async def _stop_workers(self, app: web.Application) -> None:
+        self.manager.workflow_engine.tile_executor.remove_listener(self.events.publish_threadsafe)
+        tasks = self._worker_tasks + [self._timer_task] + list(self._wakes)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    @web.middleware
+    async def _errors(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        try:
+            return await handler(request)
+        except ServiceOverloadedError as e:
+            return web.json_response({"error": str(e)}, status=503, headers={"Retry-After": "1"})
+        except InvalidChoiceError as e:
+            return web.json_response({"error": str(e)}, status=422)
+        except LookupError as e:
+            return web.json_response({"error": e.args[0] if e.args else str(e)}, status=404)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=409)
+
+    # -- admission ----------------------------------------------------------------------------
+
+    async def _admit(self, session_id: str, call: Callable, *args) -> Any:
+        """
+        Queue call(*args) for a worker thread and wait for its result.
+
+        Raises:
+        - ServiceOverloadedError: When max_pending requests are already waiting.
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceOverloadedError(f"{self.max_pending} requests are already waiting; retry later.")
+        future = asyncio.get_running_loop().create_future()
+        self._pending += 1
+        self.admitted += 1
+        queued = self._sessions.get(session_id)
+        if queued is None:
+            self._sessions[session_id] = deque([(call, args, future)])
+            self._ready.put_nowait(session_id)
+        else:
+            queued.append((call, args, future))
+        return await future
+
+    async def _work(self) -> None:
+        # Everything here runs on the event loop, so the session queues need no lock.
+        loop = asyncio.get_running_loop()
+        while True:
+            session_id = await self._ready.get()
+            queued = self._sessions[session_id]
+            call, args, future = queued.popleft()
+            self._pending -= 1
+            try:
+                if not future.cancelled():  # else the client went away before its turn
+                    result = await loop.run_in_executor(self._executor, call, *args)
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                # Back of the line: other sessions get a turn before this one's next request.
+                if queued:
+                    self._ready.put_nowait(session_id)
+                else:
+                    del self._sessions[session_id]
+
+    async def _run_timers(self) -> None:
+        while True:
+            await asyncio.sleep(self.timer_interval)
+            room = self.max_pending - self._pending
+            if room <= 0:
+                continue
+            for session_id in self.manager.timers.pop_due(limit=room):
+                task = asyncio.create_task(self._wake(session_id))
+                self._wakes.add(task)
+                task.add_done_callback(self._wakes.discard)
+
+    async def _wake(self, session_id: str) -> None:
+        try:
+            await self._admit(session_id, self._wake_session, session_id)
+        except ServiceOverloadedError:
+            # Try again on a later round; the session stays asleep until then.
+            self.manager.timers.schedule(session_id, self.manager.timers.clock.time() + self.timer_interval)
+        except Exception as e:
+            logger.error(f"Could not wake session {session_id}: {e}")
+
+    # -- manager calls (worker threads) -------------------------------------------------------
+
+    def _wake_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        state = self.manager.wake_workflow(session_id)
+        return self._publish_state(state) if state is not None else None
+
+    def _publish_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        compact = compact_state(state)
+        self.events.publish_threadsafe(dict(compact, event="state"))
+        return compact
+
+    def _start(self, session_id: str, workflow_name: str, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if workflow_name not in self.manager.registry.names():
+            raise LookupError(f"Workflow {workflow_name!r} is not registered.")
+        try:
+            state = self.manager.start_workflow(session_id, workflow_name, data)
+        except Exception:
+            # The manager checkpointed the failure; report it as the session's state.
+            state = self.manager.session_store.load(session_id) or {"session_id": session_id, "status": WorkflowStatus.FAILED}
+        return self._publish_state(state)
+
+    def _reply(self, session_id: str, reply: Any) -> Dict[str, Any]:
+        state = self._load(session_id)
+        if state.get("status") != WorkflowStatus.WAITING:
+            raise ValueError(f"Session {session_id} is {state.get('status')}, not waiting for a reply.")
+        try:
+            state = self.manager.submit_reply(session_id, reply)
+        except InvalidChoiceError:
+            raise
+        except Exception:
+            state = self._load(session_id)
+        return self._publish_state(state)
+
+    def _load(self, session_id: str) -> Dict[str, Any]:
+        state = self.manager.session_store.load(session_id)
+        if state is None:
+            raise LookupError(f"Session {session_id} not found.")
+        return state
+
+    def _full_state(self, session_id: str) -> Dict[str, Any]:
+        state = self._load(session_id)
+        return dict(compact_state(state), workflow_data=self.manager.get_workflow_state(session_id)["workflow_data"])
+
+    # -- handlers -----------------------------------------------------------------------------
+
+    @staticmethod
+    async def _json(request: web.Request) -> Dict[str, Any]:
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Request body is not valid JSON.") from None
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Request body must be a JSON object.")
+        return body
+
+    async def start_session(self, request: web.Request) -> web.Response:
+        body = await self._json(request)
+        workflow_name = body.get("workflow")
+        if not workflow_name:
+            raise web.HTTPBadRequest(text='"workflow" is required.')
+        data = body.get("data")
+        if data is not None and not isinstance(data, dict):
+            raise web.HTTPBadRequest(text='"data" must be a JSON object.')
+        session_id = str(body.get("session_id") or uuid.uuid4().hex)
+        state = await self._admit(session_id, self._start, session_id, workflow_name, data)
+        return web.json_response(state, status=201)
+
+    async def submit_reply(self, request: web.Request) -> web.Response:
+        body = await self._json(request)
+        if "reply" not in body:
+            raise web.HTTPBadRequest(text='"reply" is required.')
+        session_id = request.match_info["session_id"]
+        return web.json_response(await self._admit(session_id, self._reply, session_id, body["reply"]))
+
+    async def get_session(self, request: web.Request) -> web.Response:
+        session_id = request.match_info["session_id"]
+        return web.json_response(await self._admit(session_id, self._full_state, session_id))
+
+    async def stream_events(self, request: web.Request) -> web.StreamResponse:
+        session_id = request.match_info["session_id"]
+        # Subscribe before reading the state, so nothing between the two is missed.
+        queue = self.events.subscribe(session_id)
+        try:
+            state = await self._admit(session_id, lambda: compact_state(self._load(session_id)))
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                                   "X-Accel-Buffering": "no"})
+            await response.prepare(request)
+            await self._send_event(response, dict(state, event="state"))
+            if state["status"] in TERMINAL_STATUSES:
+                return response
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    await response.write(b": keep-alive\n\n")
+                    continue
+                await self._send_event(response, event)
+                if event["event"] == "state" and event["status"] in TERMINAL_STATUSES:
+                    return response
+        finally:
+            self.events.unsubscribe(session_id, queue)
+
+    @staticmethod
+    async def _send_event(response: web.StreamResponse, event: Dict[str, Any]) -> None:
+        data = json.dumps({key: value for key, value in event.items() if key != "event"}, default=str)
+        await response.write(f"event: {event['event']}\ndata: {data}\n\n".encode("utf-8"))
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "pending": self._pending,
+            "busy_sessions": len(self._sessions),
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "event_streams": sum(len(queues) for queues in self.events._subscribers.values()),
+            "dropped_events": self.events.dropped,
+        })
+
+    def run(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        web.run_app(self.make_app(), host=host, port=port)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve workflow sessions over HTTP.")
+    parser.add_argument("definitions", help="directory of workflow definition JSON files (hot-reloaded)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--optimize", action="store_true", help="collapse static jumps and constant branches on load")
+    parser.add_argument("--journal", help="execution journal directory; sessions running at a crash are resumed on start")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    registry = WorkflowRegistry(args.definitions, optimize=args.optimize)
+    registry.watch()
+    engine = WorkflowEngine(journal=ExecutionJournal(args.journal)) if args.journal else None
+    manager = WorkflowManager(workflow_engine=engine, registry=registry)
+    manager.restore_timers()
+    if args.journal:
+        manager.recover()
+    service = WorkflowService(manager, max_pending=args.max_pending, workers=args.workers)
+    service.run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
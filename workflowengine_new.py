@@ -10,10 +10,32 @@ Workflow Engine Design Overview:
 '''
 import logging
 import json
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional, Union
 from TileExecuter import TileExecutor
+from circuit_breaker import EscalationError
+from compiled_workflow import CompiledWorkflow
+from execution_journal import ExecutionJournal
+from input_channels import InputChannel, InvalidChoiceError
+from run_budget import BudgetExceededError, RunBudget
+from session_data import RetentionPolicy, SessionData
+from timer_scheduler import SYSTEM_CLOCK, SystemClock
+from tiles_new import ParallelTile
 #from workflow_manager import WorkflowManager
 
+class WorkflowStatus:
+    RUNNING = "running"
+    WAITING = "waiting"      # suspended on a UserInteractionTile until the user replies
+    SLEEPING = "sleeping"    # parked on a WaitTile until its wake-up time
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    STOPPED = "stopped"
+    BUDGET_EXCEEDED = "budget_exceeded"  # ended by max_steps, the deadline or a tile time limit
+    ESCALATED = "escalated"  # an API call failed and its tile's fallback_action hands the session to a person
+
 class WorkflowManager:
     def __init__(self):
         self.active_workflows = {}
@@ -27,41 +49,146 @@ class WorkflowManager:
         logging.info(f"Stopping workflow {workflow_id} with status {status}")
         self.active_workflows[workflow_id] = status
 
+    def set_status(self, workflow_id: str, status: str):
+        logging.info(f"Workflow {workflow_id} is now {status}")
+        self.active_workflows[workflow_id] = status
+
     def get_workflow_status(self, workflow_id: str) -> str:
         return self.active_workflows.get(workflow_id, "not started")
+
+
+class BranchCancelled(Exception):
+    """
+    Raised inside a branch whose fan-out no longer needs it (the join policy was decided).
+    """
+
+
+class _BranchPool:
+    """
+    The threads every ParallelTile of one engine runs its branches on.
+
+    try_submit never blocks: when every thread is busy it returns None and the caller runs the
+    branch itself, so nested fan-outs cannot deadlock waiting on each other's threads.
+    """
+
+    def __init__(self, max_threads: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="workflow-branch")
+        self._slots = threading.BoundedSemaphore(max_threads)
+
+    def try_submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
     
 class WorkflowEngine:
-    def __init__(self):
+    def __init__(self, max_parallel_branches: int = 16, max_steps: Optional[int] = 100000,
+                 deadline_seconds: Optional[float] = None, tile_time_limit: Optional[float] = None,
+                 retention: Optional[RetentionPolicy] = None, journal: Optional[ExecutionJournal] = None,
+                 clock: Optional[SystemClock] = None, max_branch_threads: int = 64):
         """
         Initialize the WorkflowEngine which manages and executes workflows.
+
+        Parameters:
+        - max_parallel_branches: Upper bound on branches of one ParallelTile running at once.
+        - max_steps: Tiles one run may execute before it ends as BUDGET_EXCEEDED; None for no limit.
+        - deadline_seconds: Wall-clock seconds one run may take; None for no limit.
+        - tile_time_limit: Seconds one non-interactive tile may take; None for no limit.
+        - retention: How much of the tiles' outputs sessions keep (see session_data.RetentionPolicy).
+        - journal: ExecutionJournal recording every step of every session, so runs can be resumed
+          after a crash (resume_workflow, WorkflowManager.recover); None for no journal.
+        - clock: The time WaitTiles wait against (timer_scheduler.FakeClock in tests); the system clock by default.
+        - max_branch_threads: Threads shared by all ParallelTiles of this engine; when they are all
+          busy, a fan-out runs its next branch on its own thread.
+
+        A definition's own "limits" apply too; where both set a limit the smaller one wins.
         """
         self.logger = logging.getLogger("WorkflowEngine")
         self.workflow_manager = WorkflowManager()
         self.tile_executor = TileExecutor()
+        self.max_parallel_branches = max_parallel_branches
+        self.branch_pool = _BranchPool(max_branch_threads)
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.tile_time_limit = tile_time_limit
+        self.retention = retention
+        self.journal = journal
+        self.clock = clock or SYSTEM_CLOCK
+
+    def new_budget(self, compiled: CompiledWorkflow) -> RunBudget:
+        """
+        The budget for one run of compiled: the engine's limits combined with the definition's.
+        """
+        return RunBudget.combine(compiled.limits, self.max_steps, self.deadline_seconds, self.tile_time_limit)
 
-    def run_workflow(self, workflow_id: str, workflow_definition: Dict[str, Any]) -> None:
+    def run_workflow(self, workflow_id: str, workflow_definition: Union[CompiledWorkflow, Dict[str, Any]],
+                     workflow_data: Optional[Dict[str, Any]] = None,
+                     channel: Optional[InputChannel] = None) -> Dict[str, Any]:
         """
         Start the workflow execution based on its definition.
 
         Parameters:
         - workflow_id: The unique ID of the workflow.
-        - workflow_definition: The structured workflow containing all tiles and configuration.
+        - workflow_definition: The compiled workflow, or the raw definition (compiled on the fly).
+        - workflow_data: Optional initial workflow data (a dict, or SessionData to continue one).
+        - channel: Input channel UserInteractionTiles ask on; defaults to the executor's (the terminal).
+
+        Returns:
+        - The SessionData at the end of the run.
         """
         self.logger.info(f"Starting workflow execution: {workflow_id}")
         self.workflow_manager.start_workflow(workflow_id)
+        compiled = self.compile_workflow(workflow_definition)
+        workflow_data = SessionData.wrap(workflow_data, self.retention)
+        journaled = self.journal is not None and workflow_id is not None
+        if journaled:
+            self.journal.begin(workflow_id, compiled.key, compiled.start_tile, workflow_data.checkpoint())
+            workflow_data.track_changes()
+        return self._run(workflow_id, compiled, compiled.start_tile, workflow_data, channel, journaled)
+
+    def resume_workflow(self, session: Dict[str, Any], workflow_definition: Union[CompiledWorkflow, Dict[str, Any]],
+                        channel: Optional[InputChannel] = None) -> Dict[str, Any]:
+        """
+        Continue a run the journal recovered after a crash, from the tile after its last completed one.
+
+        Parameters:
+        - session: An entry of ExecutionJournal.recover().
+        - workflow_definition: The version it ran (registry.get(session["workflow_name"], session["definition_key"])).
+        - channel: Input channel UserInteractionTiles ask on; defaults to the executor's.
+
+        Returns:
+        - The SessionData at the end of the run.
+        """
+        self.logger.info(f"Resuming workflow execution: {session['session_id']} at tile {session['current_tile_id']}")
+        self.workflow_manager.start_workflow(session["session_id"])
+        compiled = self.compile_workflow(workflow_definition)
+        workflow_data = SessionData.wrap(session["workflow_data"], self.retention)
+        workflow_data.track_changes()
+        return self._run(session["session_id"], compiled, session["current_tile_id"], workflow_data, channel, journaled=True)
 
+    def _run(self, workflow_id: str, compiled: CompiledWorkflow, current_tile_id: Any, workflow_data: SessionData,
+             channel: Optional[InputChannel], journaled: bool) -> Dict[str, Any]:
+        budget = self.new_budget(compiled)
+        status = WorkflowStatus.COMPLETED
         try:
-            current_tile_id = workflow_definition.get("start_tile")
             #print(current_tile_id)
-            workflow_data = {}
 
             while current_tile_id:
                 # Get the tile definition
-                tile = self._get_tile_definition(workflow_definition, current_tile_id)
+                tile = self._get_tile_definition(compiled, current_tile_id)
 
                 if tile:
                     # Execute the tile logic
-                    workflow_data = self.tile_executor.execute_tile(tile, workflow_data)
+                    key = self.journal.idempotency_key(workflow_id, current_tile_id) if journaled else None
+                    workflow_data = self._execute_step(compiled, tile, workflow_data, workflow_id, channel, budget, key)
+                    if journaled:
+                        self.journal.step(workflow_id, current_tile_id, workflow_data.next_tile, workflow_data.take_changes())
                     # Update the current tile based on flow jump or the next step
                     current_tile_id = workflow_data.get("next_tile")
                     #print("next id ",current_tile_id)
@@ -74,29 +201,300 @@ class WorkflowEngine:
                     self.logger.error(f"Tile with ID {current_tile_id} not found in workflow definition.")
                     raise ValueError(f"Tile with ID {current_tile_id} not found.")
         
+        except BudgetExceededError as e:
+            self.logger.warning(f"Workflow {workflow_id} stopped: {e}")
+            status = WorkflowStatus.BUDGET_EXCEEDED
+            self.workflow_manager.set_status(workflow_id, status)
+        except EscalationError as e:
+            self.logger.warning(f"Workflow {workflow_id} escalated at tile {e.tile_id}: {e.action}")
+            status = WorkflowStatus.ESCALATED
+            self.workflow_manager.set_status(workflow_id, status)
         except Exception as e:
             self.logger.error(f"[workflowengine.py(77)]Error during workflow execution: {str(e)}")
-            ##self.workflow_manager.stop_workflow(workflow_id, failed=True)
+            status = WorkflowStatus.FAILED
+            self.workflow_manager.set_status(workflow_id, status)
+        if journaled:
+            self._journal_end(workflow_id, status)
+        return workflow_data
+
+    def _journal_end(self, workflow_id: str, status: Optional[str]) -> None:
+        # status None: the run is suspended (waiting or sleeping), not over.
+        if status is not None:
+            self.journal.end(workflow_id, status)
+        if self.journal.commit_on_suspend:
+            self.journal.commit()
+
+    def advance(self, compiled: CompiledWorkflow, current_tile_id: Any, workflow_data: Dict[str, Any], reply: Any = None, workflow_id: Optional[str] = None,
+                woken: bool = False) -> Dict[str, Any]:
+        """
+        Run a session from current_tile_id until it completes, needs user input or reaches a
+        WaitTile whose time has not come, without blocking on it.
+
+        Budgets apply per call: time spent waiting for the user or a timer between calls is not counted.
+
+        Parameters:
+        - compiled: The compiled workflow.
+        - current_tile_id: The tile to continue from (the start tile for a new session).
+        - workflow_data: The session's workflow data: SessionData (updated in place), a checkpoint
+          of one (SessionData.checkpoint) or a plain dict of variables.
+        - reply: The user's answer when current_tile_id is the UserInteractionTile the session waits on.
+        - workflow_id: The session being advanced, for tracing.
+        - woken: The session slept on the WaitTile current_tile_id and its timer has fired.
+
+        Returns:
+        - {"status": WAITING, SLEEPING, COMPLETED or BUDGET_EXCEEDED, "current_tile_id": the tile
+          waited on (None when completed), "workflow_data": ..., "prompt": {"text", "options"} when
+          waiting}. A SLEEPING result also carries "wake_at", the epoch time to call again with
+          woken=True (see WorkflowManager.run_due_timers). A BUDGET_EXCEEDED result also carries
+          "error" and "budget" (see BudgetExceededError.report), an ESCALATED one "error" and
+          "fallback_action" (see EscalationError).
+        """
+        budget = self.new_budget(compiled)
+        workflow_data = SessionData.wrap(workflow_data, self.retention)
+        journaled = self.journal is not None and workflow_id is not None
+        if journaled:
+            if not self.journal.is_live(workflow_id):
+                self.journal.begin(workflow_id, compiled.key, current_tile_id, workflow_data.checkpoint())
+            workflow_data.track_changes()
+        try:
+            result = self._advance(compiled, current_tile_id, workflow_data, reply, workflow_id, budget, journaled, woken)
+        except BudgetExceededError as e:
+            self.logger.warning(f"Workflow {workflow_id} stopped: {e}")
+            result = {
+                "status": WorkflowStatus.BUDGET_EXCEEDED,
+                "current_tile_id": e.tile_id,
+                "workflow_data": workflow_data,
+                "prompt": None,
+                "error": str(e),
+                "budget": e.report(),
+            }
+        except EscalationError as e:
+            self.logger.warning(f"Workflow {workflow_id} escalated at tile {e.tile_id}: {e.action}")
+            result = {
+                "status": WorkflowStatus.ESCALATED,
+                "current_tile_id": e.tile_id,
+                "workflow_data": workflow_data,
+                "prompt": None,
+                "error": str(e),
+                "fallback_action": e.action,
+            }
+        except InvalidChoiceError:
+            # Nothing ran; the session keeps waiting.
+            raise
+        except Exception:
+            if journaled:
+                self._journal_end(workflow_id, WorkflowStatus.FAILED)
+            raise
+        if journaled:
+            suspended = result["status"] in (WorkflowStatus.WAITING, WorkflowStatus.SLEEPING)
+            self._journal_end(workflow_id, None if suspended else result["status"])
+        return result
+
+    def _advance(self, compiled: CompiledWorkflow, current_tile_id: Any, workflow_data: Dict[str, Any], reply: Any,
+                 workflow_id: Optional[str], budget: RunBudget, journaled: bool = False, woken: bool = False) -> Dict[str, Any]:
+        while current_tile_id:
+            tile = self._get_tile_definition(compiled, current_tile_id)
+            if tile is None:
+                raise ValueError(f"Tile with ID {current_tile_id} not found.")
+
+            if tile.get("type") == "UserInteractionTile":
+                if reply is None:
+                    instance = self.tile_executor.get_tile_instance(tile, compiled.key)
+                    return {
+                        "status": WorkflowStatus.WAITING,
+                        "current_tile_id": current_tile_id,
+                        "workflow_data": workflow_data,
+                        "prompt": instance.prompt_message(workflow_data),
+                    }
+                budget.charge(current_tile_id)
+                workflow_data = self.tile_executor.apply_user_response(tile, workflow_data, reply, compiled.key, workflow_id)
+                reply = None
+            elif tile.get("type") == "WaitTile":
+                if not woken:
+                    instance = self.tile_executor.get_tile_instance(tile, compiled.key)
+                    now = self.clock.time()
+                    wake_at = instance.wake_time(workflow_data, now)
+                    if wake_at > now:
+                        return {
+                            "status": WorkflowStatus.SLEEPING,
+                            "current_tile_id": current_tile_id,
+                            "workflow_data": workflow_data,
+                            "prompt": None,
+                            "wake_at": wake_at,
+                        }
+                budget.charge(current_tile_id)
+                workflow_data = self.tile_executor.execute_tile(tile, workflow_data, compiled.key, workflow_id)
+                woken = False
+            else:
+                key = self.journal.idempotency_key(workflow_id, current_tile_id) if journaled else None
+                workflow_data = self._execute_step(compiled, tile, workflow_data, workflow_id, budget=budget, idempotency_key=key)
+            if journaled:
+                self.journal.step(workflow_id, current_tile_id, workflow_data.next_tile, workflow_data.take_changes())
+            current_tile_id = workflow_data.get("next_tile")
+
+        return {"status": WorkflowStatus.COMPLETED, "current_tile_id": None, "workflow_data": workflow_data, "prompt": None}
+
+    def _execute_step(self, compiled: CompiledWorkflow, tile: Dict[str, Any], workflow_data: Dict[str, Any], workflow_id: Optional[str] = None,
+                      channel: Optional[InputChannel] = None, budget: Optional[RunBudget] = None,
+                      idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Execute one tile; a ParallelTile fans out to its branches and joins them here.
+
+        With a budget, the step is counted against it and the tile's duration is checked against
+        its time limit. A running tile cannot be interrupted from another thread, so an overrun is
+        detected when the tile returns; APICallTile timeouts bound the blocking part.
+
+        idempotency_key identifies the step's side effects (see ExecutionJournal.idempotency_key).
 
-    def _get_tile_definition(self, workflow_definition: Dict[str, Any], tile_id: str) -> Optional[Dict[str, Any]]:
+        A WaitTile sleeps here until its wake-up time; the sleep counts against the deadline but not
+        against the tile's time limit.
+        """
+        if tile.get("type") == "WaitTile":
+            instance = self.tile_executor.get_tile_instance(tile, compiled.key)
+            now = self.clock.time()
+            self.clock.sleep(instance.wake_time(workflow_data, now) - now)
+        if budget is None:
+            if tile.get("type") == "ParallelTile":
+                return self._run_parallel(compiled, tile, workflow_data, workflow_id, channel)
+            return self.tile_executor.execute_tile(tile, workflow_data, compiled.key, workflow_id, channel,
+                                                   idempotency_key, self.journal)
+
+        budget.charge(tile.get("id"))
+        if tile.get("type") == "ParallelTile":
+            return self._run_parallel(compiled, tile, workflow_data, workflow_id, channel, budget)
+        start = time.perf_counter()
+        workflow_data = self.tile_executor.execute_tile(tile, workflow_data, compiled.key, workflow_id, channel,
+                                                        idempotency_key, self.journal)
+        budget.check_tile(tile, time.perf_counter() - start)
+        return workflow_data
+
+    def _run_parallel(self, compiled: CompiledWorkflow, tile: Dict[str, Any], workflow_data: Dict[str, Any], workflow_id: Optional[str] = None,
+                      channel: Optional[InputChannel] = None, budget: Optional[RunBudget] = None) -> Dict[str, Any]:
+        """
+        Run the branches of a ParallelTile concurrently and merge their results.
+
+        Parameters:
+        - compiled: The compiled workflow.
+        - tile: The ParallelTile definition.
+        - workflow_data: The current workflow data; each branch starts from a copy of it.
+
+        Returns:
+        - The workflow data with branch results under "branches" and the join outcome under "join".
+        """
+        parallel = self.tile_executor.get_tile_instance(tile, compiled.key)
+        join = self.tile_executor.get_tile_instance(compiled.get_tile(parallel.join_tile), compiled.key)
+        total = len(parallel.branches)
+        required = join.required_count(total)
+        results = {name: ("cancelled", None) for name, _ in parallel.branches}
+        counts = {"completed": 0, "failed": 0}
+
+        def record(name, run):
+            try:
+                results[name] = ("completed", run())
+                counts["completed"] += 1
+            except BudgetExceededError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Branch {name} of tile {tile.get('id')} failed: {str(e)}")
+                results[name] = ("failed", None)
+                counts["failed"] += 1
+
+        def decided():
+            # The join policy is met, or can no longer be met.
+            return counts["completed"] >= required or counts["failed"] > total - required
+
+        # Set once the outcome is decided; branches still running stop before their next tile.
+        cancel = threading.Event()
+        queued = list(parallel.branches)
+        running = {}
+        # The fan-out as a whole may wait no longer than the ParallelTile's time limit / the deadline.
+        timeout = budget.time_limit_for(tile) if budget is not None else None
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        try:
+            while not decided() and (queued or running):
+                while queued and len(running) < self.max_parallel_branches:
+                    name, start_tile = queued[0]
+                    future = self.branch_pool.try_submit(self._run_branch, compiled, start_tile, parallel.join_tile,
+                                                         workflow_data, workflow_id, channel, budget, cancel)
+                    if future is None:
+                        break
+                    queued.pop(0)
+                    running[future] = name
+                if not running:
+                    # No shared thread is free: run the next branch here rather than wait for one.
+                    name, start_tile = queued.pop(0)
+                    record(name, lambda: self._run_branch(compiled, start_tile, parallel.join_tile, workflow_data,
+                                                          workflow_id, channel, budget, cancel))
+                    continue
+                remaining = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+                done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise budget.timed_out(tile)
+                for future in done:
+                    record(running.pop(future), future.result)
+                    if decided():
+                        break
+        finally:
+            cancel.set()
+            for future in running:
+                future.cancel()
+
+        parallel.merge_results(workflow_data, results, join)
+        workflow_data.update(parallel.execute(workflow_data))
+        return workflow_data
+
+    def _run_branch(self, compiled: CompiledWorkflow, start_tile_id: Any, join_tile_id: Any, workflow_data: Dict[str, Any], workflow_id: Optional[str] = None,
+                    channel: Optional[InputChannel] = None, budget: Optional[RunBudget] = None,
+                    cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Run one branch from start_tile_id until it reaches the join tile.
+
+        cancel is checked before every tile; once it is set the branch raises BranchCancelled.
+
+        Returns:
+        - The data the branch added or changed.
+        """
+        branch_data = workflow_data.snapshot()
+        current_tile_id = start_tile_id
+        while current_tile_id is not None and current_tile_id != join_tile_id:
+            if cancel is not None and cancel.is_set():
+                raise BranchCancelled(f"Branch starting at tile {start_tile_id} cancelled before tile {current_tile_id}.")
+            tile = self._get_tile_definition(compiled, current_tile_id)
+            if tile is None:
+                raise ValueError(f"Tile with ID {current_tile_id} not found.")
+            branch_data = self._execute_step(compiled, tile, branch_data, workflow_id, channel, budget)
+            current_tile_id = branch_data.get("next_tile")
+        if current_tile_id != join_tile_id:
+            raise RuntimeError(f"Branch starting at tile {start_tile_id} ended before reaching join tile {join_tile_id}.")
+        return ParallelTile.branch_output(workflow_data, branch_data)
+
+    def _get_tile_definition(self, compiled: CompiledWorkflow, tile_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve the definition of a tile from the workflow.
 
         Parameters:
-        - workflow_definition: The structured workflow definition.
+        - compiled: The compiled workflow.
         - tile_id: The ID of the tile to retrieve.
 
         Returns:
         - The tile definition dictionary or None if not found.
         """
-        '''for tile in workflow_definition.get("tiles", []):
-            if tile.get("id") == tile_id:
-                return tile
-        return None'''
-        tile_ids=workflow_definition.get("tileids",[])
-        idx=tile_ids.index(tile_id)
-        tile=workflow_definition.get("tiles")[idx]
-        return tile
+        return compiled.get_tile(tile_id)
+
+    @staticmethod
+    def compile_workflow(workflow_definition: Union[CompiledWorkflow, Dict[str, Any]]) -> CompiledWorkflow:
+        """
+        Compile a loaded workflow definition once, validating every tile reference up front.
+
+        Parameters:
+        - workflow_definition: The raw definition, or an already compiled workflow.
+
+        Returns:
+        - The CompiledWorkflow.
+        """
+        if isinstance(workflow_definition, CompiledWorkflow):
+            return workflow_definition
+        return CompiledWorkflow(workflow_definition)
 
     '''def get_workflow_status(self, workflow_id: str) -> str:
         """
@@ -132,11 +530,11 @@ if __name__ == "__main__":
     # Sample workflow definition for testing
     # Load workflow definition from a JSON file
     file_path = "workflowengine2\workflow1.json"  # Update with your file path
-    workflow_definition = WorkflowEngine.load_workflow_from_file(file_path)
+    workflow_definition = WorkflowEngine.compile_workflow(WorkflowEngine.load_workflow_from_file(file_path))
 
 
     # Instantiate the WorkflowEngine and run a sample workflow
     
     workflow_engine = WorkflowEngine()
     ##workflow_engine.run_workflow(workflow_definition["workflow_id"], workflow_definition)
-    workflow_engine.run_workflow(workflow_definition["workflow_name"], workflow_definition)
\ No newline at end of file
+    workflow_engine.run_workflow(workflow_definition.workflow_name, workflow_definition)
\ No newline at end of file